@@ -1,5 +1,11 @@
 #!/bin/bash
 
+# stop (and fail the container) if any step fails, including the warm-up below
+set -e
+
 cd rep_score_portal
 
+# sync every local spreadsheet snapshot before the server starts accepting users
+python warm_up.py
+
 streamlit run app.py
@@ -1 +1 @@
-__version__ = '0.16.2'
+__version__ = '0.17.0'
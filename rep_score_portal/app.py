@@ -7,6 +7,8 @@ import streamlit_authenticator as stauth
 from footer import display_footer
 from sidebar import construct_sidebar
 from utils import (
+    check_for_data_updates,
+    display_stale_data_message,
     insert_line_break,
     reset_session_state_asset_information,
     reset_session_state_progress,
@@ -20,6 +22,7 @@ from views.submit_an_asset import (
     page_two,
     page_zero,
 )
+from warm_up import start_warm_up
 
 
 st.set_page_config(page_title='Rep Score Portal', page_icon='🌀')
@@ -176,6 +179,9 @@ def determine_page() -> None:
         home_page()
 
 
+# the first visitor to a freshly started server warms up its caches while they log in
+start_warm_up()
+
 login_trouble_message_placeholder = None
 
 if not st.session_state.get('authentication_status'):
@@ -237,11 +243,17 @@ if st.session_state.get('authentication_status'):
     if 'asset_information' not in st.session_state:
         reset_session_state_asset_information()
 
+    check_for_data_updates()
+
     construct_sidebar()
 
     display_footer()
 
+    stale_data_message_placeholder = st.empty()
+
     determine_page()
 
+    display_stale_data_message(message_placeholder=stale_data_message_placeholder)
+
 # NOTE: anything past this point and NOT in the ``if`` block above will be displayed regardless of
 # login status
@@ -1,9 +1,120 @@
+import os
+
+
 TOO_FILTERED_DOWN_ERROR_MESSAGE = (
     "Hmm... we couldn't find any existing assets with those filters applied. Please try again with "
     'a different set of filters.'
 )
 
 
+# how long, in seconds, a spreadsheet read is shared across every session before it is re-fetched
+SPREADSHEET_CACHE_TTL_SECONDS = 300
+# how long, in seconds, past its time-to-live a cached spreadsheet is still served immediately
+# while it is re-fetched in the background - kept to a single time-to-live, so a failing or slow
+# re-fetch never leaves sessions with data more than twice as old as the time-to-live
+SPREADSHEET_CACHE_MAX_STALE_SECONDS = SPREADSHEET_CACHE_TTL_SECONDS
+
+# maximum number of authorized Google Sheets clients (each with its own keep-alive HTTP session)
+# that can be checked out at once, shared by every session
+GOOGLE_SHEETS_CLIENT_POOL_SIZE = 4
+
+# bounds of the exponential backoff, with full jitter, between retries of a Google Sheets request
+GOOGLE_SHEETS_RETRY_BASE_DELAY_SECONDS = 0.5
+GOOGLE_SHEETS_RETRY_MAX_DELAY_SECONDS = 4
+# a read still waiting on Google Sheets after this many seconds is sent again with another client,
+# using whichever response arrives first
+GOOGLE_SHEETS_HEDGE_AFTER_SECONDS = 2
+# consecutive failed Google Sheets requests after which every request fails immediately (serving
+# local snapshots instead) until a single trial request succeeds after the cooldown, in seconds
+GOOGLE_SHEETS_CIRCUIT_BREAKER_THRESHOLD = 3
+GOOGLE_SHEETS_CIRCUIT_BREAKER_COOLDOWN_SECONDS = 30
+# Google Sheets API requests allowed per minute, shared by every session - Google's default quota
+# per user (here, the service account) per minute. Requests over this rate wait for their turn,
+# with writes going ahead of reads
+GOOGLE_SHEETS_REQUESTS_PER_MINUTE = 60
+
+# directory holding local Parquet snapshots of every sheet read, so restarts can sync incrementally
+SNAPSHOT_DIRECTORY = os.environ.get('REP_SCORE_PORTAL_SNAPSHOT_DIRECTORY', './snapshots')
+# how often, in seconds, a snapshot is fully re-downloaded rather than only pulling appended rows,
+# picking up any edits made to existing rows, when the spreadsheet's version cannot be checked
+SNAPSHOT_FULL_RESYNC_SECONDS = 10 * 60
+
+# SQLite database journaling submitted asset tracker rows until they are written to Google Sheets,
+# kept alongside the snapshots so it is persisted in the same volume
+SUBMISSION_QUEUE_DATABASE = os.path.join(SNAPSHOT_DIRECTORY, 'submission_queue.sqlite3')
+# how long, in seconds, the submission queue worker waits before retrying rows that failed to write
+SUBMISSION_QUEUE_RETRY_SECONDS = 30
+# how long, in seconds, the submission queue worker waits after a row is queued to gather any other
+# rows submitted in the meantime, so a burst of submissions is written with a single append
+SUBMISSION_QUEUE_COALESCE_SECONDS = 2
+# maximum number of queued rows written with a single append
+SUBMISSION_QUEUE_MAX_BATCH_SIZE = 100
+# how often, in seconds, the background change feed poller checks whether any of the portal's
+# spreadsheets changed, refreshing the shared cache for every session if so
+CHANGE_FEED_POLL_INTERVAL_SECONDS = 60
+
+# where the portal reads its sheets from and appends new asset tracker rows to - either
+# ``google_sheets`` or ``sqlite``
+STORAGE_BACKEND = os.environ.get('REP_SCORE_PORTAL_STORAGE_BACKEND', 'google_sheets')
+# SQLite database the ``sqlite`` storage backend keeps every sheet in
+STORAGE_SQLITE_DATABASE = os.environ.get(
+    'REP_SCORE_PORTAL_STORAGE_SQLITE_DATABASE',
+    os.path.join(SNAPSHOT_DIRECTORY, 'storage.sqlite3'),
+)
+# whether the ``sqlite`` storage backend is a replica of Google Sheets, re-copying each sheet from
+# Google Sheets whenever it changes and appending rows to Google Sheets. If ``False``, the SQLite
+# database is used on its own without any network access, such as for tests and load tests
+STORAGE_SQLITE_SYNC_WITH_GOOGLE_SHEETS = (
+    os.environ.get('REP_SCORE_PORTAL_STORAGE_SQLITE_SYNC_WITH_GOOGLE_SHEETS', 'true').lower()
+    == 'true'
+)
+# columns of any sheet in the ``sqlite`` storage backend that are indexed
+STORAGE_SQLITE_INDEXED_COLUMNS = ('Username', 'Asset Name', 'Date Submitted', 'Submission ID')
+
+# S3 bucket uploaded creative briefs and assets are written to
+S3_BUCKET = 'trp-rep-score-assets'
+# files larger than this many bytes are uploaded to S3 in parts, several at a time
+S3_MULTIPART_THRESHOLD_BYTES = 16 * 1024 * 1024
+# size, in bytes, of each part of a multipart S3 upload
+S3_MULTIPART_CHUNK_SIZE_BYTES = 16 * 1024 * 1024
+# maximum number of parts of a single file uploaded to S3 at once
+S3_MAX_CONCURRENCY = 10
+# maximum number of files uploaded to S3 at once, across every session
+S3_MAX_CONCURRENT_FILE_UPLOADS = 4
+# maximum number of attempts of every S3 request, including each part of a multipart upload, with
+# exponential backoff between attempts
+S3_MAX_ATTEMPTS = 5
+# SQLite database journaling the parts of multipart uploads to S3 that have finished, so a failed
+# upload of the same file for the same submission only sends the missing parts
+MULTIPART_UPLOAD_DATABASE = os.path.join(SNAPSHOT_DIRECTORY, 'multipart_uploads.sqlite3')
+# how long, in seconds, an unfinished multipart upload can be resumed before it is aborted and
+# started over
+S3_MULTIPART_UPLOAD_EXPIRATION_SECONDS = 7 * 24 * 60 * 60
+# SQLite database indexing every file uploaded to S3 by the SHA-256 of its content, so a file that
+# has already been uploaded is linked to rather than uploaded again
+UPLOAD_INDEX_DATABASE = os.path.join(SNAPSHOT_DIRECTORY, 'upload_index.sqlite3')
+# uploads at least this large, in bytes, are spooled to a temporary file on disk and streamed to S3
+# from there, rather than uploaded from memory
+S3_UPLOAD_SPOOL_THRESHOLD_BYTES = S3_MULTIPART_THRESHOLD_BYTES
+# most bytes of uploads sent to S3 from memory at once, across every session. Smaller uploads that
+# would go over this are spooled to disk too. This only limits what S3 transfers buffer - Streamlit
+# keeps every uploaded file in memory for the rest of its session regardless
+S3_MAX_BYTES_SENDING_FROM_MEMORY = 256 * 1024 * 1024
+# directory holding spooled uploads. If not set, the system's temporary directory is used
+S3_UPLOAD_SPOOL_DIRECTORY = os.environ.get('REP_SCORE_PORTAL_S3_UPLOAD_SPOOL_DIRECTORY')
+# whether files are uploaded straight from the browser to S3 with presigned POSTs, rather than
+# through the Streamlit server. The S3 bucket's CORS configuration must allow ``POST`` requests from
+# the portal's origin
+S3_DIRECT_UPLOADS = os.environ.get('REP_SCORE_PORTAL_S3_DIRECT_UPLOADS', 'false').lower() == 'true'
+# the only S3 key prefixes files may be uploaded to straight from the browser
+S3_DIRECT_UPLOAD_PREFIXES = ('creative_briefs', 'uploads')
+# largest file, in bytes, that may be uploaded straight from the browser - the same as the
+# ``maxUploadSize`` of uploads through the Streamlit server
+S3_DIRECT_UPLOAD_MAX_BYTES = 2000 * 1024 * 1024
+# how long, in seconds, a presigned POST to upload a file straight to S3 stays valid
+S3_PRESIGNED_POST_EXPIRATION_SECONDS = 60 * 60
+
+
 MARKETING_LABEL_1 = (
     'How can DE&I be reflected in our High Value Communities or audience definitions?'
 )
@@ -51,3 +162,23 @@ DEI_CREATIVE_REVIEWS_LABEL_4 = (
 DEI_CREATIVE_REVIEWS_LABEL_5 = (
     'How can we, and our clients, make choices that lead to more inclusive and equitable work?'
 )
+
+# long free-text columns of the portal backend asset tracker, which are left out of the tracker
+# DataFrame shared by list and filter views and fetched one row at a time only when needed
+ASSET_TRACKER_NOTE_COLUMNS = (
+    MARKETING_LABEL_1,
+    MARKETING_LABEL_2,
+    MARKETING_LABEL_3,
+    MARKETING_LABEL_4,
+    AGENCY_CREATIVE_LABEL_1,
+    AGENCY_CREATIVE_LABEL_2,
+    AGENCY_CREATIVE_LABEL_3,
+    AGENCY_CREATIVE_LABEL_4,
+    AGENCY_CREATIVE_LABEL_5,
+    DEI_CREATIVE_REVIEWS_LABEL_1,
+    DEI_CREATIVE_REVIEWS_LABEL_2,
+    DEI_CREATIVE_REVIEWS_LABEL_3,
+    DEI_CREATIVE_REVIEWS_LABEL_4,
+    DEI_CREATIVE_REVIEWS_LABEL_5,
+    'Notes',
+)
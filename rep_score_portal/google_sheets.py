@@ -0,0 +1,1415 @@
+import collections
+import concurrent.futures
+import contextlib
+import queue
+import random
+import re
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+import google.auth.transport.requests
+import google.oauth2.service_account
+import gspread
+import gspread_pandas
+import numpy as np
+import pandas as pd
+import requests
+import streamlit as st
+import urllib3
+
+from config import (
+    GOOGLE_SHEETS_CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+    GOOGLE_SHEETS_CIRCUIT_BREAKER_THRESHOLD,
+    GOOGLE_SHEETS_CLIENT_POOL_SIZE,
+    GOOGLE_SHEETS_HEDGE_AFTER_SECONDS,
+    GOOGLE_SHEETS_REQUESTS_PER_MINUTE,
+    GOOGLE_SHEETS_RETRY_BASE_DELAY_SECONDS,
+    GOOGLE_SHEETS_RETRY_MAX_DELAY_SECONDS,
+    SNAPSHOT_FULL_RESYNC_SECONDS,
+)
+
+
+# title and merged cells of every sheet of a spreadsheet, mapping spreadsheet IDs to a tuple of
+# ``(time the metadata was fetched, list of sheets in index order)``
+_spreadsheet_metadata_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = dict()
+_spreadsheet_metadata_cache_lock = threading.Lock()
+
+# futures of fetches currently in flight, keyed by what they fetch, so concurrent identical fetches
+# share a single network call and result
+_single_flight_fetches: Dict[Tuple, concurrent.futures.Future] = dict()
+_single_flight_fetches_lock = threading.Lock()
+
+# idle, already-authorized Google Sheets clients ready to be checked out, most recently used first
+_google_sheets_client_pool: queue.LifoQueue = queue.LifoQueue()
+_google_sheets_client_pool_semaphore = threading.BoundedSemaphore(GOOGLE_SHEETS_CLIENT_POOL_SIZE)
+# credentials and token-refresh transport shared by every pooled client, created on first use
+_google_sheets_auth: Dict[str, object] = {'credentials': None, 'auth_request': None}
+_google_sheets_auth_lock = threading.Lock()
+_google_sheets_client_stats = {
+    'clients_created': 0,
+    'token_refreshes': 0,
+    'tcp_connections': 0,
+    'hedged_requests': 0,
+    'circuit_breaker_trips': 0,
+    'stale_reads_served': 0,
+    'fetches_coalesced': 0,
+    'change_detection_hits': 0,
+    'change_detection_misses': 0,
+}
+_google_sheets_client_stats_lock = threading.Lock()
+
+# worker threads sending individual (and hedged) Google Sheets API requests - separate from the
+# executor ``input_output`` reads sheets concurrently with, whose workers wait on these requests
+_google_sheets_request_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=GOOGLE_SHEETS_CLIENT_POOL_SIZE * 2,
+    thread_name_prefix='google_sheets_request',
+)
+
+
+class GoogleSheetsUnavailableError(Exception):
+    """Raised when Google Sheets could not be reached after every retry."""
+
+
+class _GoogleSheetsCircuitBreaker:
+    """
+    Circuit breaker shared by every Google Sheets request, so an outage fails requests immediately
+    rather than blocking every session on timeouts and retries.
+
+    After ``threshold`` consecutive failures, the breaker opens and rejects every request. Once
+    ``cooldown`` seconds have passed, a single trial request is let through - if it succeeds, the
+    breaker closes again, and if it fails, the breaker stays open for another cooldown.
+
+    Parameters
+    ----------
+    threshold: int
+        Number of consecutive failures after which the breaker opens
+    cooldown: float
+        How long, in seconds, the breaker stays open before letting a trial request through
+    clock: function
+        Function returning the current time, in seconds
+
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self._clock = clock
+
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_request_in_progress = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent right now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if (
+                not self._trial_request_in_progress
+                and (self._clock() - self._opened_at) >= self.cooldown
+            ):
+                self._trial_request_in_progress = True
+
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        """Record that a request reached Google Sheets, closing the breaker."""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_request_in_progress = False
+
+    def record_failure(self) -> None:
+        """Record that a request could not reach Google Sheets, opening the breaker if needed."""
+        with self._lock:
+            self._consecutive_failures += 1
+
+            if self._trial_request_in_progress or (
+                self._opened_at is None and self._consecutive_failures >= self.threshold
+            ):
+                if self._opened_at is None:
+                    increment_google_sheets_client_stat('circuit_breaker_trips')
+
+                self._opened_at = self._clock()
+
+            self._trial_request_in_progress = False
+
+
+_google_sheets_circuit_breaker = _GoogleSheetsCircuitBreaker(
+    threshold=GOOGLE_SHEETS_CIRCUIT_BREAKER_THRESHOLD,
+    cooldown=GOOGLE_SHEETS_CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+)
+
+
+class _GoogleSheetsRateLimiter:
+    """
+    Token bucket rate limiter shared by every Google Sheets request, so the sessions of a busy
+    process together stay under the Google Sheets API quota instead of each being rejected.
+
+    The bucket holds up to ``requests_per_minute`` tokens, refilled continuously. Each request
+    takes one token, waiting for one to be refilled if the bucket is empty. Waiting writes are
+    always handed a token before any waiting read.
+
+    Parameters
+    ----------
+    requests_per_minute: int
+        Number of requests allowed per minute, which is also the largest burst allowed
+    clock: function
+        Function returning the current time, in seconds
+
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+
+        self._clock = clock
+        self._tokens = float(requests_per_minute)
+        self._refilled_at = self._clock()
+        self._waiting = {'read': 0, 'write': 0}
+        self._request_times = collections.deque()
+        self._stats = {'requests_delayed': 0, 'seconds_waited': 0.0, 'quota_exceeded': 0}
+        self._condition = threading.Condition()
+
+    def _refill(self) -> None:
+        """Add the tokens refilled since the last refill. Must hold ``self._condition``."""
+        now = self._clock()
+
+        self._tokens = min(
+            float(self.requests_per_minute),
+            self._tokens + ((now - self._refilled_at) * self.requests_per_minute / 60),
+        )
+        self._refilled_at = now
+
+    def _take_token(self) -> None:
+        """Take a token and record the request. Must hold ``self._condition``."""
+        self._tokens -= 1
+        self._request_times.append(self._clock())
+
+    def acquire(self, priority: str) -> None:
+        """
+        Take a token, blocking until one is available.
+
+        Parameters
+        ----------
+        priority: str
+            Either ``write`` or ``read``. Reads only get a token once no writes are waiting
+
+        """
+        start_time = self._clock()
+
+        with self._condition:
+            self._waiting[priority] += 1
+
+            try:
+                while True:
+                    self._refill()
+
+                    if self._tokens >= 1 and (priority == 'write' or self._waiting['write'] == 0):
+                        self._take_token()
+
+                        break
+
+                    self._condition.wait(
+                        timeout=max((1 - self._tokens) * 60 / self.requests_per_minute, 0.01),
+                    )
+
+                seconds_waited = self._clock() - start_time
+
+                if seconds_waited >= 0.01:
+                    self._stats['requests_delayed'] += 1
+                    self._stats['seconds_waited'] += seconds_waited
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now and no request is waiting for one."""
+        with self._condition:
+            self._refill()
+
+            if self._tokens >= 1 and not any(self._waiting.values()):
+                self._take_token()
+
+                return True
+
+            return False
+
+    def record_quota_exceeded(self) -> None:
+        """Empty the bucket after Google Sheets rejects a request for exceeding its quota."""
+        with self._condition:
+            self._refill()
+
+            self._tokens = min(self._tokens, 0.0)
+            self._stats['quota_exceeded'] += 1
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Get the current quota consumption. See ``get_google_sheets_quota_stats``."""
+        with self._condition:
+            self._refill()
+
+            while self._request_times and (self._clock() - self._request_times[0]) > 60:
+                self._request_times.popleft()
+
+            return {
+                'requests_per_minute_limit': self.requests_per_minute,
+                'requests_in_last_minute': len(self._request_times),
+                'tokens_available': int(self._tokens),
+                'waiting_reads': self._waiting['read'],
+                'waiting_writes': self._waiting['write'],
+                **self._stats,
+            }
+
+
+_google_sheets_rate_limiter = _GoogleSheetsRateLimiter(
+    requests_per_minute=GOOGLE_SHEETS_REQUESTS_PER_MINUTE,
+)
+
+
+def increment_google_sheets_client_stat(stat: str) -> None:
+    """Increment a counter in ``_google_sheets_client_stats``."""
+    with _google_sheets_client_stats_lock:
+        _google_sheets_client_stats[stat] += 1
+
+
+class _CountingHTTPSConnection(urllib3.connection.HTTPSConnection):
+    """HTTPS connection counting every new TCP connection opened to Google."""
+
+    def connect(self) -> None:
+        super().connect()
+
+        increment_google_sheets_client_stat('tcp_connections')
+
+
+class _CountingHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _GoogleSheetsHTTPAdapter(requests.adapters.HTTPAdapter):
+    """Keep-alive HTTP adapter whose new TCP connections are counted."""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:  # noqa: ANN002, ANN003
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class _SharedServiceAccountCredentials(google.oauth2.service_account.Credentials):
+    """
+    Service account credentials shared by every pooled client, so an access token is only
+    refreshed once it expires (or is rejected) rather than once per client.
+
+    """
+
+    def refresh(self, request: google.auth.transport.Request) -> None:
+        token_before_refresh = self.token
+
+        with _google_sheets_auth_lock:
+            if self.token != token_before_refresh and self.valid:
+                # another thread refreshed the token while we were waiting for the lock
+                return
+
+            super().refresh(request)
+
+        increment_google_sheets_client_stat('token_refreshes')
+
+
+def _create_google_sheets_session() -> requests.Session:
+    """Create a ``requests.Session`` that keeps connections to Google alive between calls."""
+    session = requests.Session()
+    session.mount(
+        prefix='https://',
+        adapter=_GoogleSheetsHTTPAdapter(pool_connections=4, pool_maxsize=4),
+    )
+
+    return session
+
+
+def _create_google_sheets_client() -> gspread_pandas.client.Client:
+    """
+    Create a new ``gspread_pandas`` client authorized with the service account credentials shared
+    by every pooled client.
+
+    Returns
+    -------
+    gspread_pandas.client.Client
+
+    """
+    with _google_sheets_auth_lock:
+        if _google_sheets_auth['credentials'] is None:
+            config = {
+                'type': st.secrets['gcp']['type'],
+                'project_id': st.secrets['gcp']['project_id'],
+                'private_key_id': st.secrets['gcp']['private_key_id'],
+                'private_key': st.secrets['gcp']['private_key'],
+                'client_email': st.secrets['gcp']['client_email'],
+                'client_id': st.secrets['gcp']['client_id'],
+                'auth_uri': st.secrets['gcp']['auth_uri'],
+                'token_uri': st.secrets['gcp']['token_uri'],
+                'auth_provider_x509_cert_url': st.secrets['gcp']['auth_provider_x509_cert_url'],
+                'client_x509_cert_url': st.secrets['gcp']['client_x509_cert_url'],
+            }
+
+            _google_sheets_auth['credentials'] = (
+                _SharedServiceAccountCredentials.from_service_account_info(
+                    info=config,
+                    scopes=gspread_pandas.conf.default_scope,
+                )
+            )
+            _google_sheets_auth['auth_request'] = google.auth.transport.requests.Request(
+                session=_create_google_sheets_session(),
+            )
+
+    session = google.auth.transport.requests.AuthorizedSession(
+        credentials=_google_sheets_auth['credentials'],
+        auth_request=_google_sheets_auth['auth_request'],
+    )
+    session.mount(
+        prefix='https://',
+        adapter=_GoogleSheetsHTTPAdapter(pool_connections=4, pool_maxsize=4),
+    )
+
+    client = gspread_pandas.client.Client(session=session)
+
+    increment_google_sheets_client_stat('clients_created')
+
+    return client
+
+
+@contextlib.contextmanager
+def _checkout_google_sheets_client(timeout: float) -> Iterator[gspread_pandas.client.Client]:
+    """
+    Check out an authorized client from the process-wide Google Sheets client pool, blocking while
+    all ``GOOGLE_SHEETS_CLIENT_POOL_SIZE`` clients are in use. The client is returned to the pool
+    once the ``with`` block exits.
+
+    Parameters
+    ----------
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+
+    Yields
+    ------
+    gspread_pandas.client.Client
+
+    """
+    with _google_sheets_client_pool_semaphore:
+        try:
+            client = _google_sheets_client_pool.get_nowait()
+        except queue.Empty:
+            client = _create_google_sheets_client()
+
+        client.set_timeout(timeout=timeout)
+
+        try:
+            yield client
+        finally:
+            _google_sheets_client_pool.put(client)
+
+
+def get_google_sheets_client_stats() -> Dict[str, int]:
+    """
+    Get counters describing the process-wide Google Sheets client pool.
+
+    Returns
+    -------
+    stats: dict
+        Dictionary with the number of ``clients_created``, access ``token_refreshes``,
+        ``tcp_connections`` opened to Google, ``hedged_requests`` sent, ``circuit_breaker_trips``,
+        expired cached sheets served while being re-fetched (``stale_reads_served``), and fetches
+        that joined an identical fetch already in flight (``fetches_coalesced``), as well as syncs
+        skipped because the spreadsheet had not changed (``change_detection_hits``) and syncs that
+        had to download changes (``change_detection_misses``) since the process started
+
+    """
+    with _google_sheets_client_stats_lock:
+        return dict(_google_sheets_client_stats)
+
+
+def get_google_sheets_quota_stats() -> Dict[str, Union[int, float]]:
+    """
+    Get the current Google Sheets API quota consumption of the process-wide rate limiter.
+
+    Returns
+    -------
+    stats: dict
+        Dictionary with the ``requests_per_minute_limit``, the ``requests_in_last_minute``, the
+        ``tokens_available`` for requests to be sent right away, the number of ``waiting_reads``
+        and ``waiting_writes``, the number of ``requests_delayed`` by the limiter and the total
+        ``seconds_waited`` by them, and the number of times Google Sheets rejected a request for
+        exceeding its quota (``quota_exceeded``) since the process started
+
+    """
+    return _google_sheets_rate_limiter.get_stats()
+
+
+_T = TypeVar('_T')
+
+
+def single_flight(key: Tuple, fetch: Callable[[], _T]) -> _T:
+    """
+    Call ``fetch``, unless a fetch with the same ``key`` is already in flight in another thread -
+    in which case, wait for that fetch and share its result (or exception) instead.
+
+    Parameters
+    ----------
+    key: tuple
+        Hashable description of exactly what is fetched, such as ``(spreadsheet, sheet, range)``
+    fetch: callable
+        Function making the fetch
+
+    Returns
+    -------
+    result
+        Result of ``fetch``, shared with every thread that joined it - treat it as read-only
+
+    """
+    with _single_flight_fetches_lock:
+        future = _single_flight_fetches.get(key)
+        is_leader = future is None
+
+        if is_leader:
+            future = concurrent.futures.Future()
+            _single_flight_fetches[key] = future
+
+    if not is_leader:
+        increment_google_sheets_client_stat('fetches_coalesced')
+
+        return future.result()
+
+    try:
+        result = fetch()
+    except BaseException as e:
+        future.set_exception(e)
+
+        raise
+    else:
+        future.set_result(result)
+
+        return result
+    finally:
+        with _single_flight_fetches_lock:
+            _single_flight_fetches.pop(key, None)
+
+
+@contextlib.contextmanager
+def read_google_spreadsheet(
+    spread: str,
+    sheet: int = 0,
+    timeout: float = 7,
+    max_retries: int = 3,
+) -> Iterator[gspread_pandas.spread.Spread]:
+    """
+    Read a Google Spreadsheet using the ``gspread_pandas`` library with a client checked out of the
+    process-wide client pool. Use as a context manager - the client is returned to the pool once
+    the ``with`` block exits.
+
+    This makes no Streamlit calls, so it is safe to use from background threads.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to read in
+    sheet: int
+        Sheet of the Google Spreadsheet to read in
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+    max_retries: int
+        Number of times to retry a request before giving up and raising a
+        ``GoogleSheetsUnavailableError``
+
+    Yields
+    ------
+    gspread_pandas.spread.Spread
+
+    """
+    with _checkout_google_sheets_client(timeout=timeout) as client:
+        for retry_idx in range(max_retries):
+            try:
+                opened_spread = gspread_pandas.spread.Spread(
+                    spread=spread,
+                    sheet=sheet,
+                    client=client,
+                )
+                break
+            except (requests.exceptions.ConnectTimeout, requests.exceptions.ReadTimeout):
+                if retry_idx < max_retries - 1:
+                    time.sleep(_get_google_sheets_retry_delay(retry_idx=retry_idx))
+        else:
+            raise GoogleSheetsUnavailableError(
+                f'Could not open sheet {sheet} of {spread} after {max_retries} attempts.'
+            )
+
+        yield opened_spread
+
+
+def _get_google_sheets_retry_delay(retry_idx: int) -> float:
+    """
+    Get how long to wait, in seconds, before retrying a failed Google Sheets request, using
+    exponential backoff with full jitter so sessions retrying at once do not retry in lockstep.
+
+    """
+    return random.uniform(
+        0,
+        min(
+            GOOGLE_SHEETS_RETRY_MAX_DELAY_SECONDS,
+            GOOGLE_SHEETS_RETRY_BASE_DELAY_SECONDS * (2 ** retry_idx),
+        ),
+    )
+
+
+def _send_google_sheets_request(
+    method: str,
+    endpoint: str,
+    params: Optional[Dict[str, Any]],
+    json: Optional[Dict[str, Any]],
+    timeout: float,
+) -> requests.Response:
+    """Send a single Google Sheets API request with a pooled client, without retrying."""
+    with _checkout_google_sheets_client(timeout=timeout) as client:
+        return client.request(method=method, endpoint=endpoint, params=params, json=json)
+
+
+def _send_hedged_google_sheets_request(
+    method: str,
+    endpoint: str,
+    params: Optional[Dict[str, Any]],
+    json: Optional[Dict[str, Any]],
+    timeout: float,
+) -> requests.Response:
+    """
+    Send a Google Sheets API request and, if no response has arrived after
+    ``GOOGLE_SHEETS_HEDGE_AFTER_SECONDS``, send the same request again with another pooled client,
+    returning whichever response arrives first. Only safe for requests that can be sent twice.
+
+    """
+    futures = [
+        _google_sheets_request_executor.submit(
+            _send_google_sheets_request,
+            method,
+            endpoint,
+            params,
+            json,
+            timeout,
+        ),
+    ]
+
+    done, _ = concurrent.futures.wait(fs=futures, timeout=GOOGLE_SHEETS_HEDGE_AFTER_SECONDS)
+
+    # hedge only with spare quota, so hedging never makes other requests wait
+    if not done and _google_sheets_rate_limiter.try_acquire():
+        increment_google_sheets_client_stat('hedged_requests')
+
+        futures.append(
+            _google_sheets_request_executor.submit(
+                _send_google_sheets_request,
+                method,
+                endpoint,
+                params,
+                json,
+                timeout,
+            )
+        )
+
+    error = None
+
+    for future in concurrent.futures.as_completed(fs=futures):
+        try:
+            return future.result()
+        except Exception as e:
+            # wait for the other request, if there is one, before giving up
+            error = e
+
+    raise error
+
+
+def _request_google_sheets_api(
+    method: str,
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    json: Optional[Dict[str, Any]] = None,
+    timeout: float = 7,
+    max_retries: int = 3,
+    retry_on: Tuple[Type[Exception], ...] = (
+        requests.exceptions.ConnectTimeout,
+        requests.exceptions.ReadTimeout,
+    ),
+) -> requests.Response:
+    """
+    Make a single Google Sheets API request with a pooled client, retrying on timeouts with
+    exponential backoff and jitter. ``GET`` requests are hedged - see
+    ``_send_hedged_google_sheets_request``.
+
+    Every request first waits for its turn with the process-wide rate limiter, writes ahead of
+    reads, and requests rejected for exceeding the Google Sheets quota are retried after backing
+    off rather than failing.
+
+    Every request goes through a process-wide circuit breaker. Once Google Sheets has failed
+    ``GOOGLE_SHEETS_CIRCUIT_BREAKER_THRESHOLD`` requests in a row, requests raise a
+    ``GoogleSheetsUnavailableError`` immediately until Google Sheets recovers.
+
+    This makes no Streamlit calls, so it is safe to use from background threads.
+
+    Parameters
+    ----------
+    method: str
+        HTTP method, such as ``get`` or ``post``
+    endpoint: str
+        URL of the API endpoint, likely formatted from one of the constants in ``gspread.urls``
+    params: dict
+        Query string parameters
+    json: dict
+        JSON body of the request
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+    max_retries: int
+        Number of times to try the request before giving up and raising a
+        ``GoogleSheetsUnavailableError``
+    retry_on: tuple
+        Exception types that trigger a retry. Requests that are not safe to send twice should only
+        retry on ``requests.exceptions.ConnectTimeout``
+
+    Returns
+    -------
+    requests.Response
+
+    """
+    if not _google_sheets_circuit_breaker.allow_request():
+        raise GoogleSheetsUnavailableError(
+            f'Did not {method.upper()} {endpoint} - the Google Sheets circuit breaker is open.'
+        )
+
+    is_read = method.lower() == 'get'
+    send_request = _send_hedged_google_sheets_request if is_read else _send_google_sheets_request
+
+    for retry_idx in range(max_retries):
+        _google_sheets_rate_limiter.acquire(priority='read' if is_read else 'write')
+
+        try:
+            response = send_request(
+                method=method,
+                endpoint=endpoint,
+                params=params,
+                json=json,
+                timeout=timeout,
+            )
+        except retry_on:
+            if retry_idx < max_retries - 1:
+                time.sleep(_get_google_sheets_retry_delay(retry_idx=retry_idx))
+        except gspread.exceptions.APIError as e:
+            if e.response.status_code == 429:
+                # the request was rejected without being processed, so it is always safe to retry
+                _google_sheets_rate_limiter.record_quota_exceeded()
+
+                if retry_idx < max_retries - 1:
+                    time.sleep(_get_google_sheets_retry_delay(retry_idx=retry_idx))
+
+                    continue
+
+            # Google Sheets was reached, but only server errors mean it is having trouble
+            if e.response.status_code >= 500:
+                _google_sheets_circuit_breaker.record_failure()
+            else:
+                _google_sheets_circuit_breaker.record_success()
+
+            raise
+        except Exception:
+            _google_sheets_circuit_breaker.record_failure()
+
+            raise
+        else:
+            _google_sheets_circuit_breaker.record_success()
+
+            return response
+
+    _google_sheets_circuit_breaker.record_failure()
+
+    raise GoogleSheetsUnavailableError(
+        f'Could not {method.upper()} {endpoint} after {max_retries} attempts.'
+    )
+
+
+def _get_google_spreadsheet_sheets(spread: str) -> List[Dict[str, Any]]:
+    """
+    Get the title and merged cells of every sheet of a Google Spreadsheet, in index order.
+
+    This metadata is cached process-wide and fetched again, in a single lightweight request, every
+    ``SNAPSHOT_FULL_RESYNC_SECONDS``.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+
+    Returns
+    -------
+    sheets: list
+        List of dictionaries with ``title`` and ``merges`` keys
+
+    """
+    spreadsheet_id = gspread.utils.extract_id_from_url(url=spread)
+
+    with _spreadsheet_metadata_cache_lock:
+        cached = _spreadsheet_metadata_cache.get(spreadsheet_id)
+
+    if cached is not None and (time.monotonic() - cached[0]) < SNAPSHOT_FULL_RESYNC_SECONDS:
+        return cached[1]
+
+    def _fetch_sheets() -> List[Dict[str, Any]]:
+        response = _request_google_sheets_api(
+            method='get',
+            endpoint=gspread.urls.SPREADSHEET_URL % spreadsheet_id,
+            params={'fields': 'sheets(properties(title,index),merges)'},
+        )
+
+        sheets = [
+            {'title': sheet['properties']['title'], 'merges': sheet.get('merges', [])}
+            for sheet in sorted(
+                response.json().get('sheets', []),
+                key=lambda sheet: sheet['properties'].get('index', 0),
+            )
+        ]
+
+        with _spreadsheet_metadata_cache_lock:
+            _spreadsheet_metadata_cache[spreadsheet_id] = (time.monotonic(), sheets)
+
+        return sheets
+
+    return single_flight(key=('spreadsheet_metadata', spreadsheet_id), fetch=_fetch_sheets)
+
+
+def _fix_merged_cell_values(
+    values: List[List[str]],
+    merges: List[Dict[str, int]],
+) -> List[List[str]]:
+    """
+    Assign the top-left value of each merged range to every cell in it, the same way
+    ``gspread_pandas``'s ``sheet_to_df`` does. ``values`` must start at cell ``A1``.
+
+    """
+    for merge in merges:
+        start_row, end_row = merge['startRowIndex'], merge['endRowIndex']
+        start_col, end_col = merge['startColumnIndex'], merge['endColumnIndex']
+
+        # ignore merged cells outside of the data range
+        if start_row < len(values) and start_col < len(values[0]):
+            original_value = values[start_row][start_col]
+
+            for row in values[start_row:end_row]:
+                row[start_col:end_col] = [original_value] * (end_col - start_col)
+
+    return values
+
+
+def _batch_get_google_spreadsheet_values(
+    spread: str,
+    range_names: List[str],
+    timeout: float = 7,
+    max_retries: int = 3,
+) -> List[Tuple[int, List[List[str]]]]:
+    """
+    Get the raw values of several A1-notation ranges of a Google Spreadsheet in a single
+    ``values:batchGet`` request.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    range_names: list
+        A1-notation ranges to get, such as ``'Sheet1'!A5:C``
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+    max_retries: int
+        Number of times to try the request before giving up and raising a
+        ``GoogleSheetsUnavailableError``
+
+    Returns
+    -------
+    value_ranges: list
+        List of ``(row number of the first row, list of rows of cell values)`` tuples, one per range
+        in ``range_names``, with every row padded to the same length
+
+    """
+    response = _request_google_sheets_api(
+        method='get',
+        endpoint=gspread.urls.SPREADSHEET_VALUES_BATCH_URL % (
+            gspread.utils.extract_id_from_url(url=spread)
+        ),
+        params={'ranges': range_names, 'majorDimension': 'ROWS'},
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+
+    value_ranges = list()
+
+    for value_range in response.json().get('valueRanges', []):
+        # the returned range looks like ``'Sheet1'!A5:C9`` - we want the ``5``
+        first_row_number = int(re.search(r'(\d+)', value_range['range'].split('!')[-1]).group(1))
+        values = value_range.get('values', [])
+
+        value_ranges.append((first_row_number, gspread.utils.fill_gaps(values) if values else []))
+
+    return value_ranges
+
+
+def read_google_spreadsheet_ranges(
+    spread: str,
+    ranges: List[Union[int, str]],
+    timeout: float = 7,
+    max_retries: int = 3,
+) -> List[pd.DataFrame]:
+    """
+    Read several sheets and/or ranges of a Google Spreadsheet in a single ``values:batchGet``
+    request, rather than one request (plus spreadsheet metadata requests) for each.
+
+    This does not go through the process-wide cache and makes no Streamlit calls, but concurrent
+    reads of the same ranges share a single request and the same DataFrames, which should be
+    treated as read-only.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to read in
+    ranges: list
+        Sheets and ranges to read. An integer reads the entire sheet at that index, and a string is
+        read as an A1-notation range, such as ``'Sheet1'!A1:F``. The first row of every range is
+        used as its header
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+    max_retries: int
+        Number of times to try the request before giving up and raising a
+        ``GoogleSheetsUnavailableError``
+
+    Returns
+    -------
+    dfs: list
+        List of DataFrames, one per range in ``ranges``, each indexed by 1-based sheet row number
+
+    """
+    return single_flight(
+        key=('ranges', spread, tuple(ranges)),
+        fetch=lambda: _read_google_spreadsheet_ranges(
+            spread=spread,
+            ranges=ranges,
+            timeout=timeout,
+            max_retries=max_retries,
+        ),
+    )
+
+
+def _read_google_spreadsheet_ranges(
+    spread: str,
+    ranges: List[Union[int, str]],
+    timeout: float,
+    max_retries: int,
+) -> List[pd.DataFrame]:
+    """Read several sheets and/or ranges of a Google Spreadsheet without coalescing reads."""
+    range_names = list()
+    range_merges = list()
+
+    for sheet_or_range in ranges:
+        if isinstance(sheet_or_range, int):
+            sheets = _get_google_spreadsheet_sheets(spread=spread)
+
+            try:
+                sheet_metadata = sheets[sheet_or_range]
+            except IndexError:
+                raise gspread.exceptions.WorksheetNotFound(f'Invalid sheet index {sheet_or_range}')
+
+            range_names.append(gspread.utils.absolute_range_name(sheet_metadata['title']))
+            range_merges.append(sheet_metadata['merges'])
+        else:
+            range_names.append(sheet_or_range)
+            range_merges.append([])
+
+    value_ranges = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=range_names,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+
+    dfs = list()
+
+    for (first_row_number, values), merges in zip(value_ranges, range_merges):
+        values = _fix_merged_cell_values(values=values, merges=merges)
+
+        dfs.append(
+            _values_to_df(
+                values=values[1:],
+                col_names=pd.Index(values[0] if values else []),
+                first_row_number=first_row_number + 1,
+            )
+        )
+
+    return dfs
+
+
+def _values_to_df(
+    values: List[List[str]],
+    col_names: pd.Index,
+    first_row_number: int,
+) -> pd.DataFrame:
+    """
+    Parse raw sheet values into a DataFrame the same way ``gspread_pandas``'s
+    ``sheet_to_df(index=None)`` does, indexed by each row's 1-based row number in the sheet.
+
+    Parameters
+    ----------
+    values: list
+        List of rows of cell values, without the header row
+    col_names: pd.Index
+        Column names parsed from the header row
+    first_row_number: int
+        Row number in the sheet of the first row in ``values``
+
+    Returns
+    -------
+    pd.DataFrame
+
+    """
+    df = (
+        pd.DataFrame(
+            data=gspread.utils.fill_gaps(values, cols=len(col_names)) if values else None,
+            index=range(first_row_number, first_row_number + len(values)),
+        )
+        .replace('', np.nan)
+        .dropna(how='all')
+        .fillna('')
+    )
+
+    return gspread_pandas.util.set_col_names(df=df, col_names=col_names)
+
+
+def _get_column_letter(col: int) -> str:
+    """Get the A1-notation letter(s) of a 1-based column number, such as ``AB`` for ``28``."""
+    return re.sub(pattern=r'\d', repl='', string=gspread.utils.rowcol_to_a1(row=1, col=col))
+
+
+def _get_column_spans(
+    header: List[str],
+    exclude_columns: Iterable[str],
+) -> List[Tuple[int, int]]:
+    """
+    Group the columns of a header row not in ``exclude_columns`` into contiguous spans, so the
+    columns can be requested as few ranges as possible.
+
+    Parameters
+    ----------
+    header: list
+        Values of the header row of a sheet
+    exclude_columns: list
+        Header names of columns to leave out
+
+    Returns
+    -------
+    column_spans: list
+        List of ``(first column, last column)`` tuples of 1-based, inclusive column numbers
+
+    """
+    column_spans = list()
+
+    for col, col_name in enumerate(header, start=1):
+        if col_name in exclude_columns:
+            continue
+
+        if column_spans and column_spans[-1][1] == col - 1:
+            column_spans[-1] = (column_spans[-1][0], col)
+        else:
+            column_spans.append((col, col))
+
+    return column_spans
+
+
+def _batch_get_google_spreadsheet_column_spans(
+    spread: str,
+    sheet_title: str,
+    column_spans: List[Tuple[int, int]],
+    first_row_number: int,
+    timeout: float = 7,
+) -> Tuple[int, List[List[str]]]:
+    """
+    Get the raw values of several column spans of a sheet, from ``first_row_number`` down to the
+    last row, in a single ``values:batchGet`` request, stitched back together into full rows.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    sheet_title: str
+        Title of the sheet to read
+    column_spans: list
+        List of ``(first column, last column)`` tuples of 1-based, inclusive column numbers
+    first_row_number: int
+        Row number in the sheet of the first row to get
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+
+    Returns
+    -------
+    first_row_number: int
+        Row number in the sheet of the first row in ``values``
+    values: list
+        List of rows of cell values, each with one value for every column in ``column_spans``
+
+    """
+    if len(column_spans) == 0:
+        return first_row_number, []
+
+    value_ranges = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=[
+            gspread.utils.absolute_range_name(
+                sheet_name=sheet_title,
+                range_name=(
+                    f'{_get_column_letter(col=first_col)}{first_row_number}:'
+                    f'{_get_column_letter(col=last_col)}'
+                ),
+            )
+            for first_col, last_col in column_spans
+        ],
+        timeout=timeout,
+    )
+
+    # every span starts at the same row, but trailing empty rows are trimmed from each separately
+    num_rows = max(len(span_values) for _, span_values in value_ranges)
+    values = [list() for _ in range(num_rows)]
+
+    for (_, span_values), (first_col, last_col) in zip(value_ranges, column_spans):
+        span_width = last_col - first_col + 1
+
+        for row, span_row in zip(values, span_values + [[]] * (num_rows - len(span_values))):
+            row.extend(span_row + [''] * (span_width - len(span_row)))
+
+    return value_ranges[0][0], values
+
+
+def _download_google_spreadsheet_df(
+    spread: str,
+    sheet: int,
+    exclude_columns: Tuple[str, ...],
+) -> Tuple[pd.DataFrame, Optional[List[Tuple[int, int]]]]:
+    """
+    Download a sheet of a Google Spreadsheet, leaving out the columns in ``exclude_columns``.
+
+    Without a projection, this is a single ``values:batchGet`` request for the entire sheet. With
+    one, the header row is requested first, followed by a single request for only the spans of
+    columns that are not excluded.
+
+    Returns
+    -------
+    df: pd.DataFrame
+    column_spans: list
+        Spans of columns downloaded, or ``None`` if every column was downloaded
+
+    """
+    if not exclude_columns:
+        return read_google_spreadsheet_ranges(spread=spread, ranges=[sheet])[0], None
+
+    try:
+        sheet_title = _get_google_spreadsheet_sheets(spread=spread)[sheet]['title']
+    except IndexError:
+        raise gspread.exceptions.WorksheetNotFound(f'Invalid sheet index {sheet}')
+
+    header_values = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=[gspread.utils.absolute_range_name(sheet_name=sheet_title, range_name='1:1')],
+    )[0][1]
+
+    column_spans = _get_column_spans(
+        header=header_values[0] if header_values else [],
+        exclude_columns=exclude_columns,
+    )
+
+    first_row_number, values = _batch_get_google_spreadsheet_column_spans(
+        spread=spread,
+        sheet_title=sheet_title,
+        column_spans=column_spans,
+        first_row_number=1,
+    )
+
+    df = _values_to_df(
+        values=values[1:],
+        col_names=pd.Index(values[0] if values else []),
+        first_row_number=first_row_number + 1,
+    )
+
+    return df, column_spans
+
+
+def download_google_spreadsheet(
+    spread: str,
+    sheet: int,
+    exclude_columns: Tuple[str, ...] = (),
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Download an entire sheet of a Google Spreadsheet, in a single ``values:batchGet`` request for
+    the sheet's data (plus one for its header row if ``exclude_columns`` is given).
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to read in
+    sheet: int
+        Sheet of the Google Spreadsheet to read in
+    exclude_columns: tuple
+        Header names of columns to leave out of the download
+
+    Returns
+    -------
+    df: pd.DataFrame
+    metadata: dict
+        Snapshot metadata needed to later pull only the rows appended after this download
+
+    """
+    try:
+        df, column_spans = _download_google_spreadsheet_df(
+            spread=spread,
+            sheet=sheet,
+            exclude_columns=exclude_columns,
+        )
+    except gspread.exceptions.APIError:
+        # the cached sheet titles may be out of date if a sheet was renamed - fetch them again
+        with _spreadsheet_metadata_cache_lock:
+            _spreadsheet_metadata_cache.pop(gspread.utils.extract_id_from_url(url=spread), None)
+
+        df, column_spans = _download_google_spreadsheet_df(
+            spread=spread,
+            sheet=sheet,
+            exclude_columns=exclude_columns,
+        )
+
+    sheet_metadata = _get_google_spreadsheet_sheets(spread=spread)[sheet]
+
+    col_names = df.columns
+    num_rows = df.index.max() if len(df) > 0 else 1
+
+    metadata = {
+        'sheet_title': sheet_metadata['title'],
+        'num_rows': int(num_rows),
+        'num_columns': len(col_names),
+        'column_spans': column_spans,
+        'full_synced_at': time.time(),
+    }
+
+    return df, metadata
+
+
+def download_appended_google_spreadsheet_rows(
+    spread: str,
+    snapshot_df: pd.DataFrame,
+    metadata: Dict[str, Any],
+    timeout: float = 7,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Download only the rows appended to a sheet of a Google Spreadsheet since its snapshot was last
+    synced, in a single request for the range below the last row already in the snapshot (limited
+    to the snapshot's columns if it is of a projection of the sheet).
+
+    Edits to existing rows are not picked up here, so this is only used when the spreadsheet's
+    version cannot be checked - they are caught by the periodic full resync.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    snapshot_df: pd.DataFrame
+        DataFrame from the local snapshot
+    metadata: dict
+        Snapshot metadata returned by ``download_google_spreadsheet`` or this function
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+
+    Returns
+    -------
+    df: pd.DataFrame
+        ``snapshot_df`` with any appended rows added to the end
+    metadata: dict
+        Updated snapshot metadata
+
+    """
+    first_row_number, appended_values = _batch_get_google_spreadsheet_column_spans(
+        spread=spread,
+        sheet_title=metadata['sheet_title'],
+        column_spans=metadata.get('column_spans') or [(1, metadata['num_columns'])],
+        first_row_number=metadata['num_rows'] + 1,
+        timeout=timeout,
+    )
+
+    if len(appended_values) == 0:
+        return snapshot_df, metadata
+
+    appended_df = _values_to_df(
+        values=appended_values,
+        col_names=snapshot_df.columns,
+        first_row_number=first_row_number,
+    )
+
+    return (
+        pd.concat(objs=[snapshot_df, appended_df]),
+        {**metadata, 'num_rows': first_row_number + len(appended_values) - 1},
+    )
+
+
+def get_google_spreadsheet_version(spread: str) -> str:
+    """
+    Get the Google Drive version of a Google Spreadsheet, which changes whenever any of its cells
+    change, in a single lightweight Drive ``files.get`` request. Makes no Streamlit calls.
+
+    """
+    spreadsheet_id = gspread.utils.extract_id_from_url(url=spread)
+
+    response = single_flight(
+        key=('spreadsheet_version', spreadsheet_id),
+        fetch=lambda: _request_google_sheets_api(
+            method='get',
+            endpoint=f'{gspread.urls.DRIVE_FILES_API_V3_URL}/{spreadsheet_id}',
+            params={'fields': 'version,modifiedTime', 'supportsAllDrives': True},
+        ),
+    )
+
+    file_metadata = response.json()
+
+    return str(file_metadata.get('version') or file_metadata['modifiedTime'])
+
+
+def download_google_spreadsheet_row(spread: str, sheet: int, row_number: int) -> Dict[str, str]:
+    """
+    Download a single row of a sheet of a Google Spreadsheet, along with its header row, in a
+    single ``values:batchGet`` request. Makes no Streamlit calls.
+
+    """
+    sheet_title = _get_google_spreadsheet_sheets(spread=spread)[sheet]['title']
+
+    (_, header_values), (_, row_values) = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=[
+            gspread.utils.absolute_range_name(sheet_name=sheet_title, range_name='1:1'),
+            gspread.utils.absolute_range_name(
+                sheet_name=sheet_title,
+                range_name=f'{row_number}:{row_number}',
+            ),
+        ],
+    )
+
+    return dict(zip(header_values[0] if header_values else [], row_values[0] if row_values else []))
+
+
+def download_google_spreadsheet_header(spread: str, sheet: int) -> List[str]:
+    """
+    Download the header row of a sheet of a Google Spreadsheet in a single ``values:batchGet``
+    request. Makes no Streamlit calls.
+
+    """
+    sheet_title = _get_google_spreadsheet_sheets(spread=spread)[sheet]['title']
+
+    ((_, header_values),) = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=[gspread.utils.absolute_range_name(sheet_name=sheet_title, range_name='1:1')],
+    )
+
+    return list(header_values[0]) if header_values else list()
+
+
+def download_google_spreadsheet_column(spread: str, sheet: int, column: str) -> List[str]:
+    """
+    Download every value of a single column of a sheet of a Google Spreadsheet, found by its header
+    name, from Google Sheets itself rather than any cached copy or local snapshot. Makes no
+    Streamlit calls.
+
+    Raises
+    ------
+    KeyError
+        If the sheet's header row has no ``column``
+
+    """
+    header = download_google_spreadsheet_header(spread=spread, sheet=sheet)
+
+    if column not in header:
+        raise KeyError(f'Sheet {sheet} of {spread} has no "{column}" column.')
+
+    sheet_title = _get_google_spreadsheet_sheets(spread=spread)[sheet]['title']
+    column_letter = _get_column_letter(col=header.index(column) + 1)
+
+    ((_, values),) = _batch_get_google_spreadsheet_values(
+        spread=spread,
+        range_names=[
+            gspread.utils.absolute_range_name(
+                sheet_name=sheet_title,
+                range_name=f'{column_letter}2:{column_letter}',
+            ),
+        ],
+    )
+
+    return [row[0] if row else '' for row in values]
+
+
+def append_rows_to_google_spreadsheet(
+    spread: str,
+    rows: List[List[str]],
+    timeout: float = 7,
+    max_retries: int = 3,
+) -> None:
+    """
+    Append rows to the first sheet of a Google Spreadsheet with one call to the Sheets
+    ``values:append`` API, which writes either every row or none of them. Makes no Streamlit calls.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    rows: list
+        List of rows of cell values, each written positionally starting at the first column
+    timeout: float
+        How long to wait, in seconds, for the server to send data before giving up
+    max_retries: int
+        Number of times to retry connecting before giving up and raising a
+        ``GoogleSheetsUnavailableError``. Only connection timeouts are retried, since the rows were
+        never sent
+
+    """
+    # with no sheet name, ``A1`` is the first sheet of the spreadsheet (``sheet=0``)
+    _request_google_sheets_api(
+        method='post',
+        endpoint=gspread.urls.SPREADSHEET_VALUES_APPEND_URL % (
+            gspread.utils.extract_id_from_url(url=spread),
+            'A1',
+        ),
+        params={
+            'valueInputOption': 'USER_ENTERED',
+            'insertDataOption': 'INSERT_ROWS',
+        },
+        json={'values': rows},
+        timeout=timeout,
+        max_retries=max_retries,
+        retry_on=(requests.exceptions.ConnectTimeout,),
+    )
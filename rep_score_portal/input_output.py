@@ -1,13 +1,28 @@
+import collections
+import concurrent.futures
 from datetime import datetime
-import os
+import sqlite3
+import threading
 import time
-from typing import List
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+import uuid
 
-import boto3
-import gspread_pandas
+import gspread
+import numpy as np
 import pandas as pd
 import requests
 import streamlit as st
+from streamlit.logger import get_logger
 
 from config import (
     AGENCY_CREATIVE_LABEL_1,
@@ -15,26 +30,135 @@ from config import (
     AGENCY_CREATIVE_LABEL_3,
     AGENCY_CREATIVE_LABEL_4,
     AGENCY_CREATIVE_LABEL_5,
+    ASSET_TRACKER_NOTE_COLUMNS,
+    CHANGE_FEED_POLL_INTERVAL_SECONDS,
     DEI_CREATIVE_REVIEWS_LABEL_1,
     DEI_CREATIVE_REVIEWS_LABEL_2,
     DEI_CREATIVE_REVIEWS_LABEL_3,
     DEI_CREATIVE_REVIEWS_LABEL_4,
     DEI_CREATIVE_REVIEWS_LABEL_5,
+    GOOGLE_SHEETS_CLIENT_POOL_SIZE,
     MARKETING_LABEL_1,
     MARKETING_LABEL_2,
     MARKETING_LABEL_3,
     MARKETING_LABEL_4,
+    SPREADSHEET_CACHE_MAX_STALE_SECONDS,
+    SPREADSHEET_CACHE_TTL_SECONDS,
+)
+from google_sheets import (
+    GoogleSheetsUnavailableError,
+    increment_google_sheets_client_stat,
+    single_flight,
+)
+from storage import get_storage
+from submission_queue import (
+    check_submission_id_column,
+    enqueue_row,
+    get_pending_rows,
+    get_queued_row,
+    MissingSubmissionIDColumnError,
+    QueuedRow,
+    start_submission_queue_worker,
 )
 
 
-def read_google_spreadsheet(
+_logger = get_logger(__name__)
+
+# process-wide cache shared by every session, mapping ``(spread, sheet, exclude_columns)`` to a
+# tuple of ``(time the sheet was fetched, DataFrame, Google Drive version of the spreadsheet)``
+_spreadsheet_cache: Dict[
+    Tuple[str, int, Tuple[str, ...]],
+    Tuple[float, pd.DataFrame, Optional[str]],
+] = dict()
+# bumped on every invalidation of a ``(spread, sheet)`` so a fetch of any projection of it started
+# before a write never re-caches stale data
+_spreadsheet_cache_generations: Dict[Tuple[str, int], int] = dict()
+# cache keys of expired sheets currently being re-fetched in the background
+_spreadsheet_cache_revalidations: Set[Tuple[str, int, Tuple[str, ...]]] = set()
+_spreadsheet_cache_lock = threading.Lock()
+
+# note columns of single portal backend rows, mapping ``(spread, sheet, row number)`` to a tuple of
+# ``(time the row was fetched, (asset name, username) of the row, dictionary of note column names
+# to values)``
+_asset_tracker_notes_cache: Dict[
+    Tuple[str, int, int],
+    Tuple[float, Tuple[str, str], Dict[str, str]],
+] = dict()
+_asset_tracker_notes_cache_lock = threading.Lock()
+
+# the portal backend DataFrame with its ``Date Submitted`` column parsed and any rows still in the
+# submission queue added, alongside the raw cached DataFrame and queued row IDs it was derived from
+_asset_tracker_df_cache: Dict[str, Optional[object]] = {
+    'source': None,
+    'queued_row_ids': None,
+    'parsed': None,
+}
+_asset_tracker_df_cache_lock = threading.Lock()
+
+
+class UserAssetPermissionIndex(NamedTuple):
+    """Mappings of every username to the assets they can view, and every asset to its users."""
+
+    user_assets: Dict[str, FrozenSet[str]]
+    asset_users: Dict[str, FrozenSet[str]]
+
+
+# row positions of every value of a column of a shared DataFrame, mapping column names to a tuple of
+# ``(DataFrame the index was built from, dictionary of values to row positions)``
+_row_partition_cache: Dict[str, Tuple[pd.DataFrame, Dict[Any, np.ndarray]]] = dict()
+_row_partition_cache_lock = threading.Lock()
+
+# the permission index shared by every session, alongside the raw cached project tracker and
+# portal backend DataFrames it was built from
+_permission_index_cache: Dict[str, Optional[object]] = {'sources': None, 'index': None}
+_permission_index_cache_lock = threading.Lock()
+
+# background thread watching the portal's spreadsheets for changes, started on first use
+_change_feed_poller: Dict[str, Optional[threading.Thread]] = {'thread': None}
+_change_feed_poller_lock = threading.Lock()
+# bumped whenever the change feed poller refreshes the cache with changed data, so sessions know
+# to drop anything they derived from the previous data
+_data_version = {'version': 0}
+_data_version_lock = threading.Lock()
+
+# worker threads used to read independent sheets concurrently, shared by every session
+_google_sheets_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=GOOGLE_SHEETS_CLIENT_POOL_SIZE,
+    thread_name_prefix='google_sheets',
+)
+
+
+class StaleAssetTrackerRowError(Exception):
+    """Raised when a row number of the asset tracker now points at a different asset."""
+
+
+def _display_google_sheets_connection_error(message_placeholder: st.empty) -> None:
+    """Display an error message that Google Sheets could not be reached and stop the script."""
+    message_placeholder.error(
+        "Hmm... we're currently having some trouble connecting to Google Sheets - please try "
+        'refreshing the window to attempt the connection again. If the problem persists, please '
+        'click the "Having issues?" link in the sidebar and let us know. Sorry about this!'
+    )
+    st.stop()
+
+
+def read_google_spreadsheet_df(
     spread: str,
     sheet: int = 0,
-    timeout: float = 7,
-    max_retries: int = 3,
-) -> gspread_pandas.spread.Spread:
+    ttl: float = SPREADSHEET_CACHE_TTL_SECONDS,
+    exclude_columns: Iterable[str] = (),
+) -> pd.DataFrame:
     """
-    Read a Google Spreadsheet using the ``gspread_pandas`` library.
+    Read a Google Spreadsheet into a Pandas DataFrame through a process-wide cache shared by every
+    session, only fetching the sheet again once the cached copy is older than ``ttl`` seconds or
+    has been invalidated with ``invalidate_spreadsheet_cache``. Cache misses are served from the
+    sheet's local snapshot, only downloading the sheet again if its spreadsheet has changed.
+
+    The returned DataFrame is shared across sessions and should be treated as read-only - filter it
+    or make a copy before modifying it.
+
+    If Google Sheets cannot be reached, a Streamlit error message is displayed and the script is
+    stopped.
 
     Parameters
     ----------
@@ -42,109 +166,709 @@ def read_google_spreadsheet(
         URL of the Google Spreadsheet to read in
     sheet: int
         Sheet of the Google Spreadsheet to read in
-    timeout: float
-        How long to wait, in seconds, for the server to send data before giving up
-    max_retries: int
-        Number of times to retry a request before giving up and displaying a Streamlit error message
+    ttl: float
+        Maximum age, in seconds, of a cached sheet before it is fetched again
+    exclude_columns: list
+        Header names of columns to leave out of the DataFrame. These columns are never downloaded,
+        and each projection of a sheet is cached and snapshotted separately
 
     Returns
     -------
-    gspread_pandas.spread.Spread
-
-    """
-    config = {
-        'type': st.secrets['gcp']['type'],
-        'project_id': st.secrets['gcp']['project_id'],
-        'private_key_id': st.secrets['gcp']['private_key_id'],
-        'private_key': st.secrets['gcp']['private_key'],
-        'client_email': st.secrets['gcp']['client_email'],
-        'client_id': st.secrets['gcp']['client_id'],
-        'auth_uri': st.secrets['gcp']['auth_uri'],
-        'token_uri': st.secrets['gcp']['token_uri'],
-        'auth_provider_x509_cert_url': st.secrets['gcp']['auth_provider_x509_cert_url'],
-        'client_x509_cert_url': st.secrets['gcp']['client_x509_cert_url'],
-    }
+    pd.DataFrame
+
+    """
+    try:
+        return read_cached_google_spreadsheet_df(
+            spread=spread,
+            sheet=sheet,
+            ttl=ttl,
+            exclude_columns=tuple(exclude_columns),
+        )
+    except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+        _logger.warning(e)
+
+        _display_google_sheets_connection_error(message_placeholder=st.empty())
+
+
+def read_google_spreadsheets_concurrently(
+    sheets: Iterable[Tuple],
+    ttl: float = SPREADSHEET_CACHE_TTL_SECONDS,
+) -> Dict[Tuple, concurrent.futures.Future]:
+    """
+    Start reading several Google Spreadsheets through the process-wide cache at once, so the time
+    to read all of them is that of the slowest sheet rather than the sum of every sheet.
+
+    Pass each returned future to ``wait_for_google_spreadsheet_df`` to get its DataFrame.
+
+    Parameters
+    ----------
+    sheets: list
+        List of ``(spread, sheet)`` tuples to read, where ``spread`` is the URL of the Google
+        Spreadsheet and ``sheet`` is the sheet of it to read. A tuple may also have a third
+        ``exclude_columns`` element - see ``read_google_spreadsheet_df``
+    ttl: float
+        Maximum age, in seconds, of a cached sheet before it is fetched again
+
+    Returns
+    -------
+    futures: dict
+        Dictionary mapping each tuple in ``sheets`` to a future resolving to its DataFrame
+
+    """
+    futures = dict()
+
+    for sheet_key in sheets:
+        spread, sheet, *exclude_columns = sheet_key
+
+        futures[sheet_key] = _google_sheets_executor.submit(
+            read_cached_google_spreadsheet_df,
+            spread,
+            sheet,
+            ttl,
+            tuple(exclude_columns[0]) if exclude_columns else (),
+        )
+
+    return futures
+
+
+def wait_for_google_spreadsheet_df(future: concurrent.futures.Future) -> pd.DataFrame:
+    """
+    Wait for a sheet being read by ``read_google_spreadsheets_concurrently``. If Google Sheets could
+    not be reached, a Streamlit error message is displayed and the script is stopped.
+
+    Parameters
+    ----------
+    future: concurrent.futures.Future
+
+    Returns
+    -------
+    pd.DataFrame
+
+    """
+    try:
+        return future.result()
+    except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+        _logger.warning(e)
+
+        _display_google_sheets_connection_error(message_placeholder=st.empty())
+
+
+def read_cached_google_spreadsheet_df(
+    spread: str,
+    sheet: int,
+    ttl: float,
+    exclude_columns: Tuple[str, ...] = (),
+) -> pd.DataFrame:
+    """
+    Read a Google Spreadsheet into a Pandas DataFrame through the process-wide cache without making
+    any Streamlit calls, raising errors rather than displaying them - for use outside of a session's
+    script thread, such as while warming up the cache. See ``read_google_spreadsheet_df`` for more
+    details.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to read in
+    sheet: int
+        Sheet of the Google Spreadsheet to read in
+    ttl: float
+        Maximum age, in seconds, of a cached sheet before it is fetched again
+    exclude_columns: tuple
+        Header names of columns to leave out of the DataFrame
+
+    Returns
+    -------
+    pd.DataFrame
+
+    Raises
+    ------
+    GoogleSheetsUnavailableError
+        If the sheet could be read from neither Google Sheets nor a local snapshot
+
+    """
+    with _spreadsheet_cache_lock:
+        cached = _spreadsheet_cache.get((spread, sheet, exclude_columns))
+
+    if cached is not None:
+        age = time.monotonic() - cached[0]
+
+        if age < ttl:
+            return cached[1]
+
+        if age < ttl + SPREADSHEET_CACHE_MAX_STALE_SECONDS:
+            # serve the expired DataFrame right away rather than making this session wait
+            _revalidate_cached_google_spreadsheet_df(
+                spread=spread,
+                sheet=sheet,
+                exclude_columns=exclude_columns,
+            )
+            increment_google_sheets_client_stat('stale_reads_served')
+
+            return cached[1]
+
+    return _refresh_cached_google_spreadsheet_df(
+        spread=spread,
+        sheet=sheet,
+        exclude_columns=exclude_columns,
+    )
+
+
+def _refresh_cached_google_spreadsheet_df(
+    spread: str,
+    sheet: int,
+    exclude_columns: Tuple[str, ...],
+) -> pd.DataFrame:
+    """
+    Read a sheet from the storage backend (syncing its local snapshot, for Google Sheets) and store
+    the result in the process-wide cache, unless the sheet was invalidated while it was being read.
+    Concurrent refreshes of the same sheet share a single read and DataFrame.
+
+    """
+    cache_key = (spread, sheet, exclude_columns)
+
+    with _spreadsheet_cache_lock:
+        generation = _spreadsheet_cache_generations.get((spread, sheet), 0)
+
+    def _fetch_df() -> pd.DataFrame:
+        with _spreadsheet_cache_lock:
+            cached = _spreadsheet_cache.get(cache_key)
+
+        df, version = get_storage().read_sheet(
+            spread=spread,
+            sheet=sheet,
+            exclude_columns=exclude_columns,
+            cached=(cached[1], cached[2]) if cached is not None else None,
+        )
+
+        with _spreadsheet_cache_lock:
+            if _spreadsheet_cache_generations.get((spread, sheet), 0) == generation:
+                _spreadsheet_cache[cache_key] = (time.monotonic(), df, version)
+
+        return df
 
-    client = gspread_pandas.client.Client(config=config)
-    client.set_timeout(timeout=timeout)
+    # the generation is part of the key, so a read started after an invalidation never joins a
+    # fetch that started before it
+    return single_flight(key=('sheet', *cache_key, generation), fetch=_fetch_df)
 
-    message_placeholder = st.empty()
 
-    for retry_idx in range(max_retries):
+def _revalidate_cached_google_spreadsheet_df(
+    spread: str,
+    sheet: int,
+    exclude_columns: Tuple[str, ...],
+) -> None:
+    """
+    Re-fetch an expired cached sheet in the background, unless it is already being re-fetched.
+    Failures are only logged, leaving the expired DataFrame in the cache.
+
+    """
+    cache_key = (spread, sheet, exclude_columns)
+
+    with _spreadsheet_cache_lock:
+        if cache_key in _spreadsheet_cache_revalidations:
+            return
+
+        _spreadsheet_cache_revalidations.add(cache_key)
+
+    def _revalidate() -> None:
         try:
-            return gspread_pandas.spread.Spread(
+            _refresh_cached_google_spreadsheet_df(
                 spread=spread,
                 sheet=sheet,
-                config=config,
-                client=client,
+                exclude_columns=exclude_columns,
             )
-        except (requests.exceptions.ConnectTimeout, requests.exceptions.ReadTimeout):
-            retries_left = max_retries - retry_idx - 1
+        except Exception as e:
+            # nobody is waiting on this future, so an exception would otherwise vanish silently
+            _logger.warning(f'Could not revalidate sheet {sheet} of {spread}: {e}')
+        finally:
+            with _spreadsheet_cache_lock:
+                _spreadsheet_cache_revalidations.discard(cache_key)
+
+    _google_sheets_executor.submit(_revalidate)
+
+
+def invalidate_spreadsheet_cache(
+    spread: Optional[str] = None,
+    sheet: Optional[int] = None,
+    join_in_flight_fetches: bool = False,
+) -> None:
+    """
+    Invalidate cached sheets so the next read fetches them from Google Sheets again.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to invalidate. If ``None``, every cached spreadsheet is
+        invalidated
+    sheet: int
+        Sheet of the Google Spreadsheet to invalidate. If ``None``, every sheet of ``spread`` is
+        invalidated
+    join_in_flight_fetches: bool
+        If ``True``, the next read may share a fetch of the sheet that was already in flight when
+        it was invalidated, rather than always starting a new fetch. This keeps a burst of users
+        asking for fresh data down to a single fetch, but should not be used after a write, since a
+        fetch already in flight may not include it
+
+    Side Effects
+    ------------
+    Removes (or expires) entries from the process-wide spreadsheet and asset tracker notes caches.
+
+    """
+    def _matches(cache_key: Tuple) -> bool:
+        return (
+            (spread is None or cache_key[0] == spread)
+            and (sheet is None or cache_key[1] == sheet)
+        )
+
+    with _spreadsheet_cache_lock:
+        sheet_keys = {
+            cache_key[:2]
+            for cache_key in set(_spreadsheet_cache) | set(_spreadsheet_cache_generations)
+            if _matches(cache_key=cache_key)
+        }
+
+        if spread is not None and sheet is not None:
+            sheet_keys.add((spread, sheet))
+
+        for cache_key in [cache_key for cache_key in _spreadsheet_cache if _matches(cache_key)]:
+            if join_in_flight_fetches:
+                # keep the DataFrame and its version, but mark it as too old to serve, so the next
+                # read only re-downloads the sheet if the spreadsheet actually changed
+                _, df, version = _spreadsheet_cache[cache_key]
+                _spreadsheet_cache[cache_key] = (float('-inf'), df, version)
+            else:
+                _spreadsheet_cache.pop(cache_key)
+
+        if not join_in_flight_fetches:
+            # fetches already in flight will neither be joined nor store their now-stale result
+            for sheet_key in sheet_keys:
+                _spreadsheet_cache_generations[sheet_key] = (
+                    _spreadsheet_cache_generations.get(sheet_key, 0) + 1
+                )
+
+    with _asset_tracker_notes_cache_lock:
+        for cache_key in [
+            cache_key for cache_key in _asset_tracker_notes_cache if _matches(cache_key)
+        ]:
+            _asset_tracker_notes_cache.pop(cache_key)
+
+
+def get_data_version() -> int:
+    """
+    Get the version of the data in the process-wide spreadsheet cache, bumped whenever the change
+    feed poller refreshes the cache with changed data.
+
+    Returns
+    -------
+    version: int
+
+    """
+    with _data_version_lock:
+        return _data_version['version']
+
+
+def get_stale_data_age() -> Optional[float]:
+    """
+    Get the age of the oldest sheet in the process-wide spreadsheet cache that is past its
+    ``SPREADSHEET_CACHE_TTL_SECONDS`` time-to-live but still being served while it is re-fetched in
+    the background, i.e. for up to ``SPREADSHEET_CACHE_MAX_STALE_SECONDS`` more.
+
+    Returns
+    -------
+    age: float
+        Age of the sheet, in seconds. If no stale sheet is being served, ``None`` is returned
+
+    """
+    now = time.monotonic()
+
+    with _spreadsheet_cache_lock:
+        ages = [now - cached[0] for cached in _spreadsheet_cache.values()]
+
+    stale_ages = [
+        age
+        for age in ages
+        if SPREADSHEET_CACHE_TTL_SECONDS
+        <= age
+        < SPREADSHEET_CACHE_TTL_SECONDS + SPREADSHEET_CACHE_MAX_STALE_SECONDS
+    ]
+
+    return max(stale_ages) if stale_ages else None
+
+
+def _poll_spreadsheet_changes(spreads: Tuple[str, ...]) -> bool:
+    """
+    Check whether any spreadsheet changed since its sheets were cached and, if so, refresh every
+    cached sheet of it. Makes no Streamlit calls.
+
+    Parameters
+    ----------
+    spreads: tuple
+        URLs of the Google Spreadsheets to check
+
+    Returns
+    -------
+    changed: bool
+        Whether any cached sheet was refreshed with changed data
+
+    Side Effects
+    ------------
+    Updates the process-wide spreadsheet cache and, if any sheet changed, bumps the data version.
+
+    """
+    changed = False
+
+    for spread in spreads:
+        with _spreadsheet_cache_lock:
+            cached_sheets = {
+                cache_key: cached
+                for cache_key, cached in _spreadsheet_cache.items()
+                if cache_key[0] == spread
+            }
+
+        if not cached_sheets:
+            # nobody has read this spreadsheet yet, so there is nothing to keep fresh
+            continue
+
+        try:
+            version = get_storage().get_version(spread=spread)
+        except Exception as e:
+            _logger.warning(f'Could not check {spread} for changes: {e}')
+
+            continue
+
+        for (_, sheet, exclude_columns), (_, cached_df, cached_version) in cached_sheets.items():
+            if cached_version == version:
+                continue
+
+            try:
+                df = _refresh_cached_google_spreadsheet_df(
+                    spread=spread,
+                    sheet=sheet,
+                    exclude_columns=exclude_columns,
+                )
+            except Exception as e:
+                _logger.warning(f'Could not refresh changed sheet {sheet} of {spread}: {e}')
+
+                continue
+
+            # another sheet of the spreadsheet may have been the one that changed
+            changed = changed or (df is not cached_df and not df.equals(cached_df))
+
+    if changed:
+        with _data_version_lock:
+            _data_version['version'] += 1
+
+    return changed
+
+
+def _run_change_feed_poller(spreads: Tuple[str, ...]) -> None:
+    """
+    Check the spreadsheets for changes every ``CHANGE_FEED_POLL_INTERVAL_SECONDS``. Runs forever in
+    a background thread.
+
+    """
+    while True:
+        try:
+            _poll_spreadsheet_changes(spreads=spreads)
+        except Exception as e:
+            # keep the poller alive no matter what and try again next time
+            _logger.warning(f'Could not poll spreadsheets for changes: {e}')
+
+        time.sleep(CHANGE_FEED_POLL_INTERVAL_SECONDS)
+
 
-            message_placeholder.info(
-                body=f'Retrying the connection to Google Sheets {retries_left} more time(s)...',
+def start_change_feed_poller() -> None:
+    """
+    Start the background thread that keeps the process-wide spreadsheet cache of the portal
+    backend, project tracker, and primary dataset up to date, unless it is already running.
+
+    Every ``CHANGE_FEED_POLL_INTERVAL_SECONDS``, the poller checks each spreadsheet's Google Drive
+    version and refreshes its cached sheets if it changed, so sessions never need to fetch changed
+    data themselves. Sessions should compare ``get_data_version`` against the version their data was
+    derived from to know when to rebuild it.
+
+    """
+    spreads = (
+        st.secrets['spreadsheets']['portal_backend_url'],
+        st.secrets['spreadsheets']['project_tracker_url'],
+        st.secrets['spreadsheets']['primary_dataset_url'],
+    )
+
+    with _change_feed_poller_lock:
+        if (
+            _change_feed_poller['thread'] is None
+            or not _change_feed_poller['thread'].is_alive()
+        ):
+            _change_feed_poller['thread'] = threading.Thread(
+                target=_run_change_feed_poller,
+                kwargs={'spreads': spreads},
+                name='change_feed_poller',
+                daemon=True,
             )
+            _change_feed_poller['thread'].start()
 
-            if retries_left > 0:
-                time.sleep(1)
 
-    # if we have made it here, we have failed - let's tell the user
-    message_placeholder.error(
-        "Hmm... we're currently having some trouble connecting to Google Sheets - please try "
-        'refreshing the window to attempt the connection again. If the problem persists, please '
-        'click the "Having issues?" link in the sidebar and let us know. Sorry about this!'
+def fetch_asset_tracker_df() -> pd.DataFrame:
+    """
+    Fetch the portal backend asset tracker shared by every session, with the ``Date Submitted``
+    column parsed into dates.
+
+    Only the lightweight columns needed by list and filter views are loaded - the long free-text
+    ``ASSET_TRACKER_NOTE_COLUMNS`` are left out, and can be fetched for a single row with
+    ``fetch_asset_tracker_notes``. The DataFrame is indexed by each row's row number in the sheet.
+
+    Rows still waiting in the submission queue to be written to the sheet are included as well, so
+    users see their submissions right away. These rows are indexed by their negated queued row ID.
+
+    The returned DataFrame is shared across sessions and should be treated as read-only - per-user
+    views should be created by filtering it.
+
+    Returns
+    -------
+    pd.DataFrame
+
+    """
+    return get_asset_tracker_df_from_sheet(
+        source_df=read_google_spreadsheet_df(
+            spread=st.secrets['spreadsheets']['portal_backend_url'],
+            sheet=0,
+            exclude_columns=ASSET_TRACKER_NOTE_COLUMNS,
+        ),
     )
-    st.stop()
 
 
-def upload_file_to_s3(uploaded_file: st.runtime.uploaded_file_manager, s3_key: str) -> str:
+def get_asset_tracker_df_from_sheet(source_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Upload a file to S3 to ``s3://trp-rep-score-assets/{s3_key}/{modified_filename}``.
+    Get the asset tracker returned by ``fetch_asset_tracker_df`` from the cached portal backend
+    sheet it is derived from, only deriving it again if that sheet or the submission queue changed.
+    Makes no Streamlit calls (other than reading ``st.secrets``), so it can be used to build the
+    shared asset tracker outside of a session's script thread.
 
     Parameters
     ----------
-    uploaded_file: st.runtime.uploaded_file_manager
-    s3_key: str
+    source_df: pd.DataFrame
+        Portal backend sheet read through the process-wide cache, without its
+        ``ASSET_TRACKER_NOTE_COLUMNS``
 
     Returns
     -------
-    modified_filename: str
-        Modified filename of the format
-        ``{uploaded_file.name}_{current_timestamp}.{uploaded_file.extension}``
+    pd.DataFrame
+
+    """
+    queued_rows = _get_queued_asset_tracker_rows(
+        spread=st.secrets['spreadsheets']['portal_backend_url'],
+    )
+    queued_row_ids = [queued_row.id for queued_row in queued_rows]
+
+    with _asset_tracker_df_cache_lock:
+        if (
+            _asset_tracker_df_cache['source'] is source_df
+            and _asset_tracker_df_cache['queued_row_ids'] == queued_row_ids
+        ):
+            return _asset_tracker_df_cache['parsed']
+
+    if 'Submission ID' in source_df.columns:
+        # a row may have been written to the sheet just before being marked as appended
+        appended_submission_ids = set(source_df['Submission ID'])
+
+        queued_rows = [
+            queued_row
+            for queued_row in queued_rows
+            if queued_row.idempotency_key not in appended_submission_ids
+        ]
+
+    if len(queued_rows) > 0:
+        # rows not yet written to the sheet have no row number - use the negated queued row ID
+        queued_df = (
+            pd.DataFrame(
+                data=[queued_row.row for queued_row in queued_rows],
+                index=[-queued_row.id for queued_row in queued_rows],
+            )
+            .reindex(columns=source_df.columns)
+            .fillna('')
+        )
+
+        asset_tracker_df = pd.concat(objs=[source_df, queued_df])
+    else:
+        asset_tracker_df = source_df.copy()
+
+    asset_tracker_df['Date Submitted'] = (
+        pd
+        .to_datetime(arg=asset_tracker_df['Date Submitted'], format='mixed')
+        .dt
+        .date
+    )
+
+    with _asset_tracker_df_cache_lock:
+        _asset_tracker_df_cache['source'] = source_df
+        _asset_tracker_df_cache['queued_row_ids'] = queued_row_ids
+        _asset_tracker_df_cache['parsed'] = asset_tracker_df
+
+    return asset_tracker_df
+
+
+def select_rows_by_column_values(
+    df: pd.DataFrame,
+    column: str,
+    values: Iterable[Any],
+) -> pd.DataFrame:
+    """
+    Select the rows of a shared DataFrame whose ``column`` is one of ``values``, materializing only
+    those rows.
+
+    Rather than every session scanning the entire column with ``isin``, the DataFrame is partitioned
+    by ``column`` once and the partition index is shared by every session, rebuilt only when ``df``
+    is a different DataFrame than the one it was built from (i.e. the cached sheet was refreshed).
+    Only one partition index is kept per column name, so this is meant for the process-wide cached
+    DataFrames returned by ``read_google_spreadsheet_df`` and friends.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+    column: str
+        Column to select rows by
+    values: list
+        Values of ``column`` of the rows to select
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows of ``df`` with a value of ``column`` in ``values``, in their original order
+
+    """
+    with _row_partition_cache_lock:
+        cached = _row_partition_cache.get(column)
+
+    if cached is not None and cached[0] is df:
+        partitions = cached[1]
+    else:
+        partitions = df.groupby(by=column, sort=False).indices
+
+        with _row_partition_cache_lock:
+            _row_partition_cache[column] = (df, partitions)
+
+    positions = [partitions[value] for value in set(values) if value in partitions]
+
+    if len(positions) == 0:
+        return df.iloc[0:0]
+
+    return df.take(indices=np.sort(np.concatenate(positions)))
+
+
+def resync_asset_tracker() -> None:
+    """
+    Throw away every cached and synced copy of the portal backend asset tracker, so the next read
+    downloads the whole sheet from Google Sheets again. Use when its row numbers can no longer be
+    trusted, e.g. after rows were sorted, inserted, or deleted in the sheet.
 
     Side Effects
     ------------
-    Writes a file to S3.
+    Invalidates the asset tracker in the process-wide caches, deletes its local snapshots (and, with
+    the SQLite replica, marks it to be copied again), and bumps the data version so every session
+    rebuilds its data.
 
     """
-    uploaded_filename, uploaded_file_extension = os.path.splitext(uploaded_file.name)
+    spread = st.secrets['spreadsheets']['portal_backend_url']
 
-    modified_filename = (
-        uploaded_filename
-        + '_'
-        + str(int(datetime.now().timestamp()))
-        + uploaded_file_extension
-    )
+    get_storage().resync_sheet(spread=spread, sheet=0)
+
+    invalidate_spreadsheet_cache(spread=spread, sheet=0)
+
+    with _data_version_lock:
+        _data_version['version'] += 1
+
+
+def fetch_asset_tracker_notes(
+    row_number: int,
+    asset_name: str,
+    username: str,
+    ttl: float = SPREADSHEET_CACHE_TTL_SECONDS,
+) -> Dict[str, str]:
+    """
+    Fetch the ``ASSET_TRACKER_NOTE_COLUMNS`` of a single row of the portal backend asset tracker,
+    which are left out of ``fetch_asset_tracker_df``. Rows are cached process-wide for ``ttl``
+    seconds, or until the portal backend is invalidated with ``invalidate_spreadsheet_cache``.
+
+    Row numbers come from a cached copy of the asset tracker, so the row is read along with its
+    ``Asset Name`` and ``Username`` columns, which must still match the asset it was selected as.
 
-    (
-        boto3
-        .client(
-            's3',
-            aws_access_key_id=st.secrets['aws']['access_key_id'],
-            aws_secret_access_key=st.secrets['aws']['secret_access_key'],
+    If Google Sheets cannot be reached, a Streamlit error message is displayed and the script is
+    stopped.
+
+    Parameters
+    ----------
+    row_number: int
+        Row number of the asset in the sheet, i.e. its index in ``fetch_asset_tracker_df``. Rows
+        still in the submission queue have negative row numbers and are read from the queue
+    asset_name: str
+        ``Asset Name`` of the asset in ``fetch_asset_tracker_df``
+    username: str
+        ``Username`` of the asset in ``fetch_asset_tracker_df``
+    ttl: float
+        Maximum age, in seconds, of a cached row before it is fetched again
+
+    Returns
+    -------
+    notes: dict
+        Dictionary mapping each note column name to its value in the row
+
+    Raises
+    ------
+    StaleAssetTrackerRowError
+        If the row is now a different asset, e.g. because rows were sorted, inserted, or deleted in
+        the sheet since the asset tracker was cached. The asset tracker is resynced with
+        ``resync_asset_tracker`` before this is raised, so it should be read again
+
+    """
+    if row_number < 0:
+        queued_row = get_queued_row(row_id=-int(row_number))
+        row = queued_row.row if queued_row is not None else dict()
+
+        return {col: row.get(col, '') for col in ASSET_TRACKER_NOTE_COLUMNS}
+
+    spread = st.secrets['spreadsheets']['portal_backend_url']
+    cache_key = (spread, 0, int(row_number))
+    identity = (str(asset_name), str(username))
+
+    with _asset_tracker_notes_cache_lock:
+        cached = _asset_tracker_notes_cache.get(cache_key)
+
+    if cached is not None and (time.monotonic() - cached[0]) < ttl and cached[1] == identity:
+        return cached[2]
+
+    try:
+        row = single_flight(
+            key=('asset_tracker_notes', *cache_key),
+            fetch=lambda: get_storage().read_row(
+                spread=spread,
+                sheet=0,
+                row_number=int(row_number),
+            ),
         )
-        .upload_fileobj(
-            uploaded_file,
-            'trp-rep-score-assets',
-            os.path.join(s3_key, modified_filename),
+    except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+        _logger.warning(e)
+
+        _display_google_sheets_connection_error(message_placeholder=st.empty())
+
+    row_identity = (row.get('Asset Name', ''), row.get('Username', ''))
+
+    if row_identity != identity:
+        _logger.warning(
+            f'Row {row_number} of the asset tracker is now {row_identity}, not {identity} - '
+            'resyncing the asset tracker'
         )
-    )
 
-    # try to trigger garbage collection early on the upload
-    uploaded_file.close()
-    del uploaded_file
+        resync_asset_tracker()
 
-    return modified_filename
+        raise StaleAssetTrackerRowError(
+            f'Row {row_number} of the asset tracker is no longer {asset_name} by {username}'
+        )
+
+    notes = {col: row.get(col, '') for col in ASSET_TRACKER_NOTE_COLUMNS}
+
+    with _asset_tracker_notes_cache_lock:
+        _asset_tracker_notes_cache[cache_key] = (time.monotonic(), row_identity, notes)
+
+    return notes
 
 
 def append_new_row_in_asset_tracker(
@@ -174,9 +898,19 @@ def append_new_row_in_asset_tracker(
     creative_review_4_notes: str,
     creative_review_5_notes: str,
     notes: str,
-) -> None:
+) -> str:
     """
-    Append a new row to the asset tracker Google Spreadsheet.
+    Append a new row to the asset tracker Google Spreadsheet through the durable submission queue,
+    returning as soon as the row is recorded locally rather than waiting on Google Sheets.
+
+    The row is journaled in the ``SUBMISSION_QUEUE_DATABASE`` SQLite database and written by a
+    background worker, batched with any other rows queued within
+    ``SUBMISSION_QUEUE_COALESCE_SECONDS`` into a single call to the Sheets ``values:append`` API,
+    which inserts them after the last row of the table on Google's side, so concurrent submissions
+    can never compute the same row index and overwrite one another. The worker retries until the
+    write succeeds, across restarts, and each row carries a ``Submission ID`` so a write whose
+    response was lost is never appended twice. Until then, the row is included in
+    ``fetch_asset_tracker_df``.
 
     Parameters
     ----------
@@ -206,67 +940,246 @@ def append_new_row_in_asset_tracker(
     creative_review_5_notes: str
     notes: str
 
+    Returns
+    -------
+    submission_id: str
+        Idempotency key written to the row's ``Submission ID`` column, which can be passed to
+        ``get_submission_status``
+
     Side Effects
     ------------
-    Appends a new row to the asset tracking Google Spreadsheet.
+    Queues a new row to be appended to the asset tracking Google Spreadsheet.
 
     """
-    sheet = read_google_spreadsheet(
-        spread=st.secrets['spreadsheets']['portal_backend_url'],
-        sheet=0,
-    )
-
     if not isinstance(countries_airing, list):
         countries_airing = [countries_airing]
 
+    submission_id = uuid.uuid4().hex
+
     num_assets = 1 if ',' not in str(asset_filename) else (str(asset_filename).count(',') + 1)
 
-    new_row_df = pd.DataFrame(
-        data=[
-            {
-                'Asset Name': asset_name,
-                'Username': username,
-                'Status': 'Uploaded',
-                'Brand': brand,
-                'Product': product,
-                'Region(s) This Creative Will Air In': ', '.join(countries_airing),
-                'Content Type': content_type,
-                'Version': version,
-                'Point of Contact Email': point_of_contact,
-                'Creative Brief Filename': creative_brief_filename,
-                'Asset Filename(s)': asset_filename,
-                'Number of Assets': num_assets,
-                'File Uploaded to S3': file_uploaded_to_s3,
-                'Date Submitted': datetime.today().strftime('%m/%d/%Y'),
-                MARKETING_LABEL_1: marketing_1_notes,
-                MARKETING_LABEL_2: marketing_2_notes,
-                MARKETING_LABEL_3: marketing_3_notes,
-                MARKETING_LABEL_4: marketing_4_notes,
-                AGENCY_CREATIVE_LABEL_1: agency_creative_1_notes,
-                AGENCY_CREATIVE_LABEL_2: agency_creative_2_notes,
-                AGENCY_CREATIVE_LABEL_3: agency_creative_3_notes,
-                AGENCY_CREATIVE_LABEL_4: agency_creative_4_notes,
-                AGENCY_CREATIVE_LABEL_5: agency_creative_5_notes,
-                DEI_CREATIVE_REVIEWS_LABEL_1: creative_review_1_notes,
-                DEI_CREATIVE_REVIEWS_LABEL_2: creative_review_2_notes,
-                DEI_CREATIVE_REVIEWS_LABEL_3: creative_review_3_notes,
-                DEI_CREATIVE_REVIEWS_LABEL_4: creative_review_4_notes,
-                DEI_CREATIVE_REVIEWS_LABEL_5: creative_review_5_notes,
-                'Notes': notes,
-            }
-        ],
+    new_row = {
+        'Asset Name': asset_name,
+        'Username': username,
+        'Status': 'Uploaded',
+        'Brand': brand,
+        'Product': product,
+        'Region / Countries This Creative Will Air In': ', '.join(countries_airing),
+        'Content Type': content_type,
+        'Version': version,
+        'Point of Contact Email': point_of_contact,
+        'Creative Brief Filename': creative_brief_filename,
+        'Asset Filename(s)': asset_filename,
+        'Number of Assets': num_assets,
+        'File Uploaded to S3': file_uploaded_to_s3,
+        'Date Submitted': datetime.today().strftime('%m/%d/%Y'),
+        MARKETING_LABEL_1: marketing_1_notes,
+        MARKETING_LABEL_2: marketing_2_notes,
+        MARKETING_LABEL_3: marketing_3_notes,
+        MARKETING_LABEL_4: marketing_4_notes,
+        AGENCY_CREATIVE_LABEL_1: agency_creative_1_notes,
+        AGENCY_CREATIVE_LABEL_2: agency_creative_2_notes,
+        AGENCY_CREATIVE_LABEL_3: agency_creative_3_notes,
+        AGENCY_CREATIVE_LABEL_4: agency_creative_4_notes,
+        AGENCY_CREATIVE_LABEL_5: agency_creative_5_notes,
+        DEI_CREATIVE_REVIEWS_LABEL_1: creative_review_1_notes,
+        DEI_CREATIVE_REVIEWS_LABEL_2: creative_review_2_notes,
+        DEI_CREATIVE_REVIEWS_LABEL_3: creative_review_3_notes,
+        DEI_CREATIVE_REVIEWS_LABEL_4: creative_review_4_notes,
+        DEI_CREATIVE_REVIEWS_LABEL_5: creative_review_5_notes,
+        'Notes': notes,
+        'Submission ID': submission_id,
+    }
+
+    # columns are written positionally, in the order above, starting at the first column
+    new_row = {col: '' if value is None else str(value) for col, value in new_row.items()}
+
+    spread = st.secrets['spreadsheets']['portal_backend_url']
+
+    try:
+        check_submission_id_column(
+            spread=spread,
+            column_index=list(new_row).index('Submission ID'),
+        )
+    except MissingSubmissionIDColumnError as e:
+        _logger.error(e)
+
+        st.error(
+            'The asset tracker is missing its "Submission ID" column, so your submission could not '
+            'be saved. Please click the "Having issues?" link and let us know.'
+        )
+        st.stop()
+    except (
+        GoogleSheetsUnavailableError,
+        gspread.exceptions.APIError,
+        requests.exceptions.RequestException,
+    ) as e:
+        # the worker checks again before the row is appended, so the user need not wait on it now
+        _logger.warning(f'Could not check the asset tracker for a "Submission ID" column: {e}')
+
+    try:
+        enqueue_row(idempotency_key=submission_id, spread=spread, row=new_row)
+    except sqlite3.Error as e:
+        # without a working journal, fall back to writing the row while the user waits
+        _logger.warning(f'Could not queue a new row for asset "{asset_name}": {e}')
+
+        try:
+            get_storage().append_rows(spread=spread, rows=[list(new_row.values())])
+        except (
+            GoogleSheetsUnavailableError,
+            gspread.exceptions.APIError,
+            requests.exceptions.RequestException,
+            sqlite3.Error,
+        ) as e:
+            _logger.warning(e)
+
+            _display_google_sheets_connection_error(message_placeholder=st.empty())
+
+        invalidate_spreadsheet_cache(spread=spread, sheet=0)
+
+        return submission_id
+
+    _logger.info(f'Queued a new row for asset "{asset_name}" with submission ID {submission_id}.')
+
+    start_submission_queue_worker(on_rows_appended=_invalidate_asset_tracker_cache, flush_now=True)
+
+    return submission_id
+
+
+def _invalidate_asset_tracker_cache(spread: str) -> None:
+    """Invalidate the cached asset tracker once queued rows are appended to it."""
+    invalidate_spreadsheet_cache(spread=spread, sheet=0)
+
+
+def _get_queued_asset_tracker_rows(spread: str) -> List[QueuedRow]:
+    """
+    Get every row of a spreadsheet still waiting in the submission queue, making sure the worker is
+    running to write them - e.g. rows queued before the app restarted.
+
+    """
+    try:
+        queued_rows = get_pending_rows(spread=spread)
+    except sqlite3.Error as e:
+        _logger.warning(f'Could not read the submission queue: {e}')
+
+        return list()
+
+    if len(queued_rows) > 0:
+        start_submission_queue_worker(on_rows_appended=_invalidate_asset_tracker_cache)
+
+    return queued_rows
+
+
+def _build_user_asset_permission_index(
+    tracker_df: pd.DataFrame,
+    backend_df: pd.DataFrame,
+) -> UserAssetPermissionIndex:
+    """
+    Build a ``UserAssetPermissionIndex`` from the assets each user has been assigned in the project
+    tracker and the assets each user has uploaded themselves in the portal backend.
+
+    Parameters
+    ----------
+    tracker_df: pd.DataFrame
+        Project tracker DataFrame with a ``Username`` column and a comma-separated ``Access To``
+        column
+    backend_df: pd.DataFrame
+        Portal backend DataFrame with ``Username`` and ``Asset Name`` columns
+
+    Returns
+    -------
+    UserAssetPermissionIndex
+
+    """
+    user_assets = collections.defaultdict(set)
+    asset_users = collections.defaultdict(set)
+
+    for username, access_to in zip(tracker_df['Username'], tracker_df['Access To']):
+        for asset_name in str(access_to).split(','):
+            asset_name = asset_name.strip()
+
+            if asset_name and asset_name != 'None':
+                user_assets[username].add(asset_name)
+                asset_users[asset_name].add(username)
+
+    for username, asset_name in zip(backend_df['Username'], backend_df['Asset Name']):
+        user_assets[username].add(asset_name)
+        asset_users[asset_name].add(username)
+
+    return UserAssetPermissionIndex(
+        user_assets={username: frozenset(assets) for username, assets in user_assets.items()},
+        asset_users={asset_name: frozenset(users) for asset_name, users in asset_users.items()},
     )
 
-    new_row_index = sheet.get_sheet_dims()[0] + 1
 
-    sheet.df_to_sheet(
-        df=new_row_df,
-        index=False,
-        headers=None,
-        start=(new_row_index, 1),
-        replace=False,
+def get_user_asset_permission_index() -> UserAssetPermissionIndex:
+    """
+    Get the user-to-asset permission index shared by every session.
+
+    The index is only rebuilt when the cached project tracker or portal backend sheets it is built
+    from have been refreshed, so looking up a single user's assets is a dictionary lookup. Both
+    sheets are read concurrently.
+
+    Returns
+    -------
+    UserAssetPermissionIndex
+
+    """
+    tracker_sheet = (st.secrets['spreadsheets']['project_tracker_url'], 3)
+    backend_sheet = (
+        st.secrets['spreadsheets']['portal_backend_url'],
+        0,
+        ASSET_TRACKER_NOTE_COLUMNS,
     )
 
+    futures = read_google_spreadsheets_concurrently(sheets=[tracker_sheet, backend_sheet])
+
+    return get_user_asset_permission_index_from_sheets(
+        tracker_df=wait_for_google_spreadsheet_df(future=futures[tracker_sheet]),
+        backend_df=wait_for_google_spreadsheet_df(future=futures[backend_sheet]),
+    )
+
+
+def get_user_asset_permission_index_from_sheets(
+    tracker_df: pd.DataFrame,
+    backend_df: pd.DataFrame,
+) -> UserAssetPermissionIndex:
+    """
+    Get the permission index returned by ``get_user_asset_permission_index`` from the cached project
+    tracker and portal backend sheets it is built from, only building it again if either of them
+    was refreshed. Makes no Streamlit calls, so it can be used to build the shared index outside of
+    a session's script thread.
+
+    Parameters
+    ----------
+    tracker_df: pd.DataFrame
+        Project tracker sheet read through the process-wide cache
+    backend_df: pd.DataFrame
+        Portal backend sheet read through the process-wide cache, without its
+        ``ASSET_TRACKER_NOTE_COLUMNS``
+
+    Returns
+    -------
+    UserAssetPermissionIndex
+
+    """
+    with _permission_index_cache_lock:
+        sources = _permission_index_cache['sources']
+
+        if sources is not None and sources[0] is tracker_df and sources[1] is backend_df:
+            return _permission_index_cache['index']
+
+    permission_index = _build_user_asset_permission_index(
+        tracker_df=tracker_df,
+        backend_df=backend_df,
+    )
+
+    with _permission_index_cache_lock:
+        _permission_index_cache['sources'] = (tracker_df, backend_df)
+        _permission_index_cache['index'] = permission_index
+
+    return permission_index
+
 
 def get_assigned_user_assets(username: str) -> List[str]:
     """
@@ -283,38 +1196,15 @@ def get_assigned_user_assets(username: str) -> List[str]:
         empty list will be returned
 
     """
-    tracker_df = (
-        read_google_spreadsheet(
-            spread=st.secrets['spreadsheets']['project_tracker_url'],
-            sheet=3,
-        )
-        .sheet_to_df(index=None)
-    )
+    allowed_assets = set(get_user_asset_permission_index().user_assets.get(username, frozenset()))
 
-    specific_user_tracker_df = tracker_df[tracker_df['Username'] == username]
-
-    if len(specific_user_tracker_df) > 0:
-        allowed_assets_tracker = [
-            x.strip()
-            for x in specific_user_tracker_df['Access To'].item().split(',')
-            if x.strip() != 'None'
-        ]
-    else:
-        allowed_assets_tracker = []
-
-    backend_df = (
-        read_google_spreadsheet(
+    # the user's own submissions still in the submission queue are not in the index yet
+    allowed_assets.update(
+        queued_row.row.get('Asset Name')
+        for queued_row in _get_queued_asset_tracker_rows(
             spread=st.secrets['spreadsheets']['portal_backend_url'],
-            sheet=0,
         )
-        .sheet_to_df(index=None)
+        if queued_row.row.get('Username') == username
     )
 
-    specific_user_backend_df = backend_df[backend_df['Username'] == username]
-
-    if len(specific_user_backend_df) > 0:
-        allowed_assets_backend = specific_user_backend_df['Asset Name'].tolist()
-    else:
-        allowed_assets_backend = []
-
-    return list(set(allowed_assets_tracker) | set(allowed_assets_backend))
+    return sorted(allowed_assets)
@@ -0,0 +1,511 @@
+import base64
+import concurrent.futures
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+import botocore.exceptions
+import s3transfer.utils
+from streamlit.logger import get_logger
+
+from config import (
+    MULTIPART_UPLOAD_DATABASE,
+    S3_BUCKET,
+    S3_MAX_CONCURRENCY,
+    S3_MULTIPART_CHUNK_SIZE_BYTES,
+    S3_MULTIPART_UPLOAD_EXPIRATION_SECONDS,
+)
+
+
+_logger = get_logger(__name__)
+
+
+class MultipartUpload(NamedTuple):
+    """An S3 multipart upload recorded in the local multipart upload journal."""
+
+    upload_key: str
+    s3_key: str
+    filename: str
+    size: int
+    part_size: int
+    upload_id: str
+    created_at: float
+
+
+class CompletedPart(NamedTuple):
+    """A part of an S3 multipart upload that has finished uploading."""
+
+    part_number: int
+    etag: str
+    md5: str
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    Open a connection to the multipart upload journal, creating it if needed. Use as a context
+    manager - the transaction is committed (or rolled back on error) and the connection closed once
+    the ``with`` block exits.
+
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(MULTIPART_UPLOAD_DATABASE)), exist_ok=True)
+
+    connection = sqlite3.connect(database=MULTIPART_UPLOAD_DATABASE, timeout=30)
+
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS multipart_uploads (
+                upload_key TEXT PRIMARY KEY,
+                s3_key TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                part_size INTEGER NOT NULL,
+                upload_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completed_parts (
+                upload_key TEXT NOT NULL,
+                part_number INTEGER NOT NULL,
+                etag TEXT NOT NULL,
+                md5 TEXT NOT NULL,
+                PRIMARY KEY (upload_key, part_number)
+            )
+            """
+        )
+
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def get_multipart_upload(upload_key: str) -> Optional[MultipartUpload]:
+    """
+    Get the multipart upload recorded for a file, if any.
+
+    Parameters
+    ----------
+    upload_key: str
+        Key identifying the file across attempts to upload it
+
+    Returns
+    -------
+    upload: MultipartUpload
+        If no multipart upload is recorded for this key, ``None`` is returned
+
+    """
+    with _connect() as connection:
+        record = connection.execute(
+            'SELECT upload_key, s3_key, filename, size, part_size, upload_id, created_at '
+            'FROM multipart_uploads WHERE upload_key = ?',
+            (upload_key,),
+        ).fetchone()
+
+    return MultipartUpload(*record) if record is not None else None
+
+
+def record_multipart_upload(
+    upload_key: str,
+    s3_key: str,
+    filename: str,
+    size: int,
+    part_size: int,
+    upload_id: str,
+) -> MultipartUpload:
+    """
+    Record a new multipart upload of a file, replacing any upload recorded for it before along with
+    its completed parts.
+
+    Parameters
+    ----------
+    upload_key: str
+        Key identifying the file across attempts to upload it
+    s3_key: str
+    filename: str
+        Name the file is uploaded to S3 with
+    size: int
+        Size of the file, in bytes
+    part_size: int
+        Size of every part but the last, in bytes
+    upload_id: str
+        ID of the multipart upload returned by S3
+
+    Returns
+    -------
+    upload: MultipartUpload
+
+    Side Effects
+    ------------
+    Writes to the ``MULTIPART_UPLOAD_DATABASE`` SQLite database.
+
+    """
+    upload = MultipartUpload(
+        upload_key=upload_key,
+        s3_key=s3_key,
+        filename=filename,
+        size=size,
+        part_size=part_size,
+        upload_id=upload_id,
+        created_at=time.time(),
+    )
+
+    with _connect() as connection:
+        connection.execute('DELETE FROM completed_parts WHERE upload_key = ?', (upload_key,))
+        connection.execute(
+            'INSERT OR REPLACE INTO multipart_uploads '
+            '(upload_key, s3_key, filename, size, part_size, upload_id, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            tuple(upload),
+        )
+
+    return upload
+
+
+def get_completed_parts(upload_key: str) -> Dict[int, CompletedPart]:
+    """
+    Get every part of a file's multipart upload that has finished uploading.
+
+    Parameters
+    ----------
+    upload_key: str
+
+    Returns
+    -------
+    parts: dict
+        Dictionary mapping part numbers to ``CompletedPart``s
+
+    """
+    with _connect() as connection:
+        records = connection.execute(
+            'SELECT part_number, etag, md5 FROM completed_parts WHERE upload_key = ?',
+            (upload_key,),
+        ).fetchall()
+
+    return {record[0]: CompletedPart(*record) for record in records}
+
+
+def record_completed_part(upload_key: str, part_number: int, etag: str, md5: str) -> None:
+    """
+    Record that a part of a file's multipart upload has finished uploading.
+
+    Parameters
+    ----------
+    upload_key: str
+    part_number: int
+    etag: str
+        ETag of the part returned by S3
+    md5: str
+        Hex MD5 digest of the part's content, to check whether it has changed before skipping it
+
+    Side Effects
+    ------------
+    Writes to the ``MULTIPART_UPLOAD_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO completed_parts (upload_key, part_number, etag, md5) '
+            'VALUES (?, ?, ?, ?)',
+            (upload_key, part_number, etag, md5),
+        )
+
+
+def delete_multipart_upload(upload_key: str) -> None:
+    """
+    Forget a file's multipart upload and its completed parts, once it has been completed or
+    aborted.
+
+    Parameters
+    ----------
+    upload_key: str
+
+    Side Effects
+    ------------
+    Deletes from the ``MULTIPART_UPLOAD_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.execute('DELETE FROM completed_parts WHERE upload_key = ?', (upload_key,))
+        connection.execute('DELETE FROM multipart_uploads WHERE upload_key = ?', (upload_key,))
+
+
+def _forget_multipart_upload(upload_key: str) -> None:
+    """Delete a multipart upload from the journal, logging a warning rather than raising."""
+    try:
+        delete_multipart_upload(upload_key=upload_key)
+    except sqlite3.Error as e:
+        # a stale journal entry is harmless - S3 no longer knows its upload ID, so the next attempt
+        # to resume it starts over
+        _logger.warning(f'Could not delete multipart upload {upload_key} from the journal: {e}')
+
+
+def _abort_multipart_upload(s3_client: object, upload: MultipartUpload) -> None:
+    """Abort a recorded multipart upload so S3 deletes its parts, and forget it."""
+    try:
+        s3_client.abort_multipart_upload(
+            Bucket=S3_BUCKET,
+            Key=os.path.join(upload.s3_key, upload.filename),
+            UploadId=upload.upload_id,
+        )
+    except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+        # an upload that cannot be aborted is left for the bucket's lifecycle rules to clean up
+        _logger.warning(f'Could not abort multipart upload {upload.upload_key}: {e}')
+
+    _forget_multipart_upload(upload_key=upload.upload_key)
+
+
+def _get_md5_of_file_range(filename: str, start_byte: int, num_bytes: int) -> bytes:
+    """Get the MD5 digest of a range of a file, reading it 1 MB at a time."""
+    md5 = hashlib.md5()
+
+    with open(filename, 'rb') as f:
+        f.seek(start_byte)
+
+        while num_bytes > 0:
+            chunk = f.read(min(num_bytes, 1024 * 1024))
+
+            if not chunk:
+                break
+
+            md5.update(chunk)
+            num_bytes -= len(chunk)
+
+    return md5.digest()
+
+
+def upload_file_to_s3_resumably(
+    s3_client: object,
+    filename: str,
+    size: int,
+    s3_key: str,
+    upload_key: str,
+    modified_filename: str,
+    callback: Optional[Callable[[int], None]] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    part_resumed_callback: Optional[Callable[[int], None]] = None,
+) -> str:
+    """
+    Upload a file on disk to S3 in ``S3_MULTIPART_CHUNK_SIZE_BYTES`` parts, up to
+    ``S3_MAX_CONCURRENCY`` at a time, recording every finished part in the
+    ``MULTIPART_UPLOAD_DATABASE`` so a later attempt to upload the same file only sends the parts
+    that are missing.
+
+    A recorded part is only skipped if S3 still has it and the file's content for that part has the
+    same MD5 digest, so a different file with the same name is never stitched together with parts
+    of the old one. Recorded uploads of a different size, or older than
+    ``S3_MULTIPART_UPLOAD_EXPIRATION_SECONDS``, are aborted and started over.
+
+    The journal is best-effort - if it cannot be read or written, a warning is logged and the file
+    is still uploaded, it just cannot be resumed (or only partly) if the upload fails.
+
+    Parameters
+    ----------
+    s3_client: object
+        S3 client to upload the file with
+    filename: str
+        Path to the file to upload
+    size: int
+        Size of the file, in bytes
+    s3_key: str
+    upload_key: str
+        Key identifying the file across attempts to upload it
+    modified_filename: str
+        Name to upload the file to S3 with, if no upload is resumed
+    callback: function
+        Function called with the number of bytes uploaded every time some are, possibly from
+        several threads at once. Skipped parts are reported as uploaded right away
+    metadata: dict
+        User-defined metadata to store with the S3 object, if no upload is resumed
+    part_resumed_callback: function
+        Function called with the size, in bytes, of every part skipped because it was already
+        uploaded
+
+    Returns
+    -------
+    modified_filename: str
+        Name the file was uploaded to S3 with, which is the name of the resumed upload if there was
+        one
+
+    Side Effects
+    ------------
+    Writes a file to S3 and to the ``MULTIPART_UPLOAD_DATABASE`` SQLite database.
+
+    """
+    part_size = S3_MULTIPART_CHUNK_SIZE_BYTES
+
+    try:
+        upload = get_multipart_upload(upload_key=upload_key)
+    except sqlite3.Error as e:
+        _logger.warning(f'Could not read multipart upload {upload_key} from the journal: {e}')
+
+        upload = None
+
+    uploaded_part_etags = dict()
+
+    if upload is not None and (
+        upload.s3_key != s3_key
+        or upload.size != size
+        or upload.part_size != part_size
+        or time.time() - upload.created_at > S3_MULTIPART_UPLOAD_EXPIRATION_SECONDS
+    ):
+        _abort_multipart_upload(s3_client=s3_client, upload=upload)
+
+        upload = None
+
+    if upload is not None:
+        try:
+            for page in s3_client.get_paginator('list_parts').paginate(
+                Bucket=S3_BUCKET,
+                Key=os.path.join(upload.s3_key, upload.filename),
+                UploadId=upload.upload_id,
+            ):
+                for part in page.get('Parts', list()):
+                    uploaded_part_etags[part['PartNumber']] = part['ETag']
+        except botocore.exceptions.ClientError as e:
+            if e.response.get('Error', dict()).get('Code') != 'NoSuchUpload':
+                raise
+
+            # S3 has already aborted the upload, so there is nothing to resume
+            _forget_multipart_upload(upload_key=upload_key)
+
+            upload = None
+
+    if upload is None:
+        response = s3_client.create_multipart_upload(
+            Bucket=S3_BUCKET,
+            Key=os.path.join(s3_key, modified_filename),
+            Metadata=metadata or dict(),
+        )
+
+        try:
+            upload = record_multipart_upload(
+                upload_key=upload_key,
+                s3_key=s3_key,
+                filename=modified_filename,
+                size=size,
+                part_size=part_size,
+                upload_id=response['UploadId'],
+            )
+        except sqlite3.Error as e:
+            _logger.warning(
+                f'Could not record multipart upload {upload_key} in the journal, so it cannot be '
+                f'resumed: {e}'
+            )
+
+            upload = MultipartUpload(
+                upload_key=upload_key,
+                s3_key=s3_key,
+                filename=modified_filename,
+                size=size,
+                part_size=part_size,
+                upload_id=response['UploadId'],
+                created_at=time.time(),
+            )
+    else:
+        _logger.info(
+            f'Resuming upload of {os.path.join(upload.s3_key, upload.filename)} with '
+            f'{len(uploaded_part_etags)} parts already uploaded.'
+        )
+
+    try:
+        completed_parts = get_completed_parts(upload_key=upload_key)
+    except sqlite3.Error as e:
+        _logger.warning(
+            f'Could not read the completed parts of multipart upload {upload_key} from the '
+            f'journal, so every part is uploaded again: {e}'
+        )
+
+        completed_parts = dict()
+    part_etags = dict()
+    part_etags_lock = threading.Lock()
+
+    def _upload_part(part_number: int) -> None:
+        start_byte = (part_number - 1) * part_size
+        num_bytes = min(part_size, size - start_byte)
+        md5 = _get_md5_of_file_range(filename=filename, start_byte=start_byte, num_bytes=num_bytes)
+
+        completed_part = completed_parts.get(part_number)
+
+        if (
+            completed_part is not None
+            and completed_part.md5 == md5.hex()
+            and uploaded_part_etags.get(part_number) == completed_part.etag
+        ):
+            etag = completed_part.etag
+
+            if part_resumed_callback is not None:
+                part_resumed_callback(num_bytes)
+
+            if callback is not None:
+                callback(num_bytes)
+        else:
+            with s3transfer.utils.ReadFileChunk.from_filename(
+                filename=filename,
+                start_byte=start_byte,
+                chunk_size=num_bytes,
+                callbacks=(
+                    [lambda bytes_transferred: callback(bytes_transferred)]
+                    if callback is not None
+                    else None
+                ),
+            ) as body:
+                etag = s3_client.upload_part(
+                    Bucket=S3_BUCKET,
+                    Key=os.path.join(upload.s3_key, upload.filename),
+                    UploadId=upload.upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                    ContentMD5=base64.b64encode(md5).decode(),
+                )['ETag']
+
+            try:
+                record_completed_part(
+                    upload_key=upload_key,
+                    part_number=part_number,
+                    etag=etag,
+                    md5=md5.hex(),
+                )
+            except sqlite3.Error as e:
+                # the part is in S3 either way, it is just uploaded again if the upload is resumed
+                _logger.warning(
+                    f'Could not record part {part_number} of multipart upload {upload_key} in the '
+                    f'journal: {e}'
+                )
+
+        with part_etags_lock:
+            part_etags[part_number] = etag
+
+    num_parts = max(1, -(-size // part_size))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=S3_MAX_CONCURRENCY,
+        thread_name_prefix='s3_upload_part',
+    ) as executor:
+        # raise the first error, once every part that has started has finished (and was recorded)
+        list(executor.map(_upload_part, range(1, num_parts + 1)))
+
+    s3_client.complete_multipart_upload(
+        Bucket=S3_BUCKET,
+        Key=os.path.join(upload.s3_key, upload.filename),
+        UploadId=upload.upload_id,
+        MultipartUpload={
+            'Parts': [
+                {'ETag': part_etags[part_number], 'PartNumber': part_number}
+                for part_number in range(1, num_parts + 1)
+            ],
+        },
+    )
+
+    _forget_multipart_upload(upload_key=upload_key)
+
+    return upload.filename
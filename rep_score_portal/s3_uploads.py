@@ -0,0 +1,587 @@
+import concurrent.futures
+import contextlib
+from datetime import datetime
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import boto3
+import boto3.s3.transfer
+import botocore.config
+import botocore.exceptions
+import streamlit as st
+from streamlit.logger import get_logger
+
+from config import (
+    S3_BUCKET,
+    S3_DIRECT_UPLOAD_MAX_BYTES,
+    S3_DIRECT_UPLOAD_PREFIXES,
+    S3_MAX_ATTEMPTS,
+    S3_MAX_BYTES_SENDING_FROM_MEMORY,
+    S3_MAX_CONCURRENCY,
+    S3_MAX_CONCURRENT_FILE_UPLOADS,
+    S3_MULTIPART_CHUNK_SIZE_BYTES,
+    S3_MULTIPART_THRESHOLD_BYTES,
+    S3_PRESIGNED_POST_EXPIRATION_SECONDS,
+    S3_UPLOAD_SPOOL_DIRECTORY,
+    S3_UPLOAD_SPOOL_THRESHOLD_BYTES,
+)
+from multipart_uploads import upload_file_to_s3_resumably
+from upload_index import find_identical_s3_upload, index_upload
+
+
+_logger = get_logger(__name__)
+
+# S3 client shared by every session, created on first use. Clients are thread-safe and keep a pool
+# of connections to S3 alive between uploads
+_s3_client: Dict[str, Optional[object]] = {'client': None}
+_s3_client_lock = threading.Lock()
+_s3_transfer_config = boto3.s3.transfer.TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_BYTES,
+    multipart_chunksize=S3_MULTIPART_CHUNK_SIZE_BYTES,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True,
+)
+_s3_upload_stats = {
+    'uploads': 0,
+    'bytes_uploaded': 0,
+    'seconds_uploading': 0.0,
+    'direct_uploads': 0,
+    'bytes_uploaded_directly': 0,
+    'bytes_sending_from_memory': 0,
+    'peak_bytes_sending_from_memory': 0,
+    'spooled_uploads': 0,
+    'bytes_spooled': 0,
+    'parts_resumed': 0,
+    'bytes_resumed': 0,
+    'uploads_deduplicated': 0,
+    'bytes_deduplicated': 0,
+}
+_s3_upload_stats_lock = threading.Lock()
+# worker threads uploading files to S3, shared by every session so simultaneous submissions
+# cannot start an unbounded number of uploads at once
+_s3_upload_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=S3_MAX_CONCURRENT_FILE_UPLOADS,
+    thread_name_prefix='s3_upload',
+)
+
+
+class S3UploadError(Exception):
+    """Raised when a file could not be uploaded to S3 after every retry."""
+
+
+def _get_s3_client() -> object:
+    """
+    Get the S3 client shared by every session, creating it on first use.
+
+    The client keeps enough connections alive to upload ``S3_MAX_CONCURRENCY`` parts of
+    ``S3_MAX_CONCURRENT_FILE_UPLOADS`` files at once, and retries every request (and so every part
+    of a multipart upload) up to ``S3_MAX_ATTEMPTS`` times with exponential backoff.
+
+    """
+    with _s3_client_lock:
+        if _s3_client['client'] is None:
+            _s3_client['client'] = boto3.session.Session().client(
+                's3',
+                aws_access_key_id=st.secrets['aws']['access_key_id'],
+                aws_secret_access_key=st.secrets['aws']['secret_access_key'],
+                config=botocore.config.Config(
+                    max_pool_connections=S3_MAX_CONCURRENCY * S3_MAX_CONCURRENT_FILE_UPLOADS,
+                    retries={'total_max_attempts': S3_MAX_ATTEMPTS, 'mode': 'standard'},
+                    tcp_keepalive=True,
+                ),
+            )
+
+        return _s3_client['client']
+
+
+def get_s3_upload_stats() -> Dict[str, float]:
+    """
+    Get counters describing every upload to S3 since the process started.
+
+    Returns
+    -------
+    stats: dict
+        Dictionary with the number of ``uploads``, total ``bytes_uploaded``, total
+        ``seconds_uploading``, and the resulting average ``megabytes_per_second`` of uploads through
+        the server, as well as the number of verified ``direct_uploads`` from the browser and their
+        total ``bytes_uploaded_directly``. The ``bytes_sending_from_memory`` of uploads currently
+        being sent to S3 from memory (and its ``peak_bytes_sending_from_memory``) are counted, along
+        with the number of ``spooled_uploads`` sent from disk instead and their total
+        ``bytes_spooled``. These do not include the copy of every uploaded file Streamlit keeps in
+        memory for the rest of its session.
+        Parts of resumed multipart uploads that were not sent again are counted in
+        ``parts_resumed`` and ``bytes_resumed``, and files linked to an identical file already in
+        S3 instead of being uploaded in ``uploads_deduplicated`` and ``bytes_deduplicated``
+
+    """
+    with _s3_upload_stats_lock:
+        stats = dict(_s3_upload_stats)
+
+    stats['megabytes_per_second'] = (
+        stats['bytes_uploaded'] / 1024 / 1024 / stats['seconds_uploading']
+        if stats['seconds_uploading'] > 0
+        else 0.0
+    )
+
+    return stats
+
+
+def _record_resumed_part(num_bytes: int) -> None:
+    """Count a part of a resumed multipart upload that was not sent again."""
+    with _s3_upload_stats_lock:
+        _s3_upload_stats['parts_resumed'] += 1
+        _s3_upload_stats['bytes_resumed'] += num_bytes
+
+
+def _get_modified_filename(filename: str) -> str:
+    """Get the name a file is uploaded to S3 with, ``{name}_{timestamp}.{extension}``."""
+    uploaded_filename, uploaded_file_extension = os.path.splitext(filename)
+
+    return (
+        uploaded_filename
+        + '_'
+        + str(int(datetime.now().timestamp()))
+        + uploaded_file_extension
+    )
+
+
+@contextlib.contextmanager
+def _spool_s3_upload(uploaded_file: st.runtime.uploaded_file_manager) -> Iterator[Optional[str]]:
+    """
+    Decide whether a file is uploaded to S3 from memory or spooled to disk first. Use as a context
+    manager for the duration of the upload.
+
+    Files of at least ``S3_UPLOAD_SPOOL_THRESHOLD_BYTES``, or that would take the bytes of uploads
+    sent to S3 from memory by every session over ``S3_MAX_BYTES_SENDING_FROM_MEMORY``, are copied to
+    a temporary file in ``S3_UPLOAD_SPOOL_DIRECTORY``. Uploading from a filename lets the S3
+    transfer read each part from disk as it is sent, rather than buffering ``S3_MAX_CONCURRENCY``
+    parts of the file in memory.
+
+    This only limits what S3 transfers buffer - Streamlit keeps the uploaded file itself in memory
+    for the rest of its session, which closing the file does not free.
+
+    Parameters
+    ----------
+    uploaded_file: st.runtime.uploaded_file_manager
+
+    Yields
+    ------
+    spool_filename: str
+        Path to the spooled copy of the file, deleted once the ``with`` block exits. If the file
+        should be uploaded from memory, ``None`` is yielded
+
+    """
+    upload_bytes = uploaded_file.size
+
+    with _s3_upload_stats_lock:
+        in_memory = (
+            upload_bytes < S3_UPLOAD_SPOOL_THRESHOLD_BYTES
+            and _s3_upload_stats['bytes_sending_from_memory'] + upload_bytes
+            <= S3_MAX_BYTES_SENDING_FROM_MEMORY
+        )
+
+        if in_memory:
+            _s3_upload_stats['bytes_sending_from_memory'] += upload_bytes
+            _s3_upload_stats['peak_bytes_sending_from_memory'] = max(
+                _s3_upload_stats['peak_bytes_sending_from_memory'],
+                _s3_upload_stats['bytes_sending_from_memory'],
+            )
+
+    if in_memory:
+        try:
+            yield None
+        finally:
+            with _s3_upload_stats_lock:
+                _s3_upload_stats['bytes_sending_from_memory'] -= upload_bytes
+
+        return
+
+    if S3_UPLOAD_SPOOL_DIRECTORY:
+        os.makedirs(S3_UPLOAD_SPOOL_DIRECTORY, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(
+        prefix='rep_score_portal_upload_',
+        dir=S3_UPLOAD_SPOOL_DIRECTORY or None,
+    ) as spool_file:
+        uploaded_file.seek(0)
+        # copy in 1 MB chunks, so spooling never needs a second full copy of the file in memory
+        shutil.copyfileobj(uploaded_file, spool_file, 1024 * 1024)
+        spool_file.flush()
+
+        uploaded_file.close()
+
+        with _s3_upload_stats_lock:
+            _s3_upload_stats['spooled_uploads'] += 1
+            _s3_upload_stats['bytes_spooled'] += upload_bytes
+
+        yield spool_file.name
+
+
+def upload_file_to_s3(
+    uploaded_file: st.runtime.uploaded_file_manager,
+    s3_key: str,
+    username: str,
+    callback: Optional[Callable[[int], None]] = None,
+    submission_key: Optional[str] = None,
+) -> str:
+    """
+    Upload a file to S3 to ``s3://{S3_BUCKET}/{s3_key}/{modified_filename}``.
+
+    Files larger than ``S3_MULTIPART_THRESHOLD_BYTES`` are uploaded in parts of
+    ``S3_MULTIPART_CHUNK_SIZE_BYTES``, up to ``S3_MAX_CONCURRENCY`` parts at a time, with each part
+    retried on its own if it fails. Large files are spooled to disk first (see
+    ``_spool_s3_upload``), and their multipart uploads are resumable if a ``submission_key`` is
+    provided (see ``multipart_uploads.upload_file_to_s3_resumably``). The throughput of every
+    upload is logged.
+
+    Every file is hashed first, and if the same user has already uploaded an identical file under
+    ``s3_key`` (see ``upload_index.find_identical_s3_upload``), it is linked to instead of being
+    uploaded again.
+
+    Parameters
+    ----------
+    uploaded_file: st.runtime.uploaded_file_manager
+    s3_key: str
+    username: str
+        Username of the user uploading the file, who is the only one its upload is deduplicated
+        with
+    callback: function
+        Function called with the number of bytes uploaded every time some are, possibly from
+        several threads at once. The number is negative when a part is retried
+    submission_key: str
+        Key identifying the submission the file is uploaded for, such that a failed upload of the
+        same file for the same submission picks up where it left off
+
+    Returns
+    -------
+    modified_filename: str
+        Modified filename of the format
+        ``{uploaded_file.name}_{current_timestamp}.{uploaded_file.extension}``. Resumed uploads
+        keep the filename of their first attempt, and linked files the filename of the identical
+        file already uploaded
+
+    Side Effects
+    ------------
+    Writes a file to S3 and to the ``UPLOAD_INDEX_DATABASE`` SQLite database. The upload index is
+    best-effort - if it cannot be read or written, the file is uploaded without deduplication.
+
+    """
+    modified_filename = _get_modified_filename(filename=uploaded_file.name)
+    upload_bytes = uploaded_file.size
+
+    start_time = time.perf_counter()
+
+    uploaded_file.seek(0)
+    sha256 = hashlib.file_digest(uploaded_file, 'sha256').hexdigest()
+    uploaded_file.seek(0)
+
+    identical_filename = find_identical_s3_upload(
+        s3_client=_get_s3_client(),
+        sha256=sha256,
+        size=upload_bytes,
+        s3_key=s3_key,
+        username=username,
+    )
+
+    if identical_filename is not None:
+        with _s3_upload_stats_lock:
+            _s3_upload_stats['uploads_deduplicated'] += 1
+            _s3_upload_stats['bytes_deduplicated'] += upload_bytes
+
+        _logger.info(
+            f'Linked {uploaded_file.name} to identical upload '
+            f'{os.path.join(s3_key, identical_filename)} in '
+            f'{time.perf_counter() - start_time:.1f} seconds.'
+        )
+
+        if callback is not None:
+            callback(upload_bytes)
+
+        uploaded_file.close()
+
+        return identical_filename
+
+    metadata = {'sha256': sha256}
+
+    with _spool_s3_upload(uploaded_file=uploaded_file) as spool_filename:
+        if (
+            spool_filename is not None
+            and submission_key is not None
+            and upload_bytes >= S3_MULTIPART_THRESHOLD_BYTES
+        ):
+            modified_filename = upload_file_to_s3_resumably(
+                s3_client=_get_s3_client(),
+                filename=spool_filename,
+                size=upload_bytes,
+                s3_key=s3_key,
+                upload_key=f'{submission_key}/{s3_key}/{uploaded_file.name}',
+                modified_filename=modified_filename,
+                callback=callback,
+                metadata=metadata,
+                part_resumed_callback=_record_resumed_part,
+            )
+        elif spool_filename is not None:
+            _get_s3_client().upload_file(
+                Filename=spool_filename,
+                Bucket=S3_BUCKET,
+                Key=os.path.join(s3_key, modified_filename),
+                ExtraArgs={'Metadata': metadata},
+                Config=_s3_transfer_config,
+                Callback=callback,
+            )
+        else:
+            _get_s3_client().upload_fileobj(
+                Fileobj=uploaded_file,
+                Bucket=S3_BUCKET,
+                Key=os.path.join(s3_key, modified_filename),
+                ExtraArgs={'Metadata': metadata},
+                Config=_s3_transfer_config,
+                Callback=callback,
+            )
+
+    upload_seconds = time.perf_counter() - start_time
+
+    try:
+        index_upload(
+            sha256=sha256,
+            s3_key=s3_key,
+            username=username,
+            filename=modified_filename,
+            size=upload_bytes,
+        )
+    except sqlite3.Error as e:
+        # the file is already in S3, so failing to index it only means it is not deduplicated
+        _logger.warning(f'Could not add {modified_filename} to the upload index: {e}')
+
+    with _s3_upload_stats_lock:
+        _s3_upload_stats['uploads'] += 1
+        _s3_upload_stats['bytes_uploaded'] += upload_bytes
+        _s3_upload_stats['seconds_uploading'] += upload_seconds
+
+    _logger.info(
+        f'Uploaded {upload_bytes / 1024 / 1024:.1f} MB to '
+        f'{os.path.join(s3_key, modified_filename)} in {upload_seconds:.1f} seconds '
+        f'({upload_bytes / 1024 / 1024 / max(upload_seconds, 1e-9):.1f} MB/s).'
+    )
+
+    # try to trigger garbage collection early on the upload
+    uploaded_file.close()
+    del uploaded_file
+
+    return modified_filename
+
+
+def create_presigned_s3_upload(filename: str, size: int, s3_key: str) -> Dict[str, Any]:
+    """
+    Create a presigned POST a browser can use to upload a single file straight to
+    ``s3://{S3_BUCKET}/{s3_key}/{modified_filename}``, without sending it through this server.
+
+    The POST can only write that exact key, with exactly ``size`` bytes, within
+    ``S3_PRESIGNED_POST_EXPIRATION_SECONDS``. Once the browser is done, check the upload with
+    ``verify_s3_upload``.
+
+    Parameters
+    ----------
+    filename: str
+        Original name of the file to upload
+    size: int
+        Size of the file to upload, in bytes
+    s3_key: str
+        One of ``S3_DIRECT_UPLOAD_PREFIXES``
+
+    Returns
+    -------
+    presigned_upload: dict
+        Dictionary with the ``filename`` the file will be uploaded with (see ``upload_file_to_s3``),
+        its ``size``, and the ``url`` and form ``fields`` to POST the file to
+
+    Raises
+    ------
+    ValueError
+        If ``s3_key`` is not one of ``S3_DIRECT_UPLOAD_PREFIXES`` or the file is larger than
+        ``S3_DIRECT_UPLOAD_MAX_BYTES``
+
+    """
+    if s3_key not in S3_DIRECT_UPLOAD_PREFIXES:
+        raise ValueError(f'Files cannot be uploaded to {s3_key} from the browser.')
+
+    if size > S3_DIRECT_UPLOAD_MAX_BYTES:
+        raise ValueError(
+            f'{filename} is larger than the {S3_DIRECT_UPLOAD_MAX_BYTES // 1024 // 1024} MB limit.'
+        )
+
+    modified_filename = _get_modified_filename(filename=filename)
+
+    presigned_post = _get_s3_client().generate_presigned_post(
+        Bucket=S3_BUCKET,
+        Key=os.path.join(s3_key, modified_filename),
+        Conditions=[['content-length-range', size, size]],
+        ExpiresIn=S3_PRESIGNED_POST_EXPIRATION_SECONDS,
+    )
+
+    return {
+        'filename': modified_filename,
+        'size': size,
+        'url': presigned_post['url'],
+        'fields': presigned_post['fields'],
+    }
+
+
+def verify_s3_upload(filename: str, size: int, s3_key: str) -> bool:
+    """
+    Check that a file uploaded straight from the browser with ``create_presigned_s3_upload`` is in
+    S3 in its entirety.
+
+    Parameters
+    ----------
+    filename: str
+        ``filename`` returned by ``create_presigned_s3_upload``
+    size: int
+        Size of the file uploaded, in bytes
+    s3_key: str
+
+    Returns
+    -------
+    verified: bool
+        Whether an object of exactly ``size`` bytes exists at the file's key
+
+    """
+    try:
+        response = _get_s3_client().head_object(
+            Bucket=S3_BUCKET,
+            Key=os.path.join(s3_key, filename),
+        )
+    except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+        _logger.warning(f'Could not verify upload {os.path.join(s3_key, filename)}: {e}')
+
+        return False
+
+    if response['ContentLength'] != size:
+        _logger.warning(
+            f'Upload {os.path.join(s3_key, filename)} is {response["ContentLength"]} bytes, not '
+            f'{size}.'
+        )
+
+        return False
+
+    with _s3_upload_stats_lock:
+        _s3_upload_stats['direct_uploads'] += 1
+        _s3_upload_stats['bytes_uploaded_directly'] += size
+
+    return True
+
+
+class S3Upload:
+    """
+    Upload of a single file to S3 running in the background, started with ``start_s3_upload``.
+
+    Parameters
+    ----------
+    filename: str
+        Original name of the file being uploaded
+    size: int
+        Size of the file being uploaded, in bytes
+
+    """
+
+    def __init__(self, filename: str, size: int) -> None:
+        self.filename = filename
+        self.size = size
+        self.future: Optional[concurrent.futures.Future] = None
+
+        self._bytes_uploaded = 0
+        self._bytes_uploaded_lock = threading.Lock()
+
+    def _record_bytes_uploaded(self, num_bytes: int) -> None:
+        """Count bytes as uploaded. Called by every thread uploading a part of the file."""
+        with self._bytes_uploaded_lock:
+            self._bytes_uploaded += num_bytes
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the file uploaded so far, between 0 and 1."""
+        if self.size == 0:
+            return 1.0 if self.done() else 0.0
+
+        with self._bytes_uploaded_lock:
+            return max(0.0, min(self._bytes_uploaded / self.size, 1.0))
+
+    def done(self) -> bool:
+        """Whether the upload has finished, whether or not it succeeded."""
+        return self.future.done()
+
+    def failed(self) -> bool:
+        """Whether the upload has finished and failed."""
+        return self.future.done() and (
+            self.future.cancelled() or self.future.exception() is not None
+        )
+
+    def result(self) -> str:
+        """
+        Wait for the upload to finish and get the name it was uploaded to S3 with.
+
+        Returns
+        -------
+        modified_filename: str
+            See ``upload_file_to_s3``
+
+        Raises
+        ------
+        S3UploadError
+            If the file could not be uploaded, including if it could not be spooled to disk or its
+            upload journaled in SQLite
+
+        """
+        try:
+            return self.future.result()
+        except (
+            boto3.exceptions.Boto3Error,
+            botocore.exceptions.BotoCoreError,
+            botocore.exceptions.ClientError,
+            OSError,
+            sqlite3.Error,
+        ) as e:
+            raise S3UploadError(f'Could not upload {self.filename}: {e}') from e
+
+
+def start_s3_upload(
+    uploaded_file: st.runtime.uploaded_file_manager,
+    s3_key: str,
+    username: str,
+    submission_key: Optional[str] = None,
+) -> S3Upload:
+    """
+    Start uploading a file to S3 with ``upload_file_to_s3`` in the background, as soon as one of the
+    ``S3_MAX_CONCURRENT_FILE_UPLOADS`` upload workers shared by every session is free.
+
+    Parameters
+    ----------
+    uploaded_file: st.runtime.uploaded_file_manager
+    s3_key: str
+    username: str
+    submission_key: str
+        See ``upload_file_to_s3``
+
+    Returns
+    -------
+    S3Upload
+
+    """
+    upload = S3Upload(filename=uploaded_file.name, size=uploaded_file.size)
+
+    upload.future = _s3_upload_executor.submit(
+        upload_file_to_s3,
+        uploaded_file=uploaded_file,
+        s3_key=s3_key,
+        username=username,
+        callback=upload._record_bytes_uploaded,
+        submission_key=submission_key,
+    )
+
+    return upload
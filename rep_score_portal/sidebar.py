@@ -1,10 +1,11 @@
 import uuid
 
-import pandas as pd
 import streamlit as st
 
 from _version import __version__
+from input_output import invalidate_spreadsheet_cache
 from utils import (
+    drop_session_data,
     insert_line_break,
     reset_session_state_asset_information,
     reset_session_state_progress,
@@ -123,12 +124,10 @@ def construct_sidebar() -> None:
                     st.rerun()
             else:
                 if st.button(label='Refresh', key=st.session_state.refresh_button_key):
-                    if isinstance(st.session_state.get('asset_tracker_df'), pd.DataFrame):
-                        del st.session_state.asset_tracker_df
-                    if isinstance(st.session_state.get('data_explorer_df'), pd.DataFrame):
-                        del st.session_state.data_explorer_df
-                    if isinstance(st.session_state.get('assigned_user_assets'), list):
-                        del st.session_state.assigned_user_assets
+                    # if others refreshed just before us, share their fetch instead of starting more
+                    invalidate_spreadsheet_cache(join_in_flight_fetches=True)
+
+                    drop_session_data()
 
                     st.session_state.refresh_app = True
 
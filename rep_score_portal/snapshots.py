@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import gspread
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from streamlit.logger import get_logger
+
+from config import SNAPSHOT_DIRECTORY, SNAPSHOT_FULL_RESYNC_SECONDS
+from google_sheets import (
+    download_appended_google_spreadsheet_rows,
+    download_google_spreadsheet,
+    get_google_spreadsheet_version,
+    GoogleSheetsUnavailableError,
+    increment_google_sheets_client_stat,
+)
+
+
+_logger = get_logger(__name__)
+
+# key under which sync metadata is stored in each snapshot's Parquet schema metadata
+_SNAPSHOT_METADATA_KEY = b'rep_score_portal'
+
+
+def _get_snapshot_path(spread: str, sheet: int, exclude_columns: Iterable[str] = ()) -> str:
+    """Get the path of the Parquet snapshot file for a sheet of a Google Spreadsheet."""
+    spread_hash = hashlib.sha1(spread.encode('utf-8')).hexdigest()[:16]
+    filename = f'{spread_hash}_{sheet}'
+
+    if exclude_columns:
+        # every projection of a sheet is snapshotted separately
+        projection = '\n'.join(sorted(exclude_columns))
+        filename += f'_{hashlib.sha1(projection.encode("utf-8")).hexdigest()[:16]}'
+
+    return os.path.join(SNAPSHOT_DIRECTORY, f'{filename}.parquet')
+
+
+def read_snapshot(
+    spread: str,
+    sheet: int,
+    exclude_columns: Iterable[str] = (),
+) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    Read the local snapshot of a sheet of a Google Spreadsheet, if one exists.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    sheet: int
+        Sheet of the Google Spreadsheet
+    exclude_columns: list
+        Columns left out of the snapshot, if it is of a projection of the sheet
+
+    Returns
+    -------
+    snapshot: tuple
+        Tuple of ``(DataFrame, metadata)``, where ``metadata`` is the dictionary last passed to
+        ``write_snapshot`` for this sheet. If no readable snapshot exists, ``None`` is returned
+
+    """
+    snapshot_path = _get_snapshot_path(
+        spread=spread,
+        sheet=sheet,
+        exclude_columns=exclude_columns,
+    )
+
+    if not os.path.exists(snapshot_path):
+        return None
+
+    try:
+        table = pq.read_table(source=snapshot_path)
+    except (OSError, pa.ArrowException):
+        # a corrupt or unreadable snapshot is treated as if there were no snapshot at all
+        return None
+
+    metadata = json.loads((table.schema.metadata or dict()).get(_SNAPSHOT_METADATA_KEY, b'{}'))
+
+    return table.to_pandas(), metadata
+
+
+def write_snapshot(
+    spread: str,
+    sheet: int,
+    df: pd.DataFrame,
+    metadata: Dict[str, Any],
+    exclude_columns: Iterable[str] = (),
+) -> None:
+    """
+    Write the local snapshot of a sheet of a Google Spreadsheet, replacing any existing snapshot.
+
+    The snapshot is written to a temporary file first and then moved into place, so concurrent
+    readers only ever see a complete snapshot.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    sheet: int
+        Sheet of the Google Spreadsheet
+    df: pd.DataFrame
+        Parsed contents of the sheet. Column names must be unique strings
+    metadata: dict
+        JSON-serializable sync metadata to store alongside ``df``
+    exclude_columns: list
+        Columns left out of ``df``, if it is a projection of the sheet
+
+    Side Effects
+    ------------
+    Writes a Parquet file to ``SNAPSHOT_DIRECTORY``.
+
+    """
+    os.makedirs(SNAPSHOT_DIRECTORY, exist_ok=True)
+
+    table = pa.Table.from_pandas(df=df, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or dict()),
+        _SNAPSHOT_METADATA_KEY: json.dumps(metadata).encode('utf-8'),
+    })
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=SNAPSHOT_DIRECTORY, suffix='.tmp')
+    os.close(file_descriptor)
+
+    try:
+        pq.write_table(table=table, where=temporary_path)
+        os.replace(
+            temporary_path,
+            _get_snapshot_path(spread=spread, sheet=sheet, exclude_columns=exclude_columns),
+        )
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def delete_snapshots(spread: str, sheet: int) -> None:
+    """
+    Delete every local snapshot of a sheet of a Google Spreadsheet, including those of its
+    projections, so the next read downloads the whole sheet again.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    sheet: int
+        Sheet of the Google Spreadsheet
+
+    Side Effects
+    ------------
+    Deletes Parquet files from ``SNAPSHOT_DIRECTORY``.
+
+    """
+    prefix = os.path.splitext(os.path.basename(_get_snapshot_path(spread=spread, sheet=sheet)))[0]
+
+    if not os.path.isdir(SNAPSHOT_DIRECTORY):
+        return
+
+    for filename in os.listdir(SNAPSHOT_DIRECTORY):
+        if filename == f'{prefix}.parquet' or (
+            filename.startswith(f'{prefix}_') and filename.endswith('.parquet')
+        ):
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIRECTORY, filename))
+            except FileNotFoundError:
+                # another thread deleted it first
+                pass
+
+
+def sync_google_spreadsheet_snapshot(
+    spread: str,
+    sheet: int,
+    exclude_columns: Tuple[str, ...] = (),
+    cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Bring the local snapshot of a sheet of a Google Spreadsheet up to date and return its contents.
+
+    The spreadsheet's Google Drive version is checked first - if it has not changed since ``cached``
+    or the snapshot was synced, nothing is downloaded at all, and if it has, the entire sheet is
+    downloaded again, since a version change alone cannot tell rows being appended apart from
+    existing rows being edited. Only if the version cannot be checked (e.g. the Drive API is not
+    enabled) and the snapshot was fully downloaded within the last ``SNAPSHOT_FULL_RESYNC_SECONDS``
+    are just the rows appended since the last sync pulled. Either way, if Google Sheets cannot be
+    reached, any existing snapshot is served as-is.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet to read in
+    sheet: int
+        Sheet of the Google Spreadsheet to read in
+    exclude_columns: tuple
+        Header names of columns to leave out of the DataFrame
+    cached: tuple
+        Tuple of ``(DataFrame, version)`` last returned by this function for this sheet, if it is
+        still in memory. If the version is unchanged, this same DataFrame is returned
+
+    Returns
+    -------
+    df: pd.DataFrame
+    version: str
+        Google Drive version of the spreadsheet ``df`` is up to date with, or ``None`` if unknown
+
+    Side Effects
+    ------------
+    Writes the updated snapshot to ``SNAPSHOT_DIRECTORY``.
+
+    """
+    version = None
+
+    try:
+        version = get_google_spreadsheet_version(spread=spread)
+    except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+        if cached is not None:
+            _logger.warning(f'Serving sheet {sheet} of {spread} without syncing: {e}')
+
+            return cached
+    except (gspread.exceptions.APIError, KeyError) as e:
+        # e.g. the Drive API is not enabled - fall back to syncing without change detection
+        _logger.warning(f'Could not check the version of {spread}: {e}')
+
+    if version is not None and cached is not None and cached[1] == version:
+        increment_google_sheets_client_stat('change_detection_hits')
+
+        return cached
+
+    snapshot = read_snapshot(spread=spread, sheet=sheet, exclude_columns=exclude_columns)
+
+    if version is not None:
+        if snapshot is not None and snapshot[1].get('version') == version:
+            increment_google_sheets_client_stat('change_detection_hits')
+
+            return snapshot[0], version
+
+        increment_google_sheets_client_stat('change_detection_misses')
+
+    df, metadata = None, None
+
+    if (
+        version is None
+        and snapshot is not None
+        and snapshot[1].get('num_columns')
+        and (time.time() - snapshot[1].get('full_synced_at', 0)) < SNAPSHOT_FULL_RESYNC_SECONDS
+    ):
+        snapshot_df, snapshot_metadata = snapshot
+
+        try:
+            df, metadata = download_appended_google_spreadsheet_rows(
+                spread=spread,
+                snapshot_df=snapshot_df,
+                metadata=snapshot_metadata,
+            )
+        except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+            _logger.warning(f'Serving snapshot of sheet {sheet} of {spread} without syncing: {e}')
+
+            return snapshot_df, snapshot_metadata.get('version')
+        except gspread.exceptions.APIError as e:
+            # e.g. the sheet was renamed - fall back to downloading the entire sheet again
+            _logger.warning(f'Could not pull appended rows of sheet {sheet} of {spread}: {e}')
+
+        if df is snapshot_df:
+            return snapshot_df, None
+
+    if df is None:
+        try:
+            df, metadata = download_google_spreadsheet(
+                spread=spread,
+                sheet=sheet,
+                exclude_columns=exclude_columns,
+            )
+        except (GoogleSheetsUnavailableError, requests.exceptions.RequestException) as e:
+            if snapshot is None:
+                raise
+
+            # an out-of-date snapshot is better than no data at all during an outage
+            _logger.warning(f'Serving out-of-date snapshot of sheet {sheet} of {spread}: {e}')
+
+            return snapshot[0], snapshot[1].get('version')
+
+    # the version was checked before downloading, so any change made since is caught next time
+    metadata = {**metadata, 'version': version}
+
+    try:
+        write_snapshot(
+            spread=spread,
+            sheet=sheet,
+            df=df,
+            metadata=metadata,
+            exclude_columns=exclude_columns,
+        )
+    except (OSError, ValueError, pa.ArrowException) as e:
+        # e.g. duplicate column names, which Parquet does not allow - just skip the snapshot
+        _logger.warning(f'Could not write snapshot of sheet {sheet} of {spread}: {e}')
+
+    return df, version
@@ -0,0 +1,727 @@
+import abc
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import gspread
+import pandas as pd
+import requests
+from streamlit.logger import get_logger
+
+from config import (
+    STORAGE_BACKEND,
+    STORAGE_SQLITE_DATABASE,
+    STORAGE_SQLITE_INDEXED_COLUMNS,
+    STORAGE_SQLITE_SYNC_WITH_GOOGLE_SHEETS,
+)
+from google_sheets import (
+    append_rows_to_google_spreadsheet,
+    download_google_spreadsheet_column,
+    download_google_spreadsheet_header,
+    download_google_spreadsheet_row,
+    get_google_spreadsheet_version,
+    GoogleSheetsUnavailableError,
+    increment_google_sheets_client_stat,
+)
+from snapshots import delete_snapshots, sync_google_spreadsheet_snapshot
+
+
+_logger = get_logger(__name__)
+
+
+class TabularStorage(abc.ABC):
+    """
+    Backend the portal reads its sheets from and appends new asset tracker rows to.
+
+    Whichever backend holds them, sheets are identified by the URL of the Google Spreadsheet they
+    mirror and their index in it, and read as DataFrames indexed by each row's row number in the
+    sheet, so the asset tracker, primary dataset, and project tracker (from which permissions are
+    built) are all read the same way.
+
+    """
+
+    @abc.abstractmethod
+    def get_version(self, spread: str) -> str:
+        """
+        Get the current version of a spreadsheet, which changes whenever any of its sheets change.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+
+        Returns
+        -------
+        version: str
+
+        """
+
+    @abc.abstractmethod
+    def read_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...] = (),
+        cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """
+        Read a sheet into a DataFrame indexed by each row's row number in the sheet.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+        exclude_columns: tuple
+            Header names of columns to leave out of the DataFrame
+        cached: tuple
+            Tuple of ``(DataFrame, version)`` last returned by this method for this sheet, if it is
+            still in memory. If the version is unchanged, this same DataFrame is returned
+
+        Returns
+        -------
+        df: pd.DataFrame
+        version: str
+            Version of the spreadsheet ``df`` is up to date with, or ``None`` if unknown
+
+        """
+
+    @abc.abstractmethod
+    def read_row(self, spread: str, sheet: int, row_number: int) -> Dict[str, str]:
+        """
+        Read a single row of a sheet.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+        row_number: int
+            1-based row number of the row in the sheet
+
+        Returns
+        -------
+        row: dict
+            Dictionary mapping each column's header name to its value in the row
+
+        """
+
+    @abc.abstractmethod
+    def read_header(self, spread: str, sheet: int) -> List[str]:
+        """
+        Read the header row of a sheet.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+
+        Returns
+        -------
+        header: list
+            Header name of every column of the sheet, in order. A sheet with no header row has no
+            columns
+
+        """
+
+    @abc.abstractmethod
+    def read_column(self, spread: str, sheet: int, column: str) -> List[str]:
+        """
+        Read every value of a column of a sheet from wherever rows are appended to, never from a
+        local copy that may be out of date, e.g. to check which rows a sheet already has. If that
+        cannot be read, this raises rather than falling back to a local copy.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+        column: str
+            Header name of the column
+
+        Returns
+        -------
+        values: list
+            Value of the column in every row of the sheet below the header row, in order
+
+        Raises
+        ------
+        KeyError
+            If the sheet has no ``column``
+
+        """
+
+    @abc.abstractmethod
+    def append_rows(self, spread: str, rows: List[List[str]]) -> None:
+        """
+        Append rows to the first sheet of a spreadsheet, writing either every row or none of them.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        rows: list
+            List of rows of cell values, each written positionally starting at the first column
+
+        """
+
+    def resync_sheet(self, spread: str, sheet: int) -> None:
+        """
+        Throw away any local copy of a sheet synced from elsewhere, so the next ``read_sheet``
+        reads the whole sheet from its source again rather than only what looks like it changed.
+        Backends that are themselves the source of their sheets have nothing to throw away.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+
+        """
+
+
+class SQLiteStorage(TabularStorage):
+    """
+    Sheets stored in a local SQLite database, with ``STORAGE_SQLITE_INDEXED_COLUMNS`` indexed.
+
+    Each sheet is stored in its own table, with one column per sheet column and the row number in
+    the sheet as its primary key. The version of a spreadsheet is bumped on every write to it.
+
+    Parameters
+    ----------
+    database: str
+        Path to the SQLite database file, created if it does not exist yet
+
+    """
+
+    def __init__(self, database: str) -> None:
+        self.database = database
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the database, creating it if needed. Use as a context manager - the
+        transaction is committed (or rolled back on error) and the connection closed once the
+        ``with`` block exits.
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.database)), exist_ok=True)
+
+        connection = sqlite3.connect(database=self.database, timeout=30)
+
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sheets (
+                    spread TEXT NOT NULL,
+                    sheet INTEGER NOT NULL,
+                    columns TEXT NOT NULL,
+                    source_version TEXT,
+                    written_at REAL NOT NULL,
+                    PRIMARY KEY (spread, sheet)
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spreadsheet_versions (
+                    spread TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+                """
+            )
+
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _get_table_name(spread: str, sheet: int) -> str:
+        """Get the name of the table a sheet is stored in."""
+        return f'sheet_{hashlib.sha1(spread.encode("utf-8")).hexdigest()[:16]}_{sheet}'
+
+    @staticmethod
+    def _get_spreadsheet_version(connection: sqlite3.Connection, spread: str) -> str:
+        """Get the version of a spreadsheet, which is ``0`` if it was never written to."""
+        record = connection.execute(
+            'SELECT version FROM spreadsheet_versions WHERE spread = ?',
+            (spread,),
+        ).fetchone()
+
+        return str(record[0] if record is not None else 0)
+
+    @staticmethod
+    def _bump_spreadsheet_version(connection: sqlite3.Connection, spread: str) -> None:
+        """Bump the version of a spreadsheet after writing to any of its sheets."""
+        connection.execute(
+            'INSERT INTO spreadsheet_versions (spread, version) VALUES (?, 1) '
+            'ON CONFLICT (spread) DO UPDATE SET version = version + 1',
+            (spread,),
+        )
+
+    @staticmethod
+    def _get_sheet_columns(connection: sqlite3.Connection, spread: str, sheet: int) -> List[str]:
+        """Get the header names of a stored sheet, raising a ``KeyError`` if it is not stored."""
+        record = connection.execute(
+            'SELECT columns FROM sheets WHERE spread = ? AND sheet = ?',
+            (spread, sheet),
+        ).fetchone()
+
+        if record is None:
+            raise KeyError(f'Sheet {sheet} of {spread} is not in SQLite storage')
+
+        return json.loads(record[0])
+
+    def _create_sheet_table(
+        self,
+        connection: sqlite3.Connection,
+        spread: str,
+        sheet: int,
+        columns: List[str],
+    ) -> None:
+        """Create the (empty) table of a sheet, along with indexes of its indexed columns."""
+        table_name = self._get_table_name(spread=spread, sheet=sheet)
+
+        # sheet columns are stored positionally, since header names need not be valid or unique
+        connection.execute(
+            f'CREATE TABLE {table_name} (row_number INTEGER PRIMARY KEY'
+            + ''.join(f', c{col_idx} TEXT NOT NULL DEFAULT \'\'' for col_idx in range(len(columns)))
+            + ')'
+        )
+
+        for col_idx, col in enumerate(columns):
+            if col in STORAGE_SQLITE_INDEXED_COLUMNS:
+                connection.execute(
+                    f'CREATE INDEX {table_name}_c{col_idx} ON {table_name} (c{col_idx})'
+                )
+
+    def write_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        df: pd.DataFrame,
+        source_version: Optional[str] = None,
+    ) -> None:
+        """
+        Replace the stored contents of a sheet, such as with a copy of it read from Google Sheets.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+        df: pd.DataFrame
+            Every column of the sheet, indexed by each row's row number in the sheet
+        source_version: str
+            Version of wherever ``df`` was copied from, returned by ``get_source_version``
+
+        Side Effects
+        ------------
+        Replaces the sheet's table in the SQLite database and bumps the spreadsheet's version.
+
+        """
+        table_name = self._get_table_name(spread=spread, sheet=sheet)
+        columns = [str(col) for col in df.columns]
+
+        with self._connect() as connection:
+            connection.execute(f'DROP TABLE IF EXISTS {table_name}')
+
+            self._create_sheet_table(
+                connection=connection,
+                spread=spread,
+                sheet=sheet,
+                columns=columns,
+            )
+
+            if len(columns) > 0:
+                connection.executemany(
+                    f'INSERT INTO {table_name} (row_number, '
+                    + ', '.join(f'c{col_idx}' for col_idx in range(len(columns)))
+                    + ') VALUES (?' + ', ?' * len(columns) + ')',
+                    (
+                        (int(row_number), *('' if value is None else str(value) for value in row))
+                        for row_number, row in zip(df.index, df.itertuples(index=False))
+                    ),
+                )
+
+            connection.execute(
+                'INSERT OR REPLACE INTO sheets '
+                '(spread, sheet, columns, source_version, written_at) VALUES (?, ?, ?, ?, ?)',
+                (spread, sheet, json.dumps(columns), source_version, time.time()),
+            )
+
+            self._bump_spreadsheet_version(connection=connection, spread=spread)
+
+    def get_source_version(self, spread: str, sheet: int) -> Optional[str]:
+        """
+        Get the ``source_version`` a sheet was last written with by ``write_sheet``.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+
+        Returns
+        -------
+        source_version: str
+            If the sheet is not stored, or was written without a source version, ``None`` is
+            returned
+
+        """
+        with self._connect() as connection:
+            record = connection.execute(
+                'SELECT source_version FROM sheets WHERE spread = ? AND sheet = ?',
+                (spread, sheet),
+            ).fetchone()
+
+        return record[0] if record is not None else None
+
+    def forget_source_version(self, spread: str, sheet: int) -> None:
+        """
+        Forget the ``source_version`` a sheet was last written with, so it no longer matches any
+        version of its source and is written again in full.
+
+        Parameters
+        ----------
+        spread: str
+            URL of the Google Spreadsheet
+        sheet: int
+            Sheet of the Google Spreadsheet
+
+        Side Effects
+        ------------
+        Updates the SQLite database.
+
+        """
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE sheets SET source_version = NULL WHERE spread = ? AND sheet = ?',
+                (spread, sheet),
+            )
+
+    def get_version(self, spread: str) -> str:
+        """See ``TabularStorage.get_version``."""
+        with self._connect() as connection:
+            return self._get_spreadsheet_version(connection=connection, spread=spread)
+
+    def read_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...] = (),
+        cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """See ``TabularStorage.read_sheet``. Raises a ``KeyError`` if the sheet is not stored."""
+        with self._connect() as connection:
+            version = self._get_spreadsheet_version(connection=connection, spread=spread)
+
+            if cached is not None and cached[1] == version:
+                return cached
+
+            columns = self._get_sheet_columns(connection=connection, spread=spread, sheet=sheet)
+            selected_columns = [
+                (col_idx, col) for col_idx, col in enumerate(columns) if col not in exclude_columns
+            ]
+
+            records = connection.execute(
+                'SELECT row_number'
+                + ''.join(f', c{col_idx}' for col_idx, _ in selected_columns)
+                + f' FROM {self._get_table_name(spread=spread, sheet=sheet)} ORDER BY row_number'
+            ).fetchall()
+
+        df = pd.DataFrame(
+            data=[record[1:] for record in records],
+            index=[record[0] for record in records],
+            columns=[col for _, col in selected_columns],
+            dtype=object,
+        )
+
+        return df, version
+
+    def read_row(self, spread: str, sheet: int, row_number: int) -> Dict[str, str]:
+        """See ``TabularStorage.read_row``. Raises a ``KeyError`` if the sheet is not stored."""
+        with self._connect() as connection:
+            columns = self._get_sheet_columns(connection=connection, spread=spread, sheet=sheet)
+
+            record = connection.execute(
+                f'SELECT * FROM {self._get_table_name(spread=spread, sheet=sheet)} '
+                'WHERE row_number = ?',
+                (row_number,),
+            ).fetchone()
+
+        return dict(zip(columns, record[1:] if record is not None else []))
+
+    def read_header(self, spread: str, sheet: int) -> List[str]:
+        """See ``TabularStorage.read_header``. A sheet that is not stored has no columns."""
+        with self._connect() as connection:
+            try:
+                return self._get_sheet_columns(connection=connection, spread=spread, sheet=sheet)
+            except KeyError:
+                return list()
+
+    def read_column(self, spread: str, sheet: int, column: str) -> List[str]:
+        """See ``TabularStorage.read_column``. Raises a ``KeyError`` if the sheet is not stored."""
+        with self._connect() as connection:
+            columns = self._get_sheet_columns(connection=connection, spread=spread, sheet=sheet)
+
+            if column not in columns:
+                raise KeyError(f'Sheet {sheet} of {spread} has no "{column}" column.')
+
+            records = connection.execute(
+                f'SELECT c{columns.index(column)} '
+                f'FROM {self._get_table_name(spread=spread, sheet=sheet)} ORDER BY row_number'
+            ).fetchall()
+
+        return [record[0] for record in records]
+
+    def append_rows(self, spread: str, rows: List[List[str]]) -> None:
+        """
+        See ``TabularStorage.append_rows``. If a row is wider than the sheet, columns with empty
+        headers are added to fit it, like in Google Sheets.
+
+        """
+        with self._connect() as connection:
+            try:
+                columns = self._get_sheet_columns(connection=connection, spread=spread, sheet=0)
+            except KeyError:
+                columns = list()
+
+                self._create_sheet_table(
+                    connection=connection,
+                    spread=spread,
+                    sheet=0,
+                    columns=columns,
+                )
+
+            table_name = self._get_table_name(spread=spread, sheet=0)
+            num_columns = max([len(columns), *(len(row) for row in rows)])
+
+            for col_idx in range(len(columns), num_columns):
+                connection.execute(
+                    f'ALTER TABLE {table_name} ADD COLUMN c{col_idx} TEXT NOT NULL DEFAULT \'\''
+                )
+
+            columns += [''] * (num_columns - len(columns))
+
+            # row 1 is the header row, so the first row of a sheet is row 2
+            last_row_number = connection.execute(
+                f'SELECT COALESCE(MAX(row_number), 1) FROM {table_name}'
+            ).fetchone()[0]
+
+            for row_idx, row in enumerate(rows, start=1):
+                connection.execute(
+                    f'INSERT INTO {table_name} (row_number'
+                    + ''.join(f', c{col_idx}' for col_idx in range(len(row)))
+                    + ') VALUES (?' + ', ?' * len(row) + ')',
+                    (last_row_number + row_idx, *row),
+                )
+
+            connection.execute(
+                'INSERT INTO sheets (spread, sheet, columns, written_at) VALUES (?, 0, ?, ?) '
+                'ON CONFLICT (spread, sheet) DO UPDATE '
+                'SET columns = excluded.columns, written_at = excluded.written_at',
+                (spread, json.dumps(columns), time.time()),
+            )
+
+            self._bump_spreadsheet_version(connection=connection, spread=spread)
+
+
+class GoogleSheetsStorage(TabularStorage):
+    """Sheets read from and appended to Google Sheets directly, through local snapshots."""
+
+    def get_version(self, spread: str) -> str:
+        """See ``TabularStorage.get_version``."""
+        return get_google_spreadsheet_version(spread=spread)
+
+    def read_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...] = (),
+        cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """See ``TabularStorage.read_sheet`` and ``sync_google_spreadsheet_snapshot``."""
+        return sync_google_spreadsheet_snapshot(
+            spread=spread,
+            sheet=sheet,
+            exclude_columns=exclude_columns,
+            cached=cached,
+        )
+
+    def read_row(self, spread: str, sheet: int, row_number: int) -> Dict[str, str]:
+        """See ``TabularStorage.read_row``."""
+        return download_google_spreadsheet_row(spread=spread, sheet=sheet, row_number=row_number)
+
+    def read_header(self, spread: str, sheet: int) -> List[str]:
+        """See ``TabularStorage.read_header``."""
+        return download_google_spreadsheet_header(spread=spread, sheet=sheet)
+
+    def read_column(self, spread: str, sheet: int, column: str) -> List[str]:
+        """See ``TabularStorage.read_column``. Never reads a local snapshot."""
+        return download_google_spreadsheet_column(spread=spread, sheet=sheet, column=column)
+
+    def append_rows(self, spread: str, rows: List[List[str]]) -> None:
+        """See ``TabularStorage.append_rows``."""
+        append_rows_to_google_spreadsheet(spread=spread, rows=rows)
+
+    def resync_sheet(self, spread: str, sheet: int) -> None:
+        """See ``TabularStorage.resync_sheet``. Deletes the sheet's local snapshots."""
+        delete_snapshots(spread=spread, sheet=sheet)
+
+
+class GoogleSheetsSQLiteReplicaStorage(TabularStorage):
+    """
+    Sheets read from a SQLite replica of Google Sheets, and appended to Google Sheets directly.
+
+    Before a sheet is read, the spreadsheet's Google Drive version is checked, and the sheet is only
+    copied from Google Sheets into the replica again if it changed since it was last copied. If
+    Google Sheets cannot be reached, the replica is read as-is.
+
+    Parameters
+    ----------
+    replica: SQLiteStorage
+
+    """
+
+    def __init__(self, replica: SQLiteStorage) -> None:
+        self.replica = replica
+
+    def get_version(self, spread: str) -> str:
+        """See ``TabularStorage.get_version``."""
+        return get_google_spreadsheet_version(spread=spread)
+
+    def read_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...] = (),
+        cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """See ``TabularStorage.read_sheet``."""
+        try:
+            version = get_google_spreadsheet_version(spread=spread)
+        except (
+            GoogleSheetsUnavailableError,
+            gspread.exceptions.APIError,
+            requests.exceptions.RequestException,
+            KeyError,
+        ) as e:
+            if cached is not None:
+                return cached
+
+            _logger.warning(f'Reading sheet {sheet} of {spread} from SQLite without syncing: {e}')
+
+            try:
+                return self.replica.read_sheet(
+                    spread=spread,
+                    sheet=sheet,
+                    exclude_columns=exclude_columns,
+                )[0], None
+            except KeyError:
+                # the sheet was never copied into the replica, so there is nothing to fall back to
+                raise e
+
+        if cached is not None and cached[1] == version:
+            increment_google_sheets_client_stat('change_detection_hits')
+
+            return cached
+
+        if self.replica.get_source_version(spread=spread, sheet=sheet) == version:
+            increment_google_sheets_client_stat('change_detection_hits')
+        else:
+            increment_google_sheets_client_stat('change_detection_misses')
+
+            # every column is copied, so the replica can serve every projection of the sheet
+            df, _ = sync_google_spreadsheet_snapshot(spread=spread, sheet=sheet)
+
+            self.replica.write_sheet(spread=spread, sheet=sheet, df=df, source_version=version)
+
+        df, _ = self.replica.read_sheet(spread=spread, sheet=sheet, exclude_columns=exclude_columns)
+
+        return df, version
+
+    def read_row(self, spread: str, sheet: int, row_number: int) -> Dict[str, str]:
+        """See ``TabularStorage.read_row``."""
+        try:
+            return self.replica.read_row(spread=spread, sheet=sheet, row_number=row_number)
+        except KeyError:
+            return download_google_spreadsheet_row(
+                spread=spread,
+                sheet=sheet,
+                row_number=row_number,
+            )
+
+    def read_header(self, spread: str, sheet: int) -> List[str]:
+        """
+        See ``TabularStorage.read_header``. Rows are appended to Google Sheets, so its header row is
+        read from there rather than from the replica.
+
+        """
+        return download_google_spreadsheet_header(spread=spread, sheet=sheet)
+
+    def read_column(self, spread: str, sheet: int, column: str) -> List[str]:
+        """
+        See ``TabularStorage.read_column``. Rows are appended to Google Sheets, so the column is
+        read from there rather than from the replica.
+
+        """
+        return download_google_spreadsheet_column(spread=spread, sheet=sheet, column=column)
+
+    def append_rows(self, spread: str, rows: List[List[str]]) -> None:
+        """
+        See ``TabularStorage.append_rows``. Rows are only appended to Google Sheets, and copied into
+        the replica along with the rest of the sheet the next time it is read.
+
+        """
+        append_rows_to_google_spreadsheet(spread=spread, rows=rows)
+
+    def resync_sheet(self, spread: str, sheet: int) -> None:
+        """
+        See ``TabularStorage.resync_sheet``. Deletes the sheet's local snapshots, and makes sure it
+        is copied into the replica again the next time it is read.
+
+        """
+        delete_snapshots(spread=spread, sheet=sheet)
+
+        self.replica.forget_source_version(spread=spread, sheet=sheet)
+
+
+# backend selected by ``STORAGE_BACKEND`` that every sheet is read from, created on first use
+_storage: Dict[str, Optional[TabularStorage]] = {'storage': None}
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> TabularStorage:
+    """Get the storage backend selected by ``STORAGE_BACKEND``, creating it on first use."""
+    with _storage_lock:
+        if _storage['storage'] is None:
+            if STORAGE_BACKEND == 'google_sheets':
+                _storage['storage'] = GoogleSheetsStorage()
+            elif STORAGE_BACKEND == 'sqlite':
+                sqlite_storage = SQLiteStorage(database=STORAGE_SQLITE_DATABASE)
+
+                _storage['storage'] = (
+                    GoogleSheetsSQLiteReplicaStorage(replica=sqlite_storage)
+                    if STORAGE_SQLITE_SYNC_WITH_GOOGLE_SHEETS
+                    else sqlite_storage
+                )
+            else:
+                raise ValueError(f'Unknown storage backend: {STORAGE_BACKEND}')
+
+        return _storage['storage']
@@ -0,0 +1,553 @@
+import collections
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import gspread
+import requests
+from streamlit.logger import get_logger
+
+from config import (
+    SUBMISSION_QUEUE_COALESCE_SECONDS,
+    SUBMISSION_QUEUE_DATABASE,
+    SUBMISSION_QUEUE_MAX_BATCH_SIZE,
+    SUBMISSION_QUEUE_RETRY_SECONDS,
+)
+from google_sheets import GoogleSheetsUnavailableError
+from storage import get_storage
+
+
+_logger = get_logger(__name__)
+
+# background thread writing rows in the submission queue to Google Sheets, started on first use,
+# and an event to wake it up as soon as a new row is queued
+_submission_queue_worker: Dict[str, Optional[threading.Thread]] = {'thread': None}
+_submission_queue_worker_lock = threading.Lock()
+_submission_queue_wakeup = threading.Event()
+
+# ``(spread, column index)`` pairs whose header row has been checked to have ``Submission ID`` at
+# that column, so it is only checked once per process
+_submission_id_columns_checked: Set[Tuple[str, int]] = set()
+_submission_id_columns_checked_lock = threading.Lock()
+
+
+class MissingSubmissionIDColumnError(Exception):
+    """Raised when the asset tracker has no ``Submission ID`` header where new rows write it."""
+
+
+class QueuedRow(NamedTuple):
+    """A new asset tracker row recorded in the local submission queue."""
+
+    id: int
+    idempotency_key: str
+    spread: str
+    row: Dict[str, str]
+    attempts: int
+    created_at: float
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    Open a connection to the submission queue database, creating it if needed. Use as a context
+    manager - the transaction is committed (or rolled back on error) and the connection closed once
+    the ``with`` block exits.
+
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(SUBMISSION_QUEUE_DATABASE)), exist_ok=True)
+
+    connection = sqlite3.connect(database=SUBMISSION_QUEUE_DATABASE, timeout=30)
+
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queued_rows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                spread TEXT NOT NULL,
+                row TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                appended_at REAL
+            )
+            """
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS queued_rows_status ON queued_rows (status, spread)'
+        )
+
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _to_queued_row(record: Tuple[Any, ...]) -> QueuedRow:
+    """Convert a ``queued_rows`` record into a ``QueuedRow``."""
+    return QueuedRow(
+        id=record[0],
+        idempotency_key=record[1],
+        spread=record[2],
+        row=json.loads(record[3]),
+        attempts=record[4],
+        created_at=record[5],
+    )
+
+
+def enqueue_row(idempotency_key: str, spread: str, row: Dict[str, str]) -> int:
+    """
+    Durably record a new row to append to a Google Spreadsheet.
+
+    Parameters
+    ----------
+    idempotency_key: str
+        Unique key identifying the row, also written to the row itself so an append whose response
+        was lost can be detected instead of appending the row twice
+    spread: str
+        URL of the Google Spreadsheet to append the row to
+    row: dict
+        Ordered dictionary of column names to cell values. Values are written positionally, in
+        order, starting at the first column
+
+    Returns
+    -------
+    id: int
+        ID of the queued row
+
+    Side Effects
+    ------------
+    Inserts a row into the ``SUBMISSION_QUEUE_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        cursor = connection.execute(
+            'INSERT INTO queued_rows (idempotency_key, spread, row, created_at) '
+            'VALUES (?, ?, ?, ?)',
+            (idempotency_key, spread, json.dumps(row), time.time()),
+        )
+
+        return cursor.lastrowid
+
+
+def get_pending_rows(spread: Optional[str] = None) -> List[QueuedRow]:
+    """
+    Get every queued row that has not been appended to its Google Spreadsheet yet, oldest first.
+
+    Parameters
+    ----------
+    spread: str
+        If provided, only get rows queued for this Google Spreadsheet
+
+    Returns
+    -------
+    rows: list
+        List of ``QueuedRow``s
+
+    """
+    query = (
+        'SELECT id, idempotency_key, spread, row, attempts, created_at FROM queued_rows '
+        "WHERE status = 'pending'"
+    )
+    parameters = tuple()
+
+    if spread is not None:
+        query += ' AND spread = ?'
+        parameters = (spread,)
+
+    with _connect() as connection:
+        records = connection.execute(query + ' ORDER BY id', parameters).fetchall()
+
+    return [_to_queued_row(record=record) for record in records]
+
+
+def get_queued_row(row_id: int) -> Optional[QueuedRow]:
+    """
+    Get a queued row by its ID, whether or not it has been appended yet.
+
+    Parameters
+    ----------
+    row_id: int
+
+    Returns
+    -------
+    row: QueuedRow
+        If no row with this ID exists, ``None`` is returned
+
+    """
+    with _connect() as connection:
+        record = connection.execute(
+            'SELECT id, idempotency_key, spread, row, attempts, created_at FROM queued_rows '
+            'WHERE id = ?',
+            (row_id,),
+        ).fetchone()
+
+    return _to_queued_row(record=record) if record is not None else None
+
+
+def get_row_status(idempotency_key: str) -> Optional[str]:
+    """
+    Get whether a queued row has been appended to its Google Spreadsheet yet.
+
+    Parameters
+    ----------
+    idempotency_key: str
+
+    Returns
+    -------
+    status: str
+        Either ``pending`` or ``appended``. If no row with this key was queued, ``None`` is returned
+
+    """
+    with _connect() as connection:
+        record = connection.execute(
+            'SELECT status FROM queued_rows WHERE idempotency_key = ?',
+            (idempotency_key,),
+        ).fetchone()
+
+    return record[0] if record is not None else None
+
+
+def mark_rows_appended(idempotency_keys: List[str]) -> None:
+    """
+    Mark queued rows as appended to their Google Spreadsheet, so they are no longer pending.
+
+    Parameters
+    ----------
+    idempotency_keys: list
+
+    Side Effects
+    ------------
+    Updates the rows in the ``SUBMISSION_QUEUE_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.executemany(
+            "UPDATE queued_rows SET status = 'appended', appended_at = ? WHERE idempotency_key = ?",
+            [(time.time(), idempotency_key) for idempotency_key in idempotency_keys],
+        )
+
+
+def record_attempts(idempotency_keys: List[str]) -> None:
+    """
+    Record an attempt to append queued rows to their Google Spreadsheet, before it is sent. Since
+    it is recorded first, a row that may have been appended by an attempt that never got as far as
+    ``mark_rows_appended`` (e.g. because the process died) is always known to have been attempted.
+
+    Parameters
+    ----------
+    idempotency_keys: list
+
+    Side Effects
+    ------------
+    Updates the rows in the ``SUBMISSION_QUEUE_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.executemany(
+            'UPDATE queued_rows SET attempts = attempts + 1 WHERE idempotency_key = ?',
+            [(idempotency_key,) for idempotency_key in idempotency_keys],
+        )
+
+
+def record_failed_attempts(idempotency_keys: List[str], error: str) -> None:
+    """
+    Record why an attempt to append queued rows to their Google Spreadsheet failed. The rows stay
+    pending.
+
+    Parameters
+    ----------
+    idempotency_keys: list
+    error: str
+        Description of why the attempt failed
+
+    Side Effects
+    ------------
+    Updates the rows in the ``SUBMISSION_QUEUE_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.executemany(
+            'UPDATE queued_rows SET last_error = ? WHERE idempotency_key = ?',
+            [(error, idempotency_key) for idempotency_key in idempotency_keys],
+        )
+
+
+def check_submission_id_column(spread: str, column_index: int) -> None:
+    """
+    Check that the header row of the first sheet of a Google Spreadsheet has ``Submission ID`` at
+    the column new rows write their submission ID to, without which a queued row could be appended
+    more than once. Once a spreadsheet passes, it is not checked again by this process. Makes no
+    Streamlit calls.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    column_index: int
+        0-based index of the ``Submission ID`` column in new rows
+
+    Raises
+    ------
+    MissingSubmissionIDColumnError
+        If the header row does not have ``Submission ID`` at ``column_index``
+
+    """
+    with _submission_id_columns_checked_lock:
+        if (spread, column_index) in _submission_id_columns_checked:
+            return
+
+    header = get_storage().read_header(spread=spread, sheet=0)
+
+    if column_index >= len(header) or header[column_index] != 'Submission ID':
+        raise MissingSubmissionIDColumnError(
+            f'{spread} has no "Submission ID" header in column {column_index + 1} of its first '
+            'sheet, so queued rows could be appended more than once.'
+        )
+
+    with _submission_id_columns_checked_lock:
+        _submission_id_columns_checked.add((spread, column_index))
+
+
+def _get_appended_submission_ids(spread: str) -> Set[str]:
+    """
+    Get every ``Submission ID`` already appended to the first sheet of a Google Spreadsheet, read
+    from wherever rows are appended to rather than the process-wide cache or a local snapshot, any
+    of which may predate the append. If that cannot be read, this raises rather than returning IDs
+    that may be out of date. Makes no Streamlit calls.
+
+    Raises
+    ------
+    MissingSubmissionIDColumnError
+        If the sheet has no ``Submission ID`` column
+
+    """
+    try:
+        submission_ids = get_storage().read_column(spread=spread, sheet=0, column='Submission ID')
+    except KeyError as e:
+        raise MissingSubmissionIDColumnError(
+            f'{spread} has no "Submission ID" column, so queued rows could be appended more than '
+            'once.'
+        ) from e
+
+    return set(submission_ids)
+
+
+def _flush_submission_queue_batch(
+    spread: str,
+    queued_rows: List[QueuedRow],
+    on_rows_appended: Callable[[str], None],
+) -> bool:
+    """
+    Append a batch of queued rows to a Google Spreadsheet in a single write and acknowledge each of
+    them in the submission queue.
+
+    Every attempt is recorded in the submission queue before it is sent, and rows attempted before
+    are only appended if they are not already in the sheet, since an earlier attempt may have been
+    written by Google Sheets even though it was never acknowledged - its response may have been
+    lost, or the process may have died (or SQLite failed) before ``mark_rows_appended``. The sheet's
+    ``Submission ID``s are read live for this, and if they cannot be, the batch is held until the
+    next attempt.
+
+    Parameters
+    ----------
+    spread: str
+        URL of the Google Spreadsheet
+    queued_rows: list
+        List of ``QueuedRow``s to append
+    on_rows_appended: function
+        See ``flush_submission_queue``
+
+    Returns
+    -------
+    appended: bool
+        Whether the batch was appended
+
+    """
+    idempotency_keys = [queued_row.idempotency_key for queued_row in queued_rows]
+
+    try:
+        submission_id_column_indexes = {
+            list(queued_row.row).index('Submission ID') for queued_row in queued_rows
+        }
+
+        for column_index in submission_id_column_indexes:
+            check_submission_id_column(spread=spread, column_index=column_index)
+
+        record_attempts(idempotency_keys=idempotency_keys)
+
+        if any(queued_row.attempts > 0 for queued_row in queued_rows):
+            appended_submission_ids = _get_appended_submission_ids(spread=spread)
+
+            queued_rows = [
+                queued_row
+                for queued_row in queued_rows
+                if queued_row.idempotency_key not in appended_submission_ids
+            ]
+
+        if len(queued_rows) > 0:
+            start_time = time.perf_counter()
+
+            get_storage().append_rows(
+                spread=spread,
+                rows=[list(queued_row.row.values()) for queued_row in queued_rows],
+            )
+
+            _logger.info(
+                f'Appended {len(queued_rows)} queued row(s) in '
+                f'{time.perf_counter() - start_time:.3f} seconds.'
+            )
+    except MissingSubmissionIDColumnError as e:
+        _logger.error(f'Not appending {len(idempotency_keys)} queued row(s): {e}')
+
+        record_failed_attempts(idempotency_keys=idempotency_keys, error=str(e))
+
+        return False
+    except (
+        GoogleSheetsUnavailableError,
+        gspread.exceptions.APIError,
+        requests.exceptions.RequestException,
+        sqlite3.Error,
+    ) as e:
+        _logger.warning(f'Could not append {len(idempotency_keys)} queued row(s): {e}')
+
+        record_failed_attempts(idempotency_keys=idempotency_keys, error=str(e))
+
+        return False
+
+    # invalidate first so a row is never missing from both the queue and the cached sheet
+    on_rows_appended(spread)
+    mark_rows_appended(idempotency_keys=idempotency_keys)
+
+    return True
+
+
+def flush_submission_queue(on_rows_appended: Callable[[str], None]) -> bool:
+    """
+    Append every pending row in the submission queue to its Google Spreadsheet, oldest first, with
+    one write per ``SUBMISSION_QUEUE_MAX_BATCH_SIZE`` rows of each spreadsheet.
+
+    Parameters
+    ----------
+    on_rows_appended: function
+        Function called with the URL of a Google Spreadsheet after rows are appended to it, but
+        before they are marked as appended, e.g. to invalidate cached copies of the sheet
+
+    Returns
+    -------
+    all_appended: bool
+        Whether every pending row was appended
+
+    Side Effects
+    ------------
+    Appends rows to Google Spreadsheets and records the outcome in the submission queue.
+
+    """
+    pending_rows_by_spread = collections.defaultdict(list)
+
+    for queued_row in get_pending_rows():
+        pending_rows_by_spread[queued_row.spread].append(queued_row)
+
+    all_appended = True
+
+    for spread, queued_rows in pending_rows_by_spread.items():
+        for batch_start_idx in range(0, len(queued_rows), SUBMISSION_QUEUE_MAX_BATCH_SIZE):
+            all_appended &= _flush_submission_queue_batch(
+                spread=spread,
+                queued_rows=queued_rows[
+                    batch_start_idx:batch_start_idx + SUBMISSION_QUEUE_MAX_BATCH_SIZE
+                ],
+                on_rows_appended=on_rows_appended,
+            )
+
+    return all_appended
+
+
+def _run_submission_queue_worker(on_rows_appended: Callable[[str], None]) -> None:
+    """
+    Flush the submission queue whenever a row is queued, retrying failed rows every
+    ``SUBMISSION_QUEUE_RETRY_SECONDS``. Runs forever in a background thread.
+
+    """
+    while True:
+        # cleared before flushing, so a row queued mid-flush triggers another flush right away
+        _submission_queue_wakeup.clear()
+
+        try:
+            all_appended = flush_submission_queue(on_rows_appended=on_rows_appended)
+        except Exception as e:
+            # e.g. an unreadable queue database - keep the worker alive and try again later
+            _logger.warning(f'Could not flush the submission queue: {e}')
+
+            all_appended = False
+
+        _submission_queue_wakeup.wait(
+            timeout=None if all_appended else SUBMISSION_QUEUE_RETRY_SECONDS,
+        )
+
+        # gather any other rows submitted in the meantime, so a burst is written all at once
+        time.sleep(SUBMISSION_QUEUE_COALESCE_SECONDS)
+
+
+def start_submission_queue_worker(
+    on_rows_appended: Callable[[str], None],
+    flush_now: bool = False,
+) -> None:
+    """
+    Start the background submission queue worker, unless it is already running.
+
+    Parameters
+    ----------
+    on_rows_appended: function
+        See ``flush_submission_queue``
+    flush_now: bool
+        If ``True``, wake the worker up to flush the queue right away, e.g. after a row is queued,
+        rather than waiting for its next retry
+
+    """
+    with _submission_queue_worker_lock:
+        if (
+            _submission_queue_worker['thread'] is None
+            or not _submission_queue_worker['thread'].is_alive()
+        ):
+            _submission_queue_worker['thread'] = threading.Thread(
+                target=_run_submission_queue_worker,
+                kwargs={'on_rows_appended': on_rows_appended},
+                name='submission_queue',
+                daemon=True,
+            )
+            _submission_queue_worker['thread'].start()
+
+    if flush_now:
+        _submission_queue_wakeup.set()
+
+
+def get_submission_status(submission_id: str) -> Optional[str]:
+    """
+    Get whether a row queued by ``append_new_row_in_asset_tracker`` has been written to the asset
+    tracker Google Spreadsheet yet.
+
+    Parameters
+    ----------
+    submission_id: str
+        Submission ID returned by ``append_new_row_in_asset_tracker``
+
+    Returns
+    -------
+    status: str
+        Either ``pending`` or ``appended``. If the submission ID is unknown or the submission queue
+        could not be read, ``None`` is returned
+
+    """
+    try:
+        return get_row_status(idempotency_key=submission_id)
+    except sqlite3.Error as e:
+        _logger.warning(f'Could not read the submission queue: {e}')
+
+        return None
@@ -0,0 +1,230 @@
+import contextlib
+import os
+import sqlite3
+import time
+from typing import Iterator, NamedTuple, Optional
+
+import botocore.exceptions
+from streamlit.logger import get_logger
+
+from config import S3_BUCKET, UPLOAD_INDEX_DATABASE
+
+
+_logger = get_logger(__name__)
+
+
+class IndexedUpload(NamedTuple):
+    """
+    A file uploaded to S3, recorded in the local upload index by the SHA-256 of its content and
+    the user who uploaded it.
+
+    """
+
+    sha256: str
+    s3_key: str
+    username: str
+    filename: str
+    size: int
+    uploaded_at: float
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    Open a connection to the upload index, creating it if needed. Use as a context manager - the
+    transaction is committed (or rolled back on error) and the connection closed once the ``with``
+    block exits.
+
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(UPLOAD_INDEX_DATABASE)), exist_ok=True)
+
+    connection = sqlite3.connect(database=UPLOAD_INDEX_DATABASE, timeout=30)
+
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+
+        columns = [record[1] for record in connection.execute('PRAGMA table_info(indexed_uploads)')]
+
+        if columns and 'username' not in columns:
+            # uploads indexed before the index was scoped to each user cannot be attributed to one,
+            # so they are forgotten and simply uploaded again the next time
+            connection.execute('DROP TABLE indexed_uploads')
+
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indexed_uploads (
+                sha256 TEXT NOT NULL,
+                s3_key TEXT NOT NULL,
+                username TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (sha256, s3_key, username)
+            )
+            """
+        )
+
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def get_indexed_upload(sha256: str, s3_key: str, username: str) -> Optional[IndexedUpload]:
+    """
+    Get the file with this content already uploaded under an S3 key by a user, if any.
+
+    Parameters
+    ----------
+    sha256: str
+        Hex SHA-256 digest of the file's content
+    s3_key: str
+    username: str
+        Username of the user who uploaded the file
+
+    Returns
+    -------
+    upload: IndexedUpload
+        If the user has not uploaded a file with this content under ``s3_key``, ``None`` is
+        returned
+
+    """
+    with _connect() as connection:
+        record = connection.execute(
+            'SELECT sha256, s3_key, username, filename, size, uploaded_at FROM indexed_uploads '
+            'WHERE sha256 = ? AND s3_key = ? AND username = ?',
+            (sha256, s3_key, username),
+        ).fetchone()
+
+    return IndexedUpload(*record) if record is not None else None
+
+
+def index_upload(sha256: str, s3_key: str, username: str, filename: str, size: int) -> None:
+    """
+    Record a file uploaded to S3 by the SHA-256 of its content and the user who uploaded it,
+    replacing any file with the same content recorded for that user before.
+
+    Parameters
+    ----------
+    sha256: str
+        Hex SHA-256 digest of the file's content
+    s3_key: str
+    username: str
+        Username of the user who uploaded the file
+    filename: str
+        Name the file was uploaded to S3 with
+    size: int
+        Size of the file, in bytes
+
+    Side Effects
+    ------------
+    Writes to the ``UPLOAD_INDEX_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO indexed_uploads '
+            '(sha256, s3_key, username, filename, size, uploaded_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (sha256, s3_key, username, filename, size, time.time()),
+        )
+
+
+def remove_indexed_upload(sha256: str, s3_key: str, username: str) -> None:
+    """
+    Forget a file recorded in the upload index, once it is no longer in S3.
+
+    Parameters
+    ----------
+    sha256: str
+    s3_key: str
+    username: str
+
+    Side Effects
+    ------------
+    Deletes from the ``UPLOAD_INDEX_DATABASE`` SQLite database.
+
+    """
+    with _connect() as connection:
+        connection.execute(
+            'DELETE FROM indexed_uploads WHERE sha256 = ? AND s3_key = ? AND username = ?',
+            (sha256, s3_key, username),
+        )
+
+
+def find_identical_s3_upload(
+    s3_client: object,
+    sha256: str,
+    size: int,
+    s3_key: str,
+    username: str,
+) -> Optional[str]:
+    """
+    Find a file with the same content already uploaded under an S3 key by the same user in the
+    upload index, checking it is still in S3 before it is linked to.
+
+    Only the user's own uploads are linked to, so a submission never reveals the name of, or shares
+    an S3 object with, a file another user (possibly of another agency) uploaded.
+
+    Parameters
+    ----------
+    s3_client: object
+        S3 client to check the identical file with
+    sha256: str
+        Hex SHA-256 digest of the file's content
+    size: int
+        Size of the file, in bytes
+    s3_key: str
+    username: str
+        Username of the user uploading the file
+
+    Returns
+    -------
+    filename: str
+        Name the identical file was uploaded to S3 with. If there is none, it is no longer in S3
+        (and is removed from the index), or the index cannot be read, ``None`` is returned
+
+    """
+    try:
+        indexed_upload = get_indexed_upload(sha256=sha256, s3_key=s3_key, username=username)
+    except sqlite3.Error as e:
+        # the index only saves uploading a file again, so a broken index never blocks an upload
+        _logger.warning(f'Could not look up identical uploads in the upload index: {e}')
+
+        return None
+
+    if indexed_upload is None or indexed_upload.size != size:
+        return None
+
+    try:
+        response = s3_client.head_object(
+            Bucket=S3_BUCKET,
+            Key=os.path.join(s3_key, indexed_upload.filename),
+        )
+    except botocore.exceptions.ClientError as e:
+        if e.response.get('Error', dict()).get('Code') not in ('404', 'NoSuchKey'):
+            _logger.warning(f'Could not check upload {indexed_upload.filename} still exists: {e}')
+
+            return None
+
+        response = None
+    except botocore.exceptions.BotoCoreError as e:
+        _logger.warning(f'Could not check upload {indexed_upload.filename} still exists: {e}')
+
+        return None
+
+    if (
+        response is None
+        or response['ContentLength'] != size
+        or response.get('Metadata', dict()).get('sha256', sha256) != sha256
+    ):
+        try:
+            remove_indexed_upload(sha256=sha256, s3_key=s3_key, username=username)
+        except sqlite3.Error as e:
+            _logger.warning(
+                f'Could not remove missing upload {indexed_upload.filename} from the upload index: '
+                f'{e}'
+            )
+
+        return None
+
+    return indexed_upload.filename
@@ -1,10 +1,43 @@
-from typing import Iterable, List, Optional, Union
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import uuid
 
 
 import pandas as pd
 import streamlit as st
-
-from input_output import get_assigned_user_assets, read_google_spreadsheet
+import streamlit.components.v1 as components
+from streamlit.delta_generator import DeltaGenerator
+
+from input_output import (
+    fetch_asset_tracker_df,
+    fetch_asset_tracker_notes,
+    get_assigned_user_assets,
+    get_data_version,
+    get_stale_data_age,
+    select_rows_by_column_values,
+    StaleAssetTrackerRowError,
+    start_change_feed_poller,
+)
+from s3_uploads import (
+    create_presigned_s3_upload,
+    S3Upload,
+    S3UploadError,
+    start_s3_upload,
+    verify_s3_upload,
+)
+
+
+# file uploader sending files straight from the browser to S3, see ``direct_s3_uploader``
+_direct_s3_uploader_component = components.declare_component(
+    name='direct_s3_uploader',
+    path=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        'components',
+        'direct_s3_uploader',
+    ),
+)
 
 
 def reset_session_state_progress() -> None:
@@ -13,7 +46,11 @@ def reset_session_state_progress() -> None:
 
 
 def reset_session_state_asset_information() -> None:
-    """Reset the ``st.session_state.asset_information`` dictionary."""
+    """
+    Reset the ``st.session_state.asset_information`` dictionary, starting a new submission with its
+    own ``submission_key`` to resume its uploads to S3 by.
+
+    """
     st.session_state.asset_information = {
         'seen_asset_before': False,
         'name': '',
@@ -38,6 +75,9 @@ def reset_session_state_asset_information() -> None:
         'creative_review_4': '',
         'creative_review_5': '',
         'notes': '',
+        # fixed for the whole submission, unlike the asset name, which can be edited at any time
+        'submission_key': uuid.uuid4().hex,
+        's3_uploads': dict(),
     }
 
 
@@ -148,6 +188,66 @@ def display_progress_bar_asset_tracker(
         st.progress(progress_value)
 
 
+def drop_session_data() -> None:
+    """
+    Drop this session's DataFrames derived from the shared spreadsheet cache, so they are rebuilt
+    from the latest data the next time they are needed.
+
+    """
+    if isinstance(st.session_state.get('asset_tracker_df'), pd.DataFrame):
+        del st.session_state.asset_tracker_df
+    if isinstance(st.session_state.get('data_explorer_df'), pd.DataFrame):
+        del st.session_state.data_explorer_df
+    if isinstance(st.session_state.get('assigned_user_assets'), list):
+        del st.session_state.assigned_user_assets
+
+
+def check_for_data_updates() -> None:
+    """
+    Make sure the background change feed poller is running and, if it refreshed the shared data
+    since this session last checked, drop this session's data so it is rebuilt from the new data.
+
+    Sessions in the middle of submitting an asset keep their data until they are done, so the page
+    they are on does not change underneath them.
+
+    """
+    start_change_feed_poller()
+
+    data_version = get_data_version()
+
+    if 'data_version' not in st.session_state:
+        st.session_state.data_version = data_version
+    elif (
+        st.session_state.data_version != data_version
+        and st.session_state.get('sidebar_radio') != 'Submit an Asset'
+    ):
+        drop_session_data()
+
+        st.session_state.data_version = data_version
+
+
+def display_stale_data_message(message_placeholder: DeltaGenerator) -> None:
+    """
+    If any data shared by every session is being served past its time-to-live while the latest data
+    is fetched in the background, say how old it is.
+
+    Parameters
+    ----------
+    message_placeholder: DeltaGenerator
+        Placeholder to display the message in, such as a ``st.empty`` created before the page was
+        displayed, so the message covers every sheet the page read
+
+    """
+    stale_data_age = get_stale_data_age()
+
+    if stale_data_age is not None:
+        message_placeholder.info(
+            f'You are viewing data from {math.ceil(stale_data_age / 60)} minutes ago while the '
+            'latest data is fetched - it will show up the next time the page updates.',
+            icon='⏳',
+        )
+
+
 def check_for_assigned_assets() -> None:
     """Check for this user's assigned assets while displaying a ``st.spinner``."""
     with st.spinner(text='Checking for assigned assets...'):
@@ -167,6 +267,9 @@ def fetch_asset_data() -> None:
     Fetch the latest _assigned_ asset data and assign the resulting Pandas DataFrame to the
     ``st.session_state.asset_tracker_df`` variable.
 
+    The asset tracker itself is read through a process-wide cache shared by every session, so this
+    only filters that shared DataFrame down to the assets this user is allowed to see.
+
     """
     check_for_assigned_assets()
 
@@ -176,31 +279,59 @@ def fetch_asset_data() -> None:
     ):
         with st.spinner(text='Fetching the latest asset data...'):
             if not isinstance(st.session_state.get('asset_tracker_df'), pd.DataFrame):
-                asset_tracker_df = (
-                    read_google_spreadsheet(
-                        spread=st.secrets['spreadsheets']['portal_backend_url'],
-                        sheet=0,
-                    )
-                    .sheet_to_df(index=None)
-                )
-
-                asset_tracker_df['Date Submitted'] = (
-                    pd
-                    .to_datetime(arg=asset_tracker_df['Date Submitted'], format='mixed')
-                    .dt
-                    .date
-                )
+                asset_tracker_df = fetch_asset_tracker_df()
 
                 if st.session_state['username'] not in st.secrets['login_groups']['admins']:
-                    st.session_state.asset_tracker_df = asset_tracker_df[
-                        asset_tracker_df['Asset Name'].isin(st.session_state.assigned_user_assets)
-                    ]
+                    st.session_state.asset_tracker_df = select_rows_by_column_values(
+                        df=asset_tracker_df,
+                        column='Asset Name',
+                        values=st.session_state.assigned_user_assets,
+                    )
                 else:
                     st.session_state.asset_tracker_df = asset_tracker_df
     else:
         st.session_state.asset_tracker_df = None
 
 
+def fetch_selected_asset_notes(row_number: int, asset_name: str, username: str) -> Dict[str, str]:
+    """
+    Fetch the note columns of an asset selected from ``st.session_state.asset_tracker_df`` with
+    ``fetch_asset_tracker_notes``.
+
+    If the asset's row in the sheet has since become a different asset, this session's data is
+    dropped so it is rebuilt from the resynced asset tracker, a Streamlit warning is displayed, and
+    the script is stopped, rather than displaying another asset's notes.
+
+    Parameters
+    ----------
+    row_number: int
+        Index of the asset in ``st.session_state.asset_tracker_df``
+    asset_name: str
+    username: str
+        User who submitted the asset
+
+    Returns
+    -------
+    notes: dict
+        Dictionary mapping each note column name to its value in the row
+
+    """
+    try:
+        return fetch_asset_tracker_notes(
+            row_number=row_number,
+            asset_name=asset_name,
+            username=username,
+        )
+    except StaleAssetTrackerRowError:
+        drop_session_data()
+
+        st.warning(
+            'The asset tracker has changed since it was loaded, so the latest version of it has '
+            'been fetched. Please select the asset again.'
+        )
+        st.stop()
+
+
 def create_filters_selectboxes(
     df: pd.DataFrame,
     key_prefix: str,
@@ -320,6 +451,280 @@ def change_upload_fields_colors(css_color: str, filename_label: str) -> None:
     st.markdown(upload_inputs_css, unsafe_allow_html=True)
 
 
+def start_s3_uploads_in_background(
+    uploaded_files: List[st.runtime.uploaded_file_manager.UploadedFile],
+    s3_key: str,
+    submission_key: str,
+    retry_failed: bool = False,
+) -> List[S3Upload]:
+    """
+    Start uploading files to S3 in the background as soon as they are selected, so the rest of the
+    form can be filled in while they upload.
+
+    A handle on every upload is kept in ``st.session_state.asset_information['s3_uploads']``, so
+    later reruns pick up the same uploads rather than starting new ones. Uploads of files that are
+    no longer selected are cancelled, unless they have already started.
+
+    Parameters
+    ----------
+    uploaded_files: list
+        Every file currently selected to upload to ``s3_key``
+    s3_key: str
+    submission_key: str
+        See ``upload_file_to_s3``
+    retry_failed: bool
+        Whether to start uploads that failed over again
+
+    Returns
+    -------
+    uploads: list
+        List of ``S3Upload``s, in the same order as ``uploaded_files``
+
+    """
+    s3_uploads = st.session_state.asset_information.setdefault('s3_uploads', dict())
+
+    upload_keys = [f'{s3_key}/{uploaded_file.file_id}' for uploaded_file in uploaded_files]
+
+    for upload_key in list(s3_uploads):
+        if upload_key.startswith(f'{s3_key}/') and upload_key not in upload_keys:
+            s3_uploads.pop(upload_key).future.cancel()
+
+    for upload_key, uploaded_file in zip(upload_keys, uploaded_files):
+        upload = s3_uploads.get(upload_key)
+
+        if upload is None or (retry_failed and upload.failed()):
+            s3_uploads[upload_key] = start_s3_upload(
+                uploaded_file=uploaded_file,
+                s3_key=s3_key,
+                username=st.session_state['username'],
+                submission_key=submission_key,
+            )
+
+    return [s3_uploads[upload_key] for upload_key in upload_keys]
+
+
+def _describe_s3_upload(upload: S3Upload) -> str:
+    """Describe the progress of an upload, for the text of its progress bar."""
+    if upload.failed():
+        return f'{upload.filename} (failed)'
+    elif upload.done():
+        return f'{upload.filename} (done)'
+    else:
+        return f'{upload.filename} ({upload.progress:.0%})'
+
+
+def display_s3_upload_progress(uploads: List[S3Upload]) -> List[DeltaGenerator]:
+    """
+    Display a progress bar for every upload, without waiting for them to finish.
+
+    The page is not rerun just to refresh them, so it never stops responding while files upload -
+    the progress bars are brought up to date whenever the page reruns as the rest of the form is
+    filled in, and ``wait_for_s3_uploads`` keeps them moving once the form is submitted.
+
+    Parameters
+    ----------
+    uploads: list
+        List of ``S3Upload``s started with ``start_s3_upload``
+
+    Returns
+    -------
+    progress_bars: list
+        List of the progress bars displayed, in the same order as ``uploads``, which can be passed
+        on to ``wait_for_s3_uploads``
+
+    """
+    progress_bars = [
+        st.progress(
+            value=1.0 if upload.done() and not upload.failed() else upload.progress,
+            text=_describe_s3_upload(upload=upload),
+        )
+        for upload in uploads
+    ]
+
+    if any(not upload.done() for upload in uploads):
+        st.caption(
+            'Uploading in the background - keep filling in the form in the meantime, and the '
+            'progress above will update as you go.'
+        )
+
+    return progress_bars
+
+
+def wait_for_s3_uploads(
+    uploads: List[S3Upload],
+    progress_bars: Optional[List[DeltaGenerator]] = None,
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Display a progress bar for every upload until they have all finished, with a toast as each one
+    still running finishes uploading.
+
+    Parameters
+    ----------
+    uploads: list
+        List of ``S3Upload``s started with ``start_s3_upload``
+    progress_bars: list
+        Progress bars already displayed for ``uploads`` by ``display_s3_upload_progress`` to update,
+        rather than displaying new ones
+
+    Returns
+    -------
+    results: list
+        List of ``(modified_filename, error)`` tuples, in the same order as ``uploads``. For uploads
+        that succeeded, ``error`` is ``None``, and for uploads that failed, ``modified_filename`` is
+        ``None`` and ``error`` describes why
+
+    """
+    if progress_bars is None:
+        progress_bars = [st.progress(value=0.0, text=upload.filename) for upload in uploads]
+
+    already_done = [upload.done() for upload in uploads]
+    results = [None] * len(uploads)
+
+    while any(result is None for result in results):
+        for upload_idx, (upload, progress_bar) in enumerate(zip(uploads, progress_bars)):
+            if results[upload_idx] is not None:
+                continue
+
+            text = _describe_s3_upload(upload=upload)
+
+            if not upload.done():
+                progress_bar.progress(value=upload.progress, text=text)
+
+                continue
+
+            try:
+                results[upload_idx] = (upload.result(), None)
+            except S3UploadError as e:
+                progress_bar.progress(value=upload.progress, text=text)
+
+                results[upload_idx] = (None, str(e))
+            else:
+                progress_bar.progress(value=1.0, text=text)
+
+                if not already_done[upload_idx]:
+                    st.toast(body=f'Uploaded {upload.filename}!')
+
+        if any(result is None for result in results):
+            time.sleep(0.25)
+
+    return results
+
+
+def direct_s3_uploader(
+    label: str,
+    s3_key: str,
+    accept_multiple_files: bool,
+    css_color: str,
+    key: str,
+) -> Optional[List[str]]:
+    """
+    Display a file uploader that uploads files straight from the browser to S3 with presigned POSTs
+    (see ``create_presigned_s3_upload``), so they never pass through the Streamlit server.
+
+    Once files are selected, a presigned POST is created for each of them and the script is rerun
+    so the browser can start uploading. Once the browser is done, every upload is checked with
+    ``verify_s3_upload``, and the check is only done once per selection of files.
+
+    Parameters
+    ----------
+    label: str
+    s3_key: str
+        One of ``S3_DIRECT_UPLOAD_PREFIXES``
+    accept_multiple_files: bool
+    css_color: str
+        Background color of the upload box
+    key: str
+        Unique key of the uploader
+
+    Returns
+    -------
+    filenames: list
+        List of the names every selected file was uploaded to S3 with, in order. If no files have
+        been uploaded yet, or any of them could not be uploaded (an error is displayed), ``None`` is
+        returned
+
+    """
+    state_key = f'{key}_direct_s3_upload'
+
+    if state_key not in st.session_state:
+        st.session_state[state_key] = {
+            'request_id': None,
+            'presigned_uploads': None,
+            'filenames': None,
+            'upload_errors': list(),
+        }
+
+    state = st.session_state[state_key]
+
+    value = _direct_s3_uploader_component(
+        label=label,
+        accept_multiple_files=accept_multiple_files,
+        css_color=css_color,
+        request_id=state['request_id'],
+        presigned_uploads=state['presigned_uploads'],
+        key=key,
+        default=None,
+    )
+
+    if not value:
+        return None
+
+    if value['state'] == 'requested' and value['request_id'] != state['request_id']:
+        try:
+            presigned_uploads = [
+                create_presigned_s3_upload(filename=file['name'], size=file['size'], s3_key=s3_key)
+                for file in value['files']
+            ]
+        except ValueError as e:
+            st.error(str(e))
+
+            return None
+
+        state.update({
+            'request_id': value['request_id'],
+            'presigned_uploads': presigned_uploads,
+            'filenames': None,
+        })
+
+        # rerun so the component receives the presigned POSTs and starts uploading
+        st.rerun()
+
+    if value['state'] != 'uploaded' or value['request_id'] != state['request_id']:
+        return None
+
+    if state['filenames'] is None:
+        upload_errors = [result['error'] for result in value['results'] if result['error']]
+
+        if not upload_errors:
+            upload_errors = [
+                f'{presigned_upload["filename"]} did not finish uploading'
+                for presigned_upload in state['presigned_uploads']
+                if not verify_s3_upload(
+                    filename=presigned_upload['filename'],
+                    size=presigned_upload['size'],
+                    s3_key=s3_key,
+                )
+            ]
+
+        # a failed selection is remembered as an empty list, so it is not verified again
+        state['filenames'] = (
+            [presigned_upload['filename'] for presigned_upload in state['presigned_uploads']]
+            if not upload_errors
+            else list()
+        )
+        state['upload_errors'] = upload_errors
+
+    if state['upload_errors']:
+        st.error(
+            "Some files couldn't be uploaded - please select them again to retry.\n\n"
+            + '\n'.join(f'* {error}' for error in state['upload_errors'])
+        )
+
+        return None
+
+    return state['filenames']
+
+
 def get_countries_list() -> List[str]:
     """Return a list of all countries."""
     return [
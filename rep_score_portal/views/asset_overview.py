@@ -4,28 +4,13 @@ import pandas as pd
 import st_aggrid
 import streamlit as st
 
-from config import (
-    AGENCY_CREATIVE_LABEL_1,
-    AGENCY_CREATIVE_LABEL_2,
-    AGENCY_CREATIVE_LABEL_3,
-    AGENCY_CREATIVE_LABEL_4,
-    AGENCY_CREATIVE_LABEL_5,
-    DEI_CREATIVE_REVIEWS_LABEL_1,
-    DEI_CREATIVE_REVIEWS_LABEL_2,
-    DEI_CREATIVE_REVIEWS_LABEL_3,
-    DEI_CREATIVE_REVIEWS_LABEL_4,
-    DEI_CREATIVE_REVIEWS_LABEL_5,
-    MARKETING_LABEL_1,
-    MARKETING_LABEL_2,
-    MARKETING_LABEL_3,
-    MARKETING_LABEL_4,
-    TOO_FILTERED_DOWN_ERROR_MESSAGE,
-)
+from config import ASSET_TRACKER_NOTE_COLUMNS, TOO_FILTERED_DOWN_ERROR_MESSAGE
 from utils import (
     create_filters_selectboxes,
     display_progress_bar_asset_tracker,
     edit_colors_of_selectbox,
     fetch_asset_data,
+    fetch_selected_asset_notes,
     insert_line_break,
 )
 
@@ -72,6 +57,8 @@ def view_asset_information() -> None:
                 st.session_state.asset_tracker_df['Asset Name'] == asset_selected
             ]
             .rename(columns={'Username': 'Submitted By'})
+            # keep track of each row's row number in the sheet to later fetch its notes
+            .assign(**{'Row Number': lambda df: df.index})
         )
 
         if len(df_to_display) == 0:
@@ -132,23 +119,12 @@ def view_asset_information() -> None:
                 'Date Submitted',
             ]
 
-            note_cols_to_display = [
-                MARKETING_LABEL_1,
-                MARKETING_LABEL_2,
-                MARKETING_LABEL_3,
-                MARKETING_LABEL_4,
-                AGENCY_CREATIVE_LABEL_1,
-                AGENCY_CREATIVE_LABEL_2,
-                AGENCY_CREATIVE_LABEL_3,
-                AGENCY_CREATIVE_LABEL_4,
-                AGENCY_CREATIVE_LABEL_5,
-                DEI_CREATIVE_REVIEWS_LABEL_1,
-                DEI_CREATIVE_REVIEWS_LABEL_2,
-                DEI_CREATIVE_REVIEWS_LABEL_3,
-                DEI_CREATIVE_REVIEWS_LABEL_4,
-                DEI_CREATIVE_REVIEWS_LABEL_5,
-                'Notes',
-            ]
+            # the long note columns are not part of the tracker - fetch them for this row only
+            notes = fetch_selected_asset_notes(
+                row_number=row_selected['Row Number'],
+                asset_name=row_selected['Asset Name'],
+                username=row_selected['Submitted By'],
+            )
 
             st.markdown(body=f'### {row_selected["Asset Name"]}')
 
@@ -157,11 +133,11 @@ def view_asset_information() -> None:
 
             insert_line_break()
 
-            for col in note_cols_to_display:
+            for col in ASSET_TRACKER_NOTE_COLUMNS:
                 st.markdown(body=f'**{col if col != "Notes" else "Notes:"}**')
 
-                if row_selected[col] and row_selected[col] != 'N/A':
-                    st.text(body=f'{row_selected[col]}')
+                if notes[col] and notes[col] != 'N/A':
+                    st.text(body=f'{notes[col]}')
                 else:
                     st.text(body='N/A')
 
@@ -1,11 +1,16 @@
-from typing import Iterable, Optional, Union
+import threading
+from typing import Iterable, Optional, Tuple, Union
 
 import altair as alt
 import pandas as pd
 import streamlit as st
 
 from config import TOO_FILTERED_DOWN_ERROR_MESSAGE
-from input_output import read_google_spreadsheet
+from input_output import (
+    read_google_spreadsheets_concurrently,
+    select_rows_by_column_values,
+    wait_for_google_spreadsheet_df,
+)
 from utils import (
     check_for_assigned_assets,
     create_filters_selectboxes,
@@ -19,6 +24,11 @@ HIGH_COLOR = '#A478B8'
 MEDIUM_COLOR = '#E0C2F2'
 LOW_COLOR = '#F7E7FB'
 
+# the "Explore Your Data" DataFrames built from every completed asset, alongside the raw cached
+# primary dataset DataFrame they were built from
+_explore_your_data_frames_cache = {'source': None, 'frames': None}
+_explore_your_data_frames_cache_lock = threading.Lock()
+
 
 def explore_your_data_landing_page() -> None:
     """Display the "Explore Your Data" page."""
@@ -29,6 +39,13 @@ def explore_your_data_landing_page() -> None:
         or not isinstance(st.session_state.get('data_explorer_df_no_duplicates'), pd.DataFrame)
         or not isinstance(st.session_state.get('color_map_df'), pd.DataFrame)
     ):
+        primary_dataset_sheet = (st.secrets['spreadsheets']['primary_dataset_url'], 0)
+
+        # start fetching the primary dataset while we check for assigned assets, rather than after
+        data_explorer_df_future = read_google_spreadsheets_concurrently(
+            sheets=[primary_dataset_sheet],
+        )[primary_dataset_sheet]
+
         check_for_assigned_assets()
 
         if (
@@ -36,20 +53,27 @@ def explore_your_data_landing_page() -> None:
             and len(st.session_state.assigned_user_assets) > 0
         ):
             with st.spinner(text='Fetching the latest rep score data...'):
-                data_explorer_df = (
-                    read_google_spreadsheet(
-                        spread=st.secrets['spreadsheets']['primary_dataset_url'],
-                        sheet=0,
-                    )
-                    .sheet_to_df(index=None)
+                (
+                    data_explorer_df,
+                    data_explorer_df_no_duplicates,
+                    color_map_df,
+                ) = get_explore_your_data_frames(
+                    primary_dataset_df=wait_for_google_spreadsheet_df(
+                        future=data_explorer_df_future,
+                    ),
                 )
 
                 if st.session_state['username'] not in st.secrets['login_groups']['admins']:
-                    data_explorer_df = data_explorer_df[
-                        data_explorer_df['Ad Name'].isin(st.session_state.assigned_user_assets)
-                    ]
+                    # only materialize this user's rows of the shared primary dataset
+                    data_explorer_df = select_rows_by_column_values(
+                        df=data_explorer_df,
+                        column='Ad Name',
+                        values=st.session_state.assigned_user_assets,
+                    )
 
-            data_explorer_df = data_explorer_df[data_explorer_df['Cat No. '].str.len() > 0]
+                    data_explorer_df_no_duplicates, color_map_df = _build_summary_frames(
+                        data_explorer_df=data_explorer_df,
+                    )
         else:
             data_explorer_df = None
 
@@ -60,83 +84,6 @@ def explore_your_data_landing_page() -> None:
             st.error("We couldn't find any assigned and completed assets you can view yet - sorry!")
             st.stop()
 
-        data_explorer_df = data_explorer_df.rename(columns={
-            'Product ': 'Product',
-            'TOTAL (GENDER)': 'GENDER',
-            'TOTAL (RACE)': 'RACE',
-            'TOTAL (LGBTQ)': 'LGBTQ+ ',  # the space is intentional, sadly
-            'TOTAL (Disability)': 'DISABILITY',
-            'TOTAL (50+)': 'AGE',
-            'TOTAL (Fat)': 'BODY SIZE',
-            'Presence Average (50)': 'Presence Avg (50pts)',
-            'Prominence Average (10)': 'Prominence Avg (10pts)',
-            'Stereotypes Average (40)': 'Stereotypes Avg (40pts)',
-        })
-
-        data_explorer_df = data_explorer_df.replace('#N/A', '').replace('N/A', '')
-
-        # hacky, I know, but easier to work with down the line when it comes to filtering input
-        data_explorer_df['BASELINE'] = data_explorer_df['Baseline'].copy()
-
-        data_explorer_df['Date Submitted'] = (
-            pd
-            .to_datetime(arg=data_explorer_df['Date Submitted'], format='mixed')
-            .dt
-            .date
-        )
-
-        for col in ['Presence Avg (50pts)', 'Prominence Avg (10pts)', 'Stereotypes Avg (40pts)']:
-            data_explorer_df[col] = pd.to_numeric(arg=data_explorer_df[col], errors='coerce')
-
-        data_explorer_df_no_duplicates = (
-            data_explorer_df
-            .sort_values(by=['Date Submitted'])
-            .drop_duplicates(subset=['Ad Name', 'Brand', 'Product'], keep='last')
-        )
-
-        color_map_df_index = [
-            'Ad Name',
-            'Brand',
-            'Product',
-            'Content Type',
-            'Baseline',
-            'Date Submitted',
-            'Qual Notes',
-            'Presence Avg (50pts)',
-            'Prominence Avg (10pts)',
-            'Stereotypes Avg (40pts)',
-        ]
-
-        color_map_df = (
-            data_explorer_df_no_duplicates[[
-                'Ad Name',
-                'Brand',
-                'Product',
-                'Content Type',
-                'Baseline',
-                'BASELINE',
-                'Date Submitted',
-                'Qual Notes',
-                'Presence Avg (50pts)',
-                'Prominence Avg (10pts)',
-                'Stereotypes Avg (40pts)',
-                'GENDER',
-                'RACE',
-                'LGBTQ+ ',
-                'DISABILITY',
-                'AGE',
-                'BODY SIZE',
-                'Ad Total Score',
-            ]]
-            .drop_duplicates(subset=['Ad Name'], keep='last')  # Altair limitation, oof :(
-            .set_index(color_map_df_index)
-            .stack()
-            .reset_index()
-            .rename(columns={0: 'Score', f'level_{len(color_map_df_index)}': 'Variable'})
-        )
-
-        color_map_df['color'] = _create_color_column(scores=color_map_df['Score'])
-
         st.session_state.data_explorer_df = data_explorer_df
         st.session_state.data_explorer_df_no_duplicates = data_explorer_df_no_duplicates
         st.session_state.color_map_df = color_map_df
@@ -157,6 +104,138 @@ def explore_your_data_landing_page() -> None:
         st.rerun()
 
 
+def get_explore_your_data_frames(
+    primary_dataset_df: pd.DataFrame,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Get the "Explore Your Data" DataFrames built from every completed asset in the primary dataset.
+
+    These are shared by every session and only rebuilt when the cached primary dataset has been
+    refreshed. Sessions that can only view some assets should select their rows of the first
+    DataFrame and build their own summary frames from those with ``_build_summary_frames``.
+
+    Parameters
+    ----------
+    primary_dataset_df: pd.DataFrame
+        Primary dataset, as read from the shared spreadsheet cache
+
+    Returns
+    -------
+    data_explorer_df: pd.DataFrame
+        Cleaned rows of every completed asset
+    data_explorer_df_no_duplicates: pd.DataFrame
+        Latest row of every asset
+    color_map_df: pd.DataFrame
+        Long-format scores of every asset used in the score heatmap
+
+    """
+    with _explore_your_data_frames_cache_lock:
+        if _explore_your_data_frames_cache['source'] is primary_dataset_df:
+            return _explore_your_data_frames_cache['frames']
+
+    data_explorer_df = _clean_primary_dataset(primary_dataset_df=primary_dataset_df)
+    data_explorer_df_no_duplicates, color_map_df = _build_summary_frames(
+        data_explorer_df=data_explorer_df,
+    )
+
+    frames = (data_explorer_df, data_explorer_df_no_duplicates, color_map_df)
+
+    with _explore_your_data_frames_cache_lock:
+        _explore_your_data_frames_cache['source'] = primary_dataset_df
+        _explore_your_data_frames_cache['frames'] = frames
+
+    return frames
+
+
+def _clean_primary_dataset(primary_dataset_df: pd.DataFrame) -> pd.DataFrame:
+    """Keep completed assets of the primary dataset, with friendlier column names and types."""
+    data_explorer_df = primary_dataset_df[primary_dataset_df['Cat No. '].str.len() > 0]
+
+    data_explorer_df = data_explorer_df.rename(columns={
+        'Product ': 'Product',
+        'TOTAL (GENDER)': 'GENDER',
+        'TOTAL (RACE)': 'RACE',
+        'TOTAL (LGBTQ)': 'LGBTQ+ ',  # the space is intentional, sadly
+        'TOTAL (Disability)': 'DISABILITY',
+        'TOTAL (50+)': 'AGE',
+        'TOTAL (Fat)': 'BODY SIZE',
+        'Presence Average (50)': 'Presence Avg (50pts)',
+        'Prominence Average (10)': 'Prominence Avg (10pts)',
+        'Stereotypes Average (40)': 'Stereotypes Avg (40pts)',
+    })
+
+    data_explorer_df = data_explorer_df.replace('#N/A', '').replace('N/A', '')
+
+    # hacky, I know, but easier to work with down the line when it comes to filtering input
+    data_explorer_df['BASELINE'] = data_explorer_df['Baseline'].copy()
+
+    data_explorer_df['Date Submitted'] = (
+        pd
+        .to_datetime(arg=data_explorer_df['Date Submitted'], format='mixed')
+        .dt
+        .date
+    )
+
+    for col in ['Presence Avg (50pts)', 'Prominence Avg (10pts)', 'Stereotypes Avg (40pts)']:
+        data_explorer_df[col] = pd.to_numeric(arg=data_explorer_df[col], errors='coerce')
+
+    return data_explorer_df
+
+
+def _build_summary_frames(data_explorer_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Build the de-duplicated and score heatmap DataFrames from the cleaned primary dataset."""
+    data_explorer_df_no_duplicates = (
+        data_explorer_df
+        .sort_values(by=['Date Submitted'])
+        .drop_duplicates(subset=['Ad Name', 'Brand', 'Product'], keep='last')
+    )
+
+    color_map_df_index = [
+        'Ad Name',
+        'Brand',
+        'Product',
+        'Content Type',
+        'Baseline',
+        'Date Submitted',
+        'Qual Notes',
+        'Presence Avg (50pts)',
+        'Prominence Avg (10pts)',
+        'Stereotypes Avg (40pts)',
+    ]
+
+    color_map_df = (
+        data_explorer_df_no_duplicates[[
+            'Ad Name',
+            'Brand',
+            'Product',
+            'Content Type',
+            'Baseline',
+            'BASELINE',
+            'Date Submitted',
+            'Qual Notes',
+            'Presence Avg (50pts)',
+            'Prominence Avg (10pts)',
+            'Stereotypes Avg (40pts)',
+            'GENDER',
+            'RACE',
+            'LGBTQ+ ',
+            'DISABILITY',
+            'AGE',
+            'BODY SIZE',
+            'Ad Total Score',
+        ]]
+        .drop_duplicates(subset=['Ad Name'], keep='last')  # Altair limitation, oof :(
+        .set_index(color_map_df_index)
+        .stack()
+        .reset_index()
+        .rename(columns={0: 'Score', f'level_{len(color_map_df_index)}': 'Variable'})
+    )
+
+    color_map_df['color'] = _create_color_column(scores=color_map_df['Score'])
+
+    return data_explorer_df_no_duplicates, color_map_df
+
+
 def _create_color_column(scores: Iterable[Union[str, float]]) -> Iterable[str]:
     """Assign cell color values to scores."""
     return [
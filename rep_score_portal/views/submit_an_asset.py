@@ -16,20 +16,27 @@ from config import (
     MARKETING_LABEL_2,
     MARKETING_LABEL_3,
     MARKETING_LABEL_4,
+    S3_DIRECT_UPLOADS,
 )
-from input_output import append_new_row_in_asset_tracker, upload_file_to_s3
+from input_output import append_new_row_in_asset_tracker
+from submission_queue import get_submission_status
 from utils import (
     change_upload_fields_colors,
+    direct_s3_uploader,
     display_progress_bar_asset_tracker,
+    display_s3_upload_progress,
     edit_colors_of_selectbox,
     edit_colors_of_text_area,
     fetch_asset_data,
+    fetch_selected_asset_notes,
     get_content_types,
     get_countries_list,
     insert_line_break,
     remove_elements_from_progress_list,
     reset_session_state_asset_information,
     reset_session_state_progress,
+    start_s3_uploads_in_background,
+    wait_for_s3_uploads,
 )
 
 
@@ -82,6 +89,12 @@ def page_zero() -> None:
                 ]
                 .iloc[-1]
             )
+            # the long note columns are not part of the tracker - fetch them for this row only
+            selected_asset_notes = fetch_selected_asset_notes(
+                row_number=selected_asset_df.name,
+                asset_name=selected_asset_df['Asset Name'],
+                username=selected_asset_df['Username'],
+            )
 
             st.session_state.asset_information['seen_asset_before'] = True
             st.session_state.asset_information['name'] = selected_asset_df['Asset Name']
@@ -101,49 +114,49 @@ def page_zero() -> None:
             st.session_state.asset_information['version'] = int(selected_asset_df['Version']) + 1
 
             st.session_state.asset_information['marketing_1'] = (
-                selected_asset_df[MARKETING_LABEL_1]
+                selected_asset_notes[MARKETING_LABEL_1]
             )
             st.session_state.asset_information['marketing_2'] = (
-                selected_asset_df[MARKETING_LABEL_2]
+                selected_asset_notes[MARKETING_LABEL_2]
             )
             st.session_state.asset_information['marketing_3'] = (
-                selected_asset_df[MARKETING_LABEL_3]
+                selected_asset_notes[MARKETING_LABEL_3]
             )
             st.session_state.asset_information['marketing_4'] = (
-                selected_asset_df[MARKETING_LABEL_4]
+                selected_asset_notes[MARKETING_LABEL_4]
             )
             st.session_state.asset_information['agency_creative_1'] = (
-                selected_asset_df[AGENCY_CREATIVE_LABEL_1]
+                selected_asset_notes[AGENCY_CREATIVE_LABEL_1]
             )
             st.session_state.asset_information['agency_creative_2'] = (
-                selected_asset_df[AGENCY_CREATIVE_LABEL_2]
+                selected_asset_notes[AGENCY_CREATIVE_LABEL_2]
             )
             st.session_state.asset_information['agency_creative_3'] = (
-                selected_asset_df[AGENCY_CREATIVE_LABEL_3]
+                selected_asset_notes[AGENCY_CREATIVE_LABEL_3]
             )
             st.session_state.asset_information['agency_creative_4'] = (
-                selected_asset_df[AGENCY_CREATIVE_LABEL_4]
+                selected_asset_notes[AGENCY_CREATIVE_LABEL_4]
             )
             st.session_state.asset_information['agency_creative_5'] = (
-                selected_asset_df[AGENCY_CREATIVE_LABEL_5]
+                selected_asset_notes[AGENCY_CREATIVE_LABEL_5]
             )
             st.session_state.asset_information['creative_review_1'] = (
-                selected_asset_df[DEI_CREATIVE_REVIEWS_LABEL_1]
+                selected_asset_notes[DEI_CREATIVE_REVIEWS_LABEL_1]
             )
             st.session_state.asset_information['creative_review_2'] = (
-                selected_asset_df[DEI_CREATIVE_REVIEWS_LABEL_2]
+                selected_asset_notes[DEI_CREATIVE_REVIEWS_LABEL_2]
             )
             st.session_state.asset_information['creative_review_3'] = (
-                selected_asset_df[DEI_CREATIVE_REVIEWS_LABEL_3]
+                selected_asset_notes[DEI_CREATIVE_REVIEWS_LABEL_3]
             )
             st.session_state.asset_information['creative_review_4'] = (
-                selected_asset_df[DEI_CREATIVE_REVIEWS_LABEL_4]
+                selected_asset_notes[DEI_CREATIVE_REVIEWS_LABEL_4]
             )
             st.session_state.asset_information['creative_review_5'] = (
-                selected_asset_df[DEI_CREATIVE_REVIEWS_LABEL_5]
+                selected_asset_notes[DEI_CREATIVE_REVIEWS_LABEL_5]
             )
             st.session_state.asset_information['notes'] = (
-                selected_asset_df['Notes']
+                selected_asset_notes['Notes']
             )
 
             # post-processing - ensure every country entered is actually a country in the list
@@ -229,11 +242,32 @@ def page_one() -> None:
 
     insert_line_break()
 
-    creative_brief = st.file_uploader(
-        label='Select the :blue[CREATIVE BRIEF] to upload...',
-        type=None,
-        accept_multiple_files=False,
-    )
+    if S3_DIRECT_UPLOADS:
+        creative_brief = direct_s3_uploader(
+            label='Select the :blue[CREATIVE BRIEF] to upload...',
+            s3_key='creative_briefs',
+            accept_multiple_files=False,
+            css_color='#0096DC',
+            key='creative_brief_direct_s3_uploader',
+        )
+    else:
+        creative_brief = st.file_uploader(
+            label='Select the :blue[CREATIVE BRIEF] to upload...',
+            type=None,
+            accept_multiple_files=False,
+        )
+
+    creative_brief_uploads = list()
+
+    if not S3_DIRECT_UPLOADS:
+        # start uploading as soon as the file is selected, while the rest of the page is filled in
+        creative_brief_uploads = start_s3_uploads_in_background(
+            uploaded_files=[creative_brief] if creative_brief else list(),
+            s3_key='creative_briefs',
+            submission_key=st.session_state.asset_information['submission_key'],
+        )
+
+    creative_brief_progress_bars = display_s3_upload_progress(uploads=creative_brief_uploads)
 
     creative_brief_url = st.text_input(
         label=creative_brief_filename_label,
@@ -264,14 +298,26 @@ def page_one() -> None:
             st.error('Please either upload a :blue[CREATIVE BRIEF] _or_ provide a URL - not both.')
             st.stop()
 
-        if creative_brief:
-            with st.spinner(text='Uploading :blue[CREATIVE BRIEF]...'):
-                creative_brief_filename = upload_file_to_s3(
-                    uploaded_file=creative_brief,
+        if creative_brief and S3_DIRECT_UPLOADS:
+            # already uploaded straight from the browser
+            creative_brief_filename = creative_brief[0]
+        elif creative_brief:
+            [(creative_brief_filename, error)] = wait_for_s3_uploads(
+                uploads=start_s3_uploads_in_background(
+                    uploaded_files=[creative_brief],
                     s3_key='creative_briefs',
-                )
+                    submission_key=st.session_state.asset_information['submission_key'],
+                    retry_failed=True,
+                ),
+                progress_bars=creative_brief_progress_bars,
+            )
 
-                st.toast(body=f'Uploaded {creative_brief.name}!')
+            if error is not None:
+                st.error(
+                    f"{error}\n\nPlease click \"{button_label}\" to try again - the upload will "
+                    'pick up where it left off.'
+                )
+                st.stop()
         else:
             creative_brief_filename = creative_brief_url
 
@@ -322,11 +368,33 @@ def page_two() -> None:
 
     insert_line_break()
 
-    uploaded_files = st.file_uploader(
-        label='Select :orange[ASSET] file(s) to upload...',
-        type=None,
-        accept_multiple_files=True,
-    )
+    if S3_DIRECT_UPLOADS:
+        uploaded_files = direct_s3_uploader(
+            label='Select :orange[ASSET] file(s) to upload...',
+            s3_key='uploads',
+            accept_multiple_files=True,
+            css_color='#FFBD59',
+            key='asset_direct_s3_uploader',
+        )
+    else:
+        uploaded_files = st.file_uploader(
+            label='Select :orange[ASSET] file(s) to upload...',
+            type=None,
+            accept_multiple_files=True,
+        )
+
+    submission_key = st.session_state.asset_information['submission_key']
+    asset_uploads = list()
+
+    if not S3_DIRECT_UPLOADS:
+        # start uploading as soon as files are selected, while the rest of the page is filled in
+        asset_uploads = start_s3_uploads_in_background(
+            uploaded_files=uploaded_files,
+            s3_key='uploads',
+            submission_key=submission_key,
+        )
+
+    asset_progress_bars = display_s3_upload_progress(uploads=asset_uploads)
 
     asset_url = st.text_input(
         label=asset_upload_filename_label,
@@ -370,26 +438,38 @@ def page_two() -> None:
             st.session_state.asset_information['version'] = asset_version
             st.session_state.asset_information['notes'] = notes
 
-            if uploaded_files:
-                asset_filename_list = list()
+            if uploaded_files and S3_DIRECT_UPLOADS:
+                # already uploaded straight from the browser
+                asset_filename = ', '.join(uploaded_files)
+                file_uploaded_to_s3 = True
+            elif uploaded_files:
+                # files that already uploaded in the background are not uploaded again, and files
+                # that failed are started over
+                upload_results = wait_for_s3_uploads(
+                    uploads=start_s3_uploads_in_background(
+                        uploaded_files=uploaded_files,
+                        s3_key='uploads',
+                        submission_key=submission_key,
+                        retry_failed=True,
+                    ),
+                    progress_bars=asset_progress_bars,
+                )
 
-                with st.spinner(
-                    text=f'Uploading :orange[ASSET{"S" if len(uploaded_files) > 1 else ""}]...',
-                ):
-                    for uploaded_file in uploaded_files:
-                        asset_filename_list.append(
-                            upload_file_to_s3(
-                                uploaded_file=uploaded_file,
-                                s3_key='uploads',
-                            )
-                        )
+                upload_errors = [error for _, error in upload_results if error is not None]
 
-                        st.toast(body=f'Uploaded {uploaded_file.name}!')
+                if upload_errors:
+                    st.error(
+                        f'{len(upload_errors)} of {len(uploaded_files)} :orange[ASSET] files '
+                        "couldn't be uploaded - please click \"Upload!\" to try them again. Files "
+                        'that did upload will not be uploaded again, and large files pick up '
+                        'where they left off.\n\n'
+                        + '\n'.join(f'* {error}' for error in upload_errors)
+                    )
+                    st.stop()
 
-                if len(asset_filename_list) == 1:
-                    asset_filename = asset_filename_list[0]
-                else:
-                    asset_filename = ', '.join(asset_filename_list)
+                asset_filename = ', '.join(
+                    modified_filename for modified_filename, _ in upload_results
+                )
 
                 file_uploaded_to_s3 = True
             else:
@@ -397,7 +477,7 @@ def page_two() -> None:
                 file_uploaded_to_s3 = False
 
             with st.spinner(text='Setting up :orange[ASSET] tracking...'):
-                append_new_row_in_asset_tracker(
+                submission_id = append_new_row_in_asset_tracker(
                     asset_name=st.session_state.asset_information['name'],
                     username=st.session_state['username'],
                     brand=st.session_state.asset_information['brand'],
@@ -428,6 +508,8 @@ def page_two() -> None:
                     notes=st.session_state.asset_information['notes'],
                 )
 
+            st.session_state.asset_information['submission_id'] = submission_id
+
             st.session_state.progress.append('page_two_complete')
             st.rerun()
 
@@ -449,6 +531,17 @@ def page_three() -> None:
         show up in the "Asset Overview" page.
     """)
 
+    if st.session_state.asset_information.get('submission_id'):
+        if get_submission_status(
+            submission_id=st.session_state.asset_information['submission_id'],
+        ) == 'appended':
+            st.caption('✓ Your submission has been saved to the asset tracker.')
+        else:
+            st.caption(
+                'Your submission is saved and will be added to the asset tracker in the next few '
+                'moments - no need to wait around or submit it again!'
+            )
+
     display_progress_bar_asset_tracker(
         asset_name=st.session_state.asset_information.get('name'),
         brand=st.session_state.asset_information.get('brand'),
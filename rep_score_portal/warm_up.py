@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+from streamlit.logger import get_logger
+
+from config import ASSET_TRACKER_NOTE_COLUMNS, SPREADSHEET_CACHE_TTL_SECONDS
+from input_output import (
+    get_asset_tracker_df_from_sheet,
+    get_user_asset_permission_index_from_sheets,
+    read_cached_google_spreadsheet_df,
+    read_google_spreadsheets_concurrently,
+)
+from views.explore_your_data import get_explore_your_data_frames
+
+
+_logger = get_logger(__name__)
+
+# background thread warming up this process, started by the first session
+_warm_up_thread: Dict[str, Optional[threading.Thread]] = {'thread': None}
+_warm_up_thread_lock = threading.Lock()
+
+
+def warm_up(build_derived_frames: bool = True) -> Dict[str, float]:
+    """
+    Preload every sheet the portal reads into the process-wide spreadsheet cache (syncing their
+    local snapshots along the way), then build the shared asset tracker, permission index, and
+    "Explore Your Data" DataFrames from them, so later users do not pay for any of it.
+
+    Streamlit only runs code in the server process once a session connects, so the server process
+    is warmed up by its first session (see ``start_warm_up``), while ``entrypoint.sh`` runs this
+    beforehand in a separate process, only to sync the local snapshots.
+
+    Each stage is timed and logged. A stage that fails is logged and skipped, along with every
+    stage depending on it, since the portal works fine without a warm cache - just slower.
+
+    Since this runs outside of any session's script thread, every stage only uses readers and
+    builders that make no Streamlit calls (other than reading ``st.secrets``), raising errors rather
+    than trying to display them.
+
+    Parameters
+    ----------
+    build_derived_frames: bool
+        If ``False``, only the sheets are preloaded. Building the derived DataFrames is wasted work
+        outside of the Streamlit server process, whose in-memory caches they live in
+
+    Returns
+    -------
+    timings: dict
+        Dictionary mapping the name of every stage that finished to its duration in seconds
+
+    """
+    spreadsheets = st.secrets['spreadsheets']
+    tracker_sheet = (spreadsheets['project_tracker_url'], 3)
+    backend_sheet = (spreadsheets['portal_backend_url'], 0, ASSET_TRACKER_NOTE_COLUMNS)
+    primary_dataset_sheet = (spreadsheets['primary_dataset_url'], 0)
+
+    timings = dict()
+
+    def _run_stage(name: str, stage: Callable[[], object]) -> bool:
+        start_time = time.perf_counter()
+
+        try:
+            stage()
+        except Exception as e:
+            _logger.warning(f'Warm-up stage "{name}" failed: {e}')
+
+            return False
+
+        timings[name] = time.perf_counter() - start_time
+
+        _logger.info(f'Warm-up stage "{name}" took {timings[name]:.2f} seconds')
+
+        return True
+
+    def _read_sheet(sheet_key: Tuple) -> pd.DataFrame:
+        spread, sheet, *exclude_columns = sheet_key
+
+        return read_cached_google_spreadsheet_df(
+            spread=spread,
+            sheet=sheet,
+            ttl=SPREADSHEET_CACHE_TTL_SECONDS,
+            exclude_columns=tuple(exclude_columns[0]) if exclude_columns else (),
+        )
+
+    def _read_spreadsheets() -> None:
+        futures = read_google_spreadsheets_concurrently(
+            sheets=[tracker_sheet, backend_sheet, primary_dataset_sheet],
+        )
+
+        # raise any error here, rather than displaying it like ``wait_for_google_spreadsheet_df``
+        for future in futures.values():
+            future.result()
+
+    def _build_asset_tracker_df() -> None:
+        get_asset_tracker_df_from_sheet(source_df=_read_sheet(sheet_key=backend_sheet))
+
+    def _build_permission_index() -> None:
+        get_user_asset_permission_index_from_sheets(
+            tracker_df=_read_sheet(sheet_key=tracker_sheet),
+            backend_df=_read_sheet(sheet_key=backend_sheet),
+        )
+
+    def _build_explore_your_data_frames() -> None:
+        get_explore_your_data_frames(
+            primary_dataset_df=_read_sheet(sheet_key=primary_dataset_sheet),
+        )
+
+    start_time = time.perf_counter()
+
+    # every later stage is built from the sheets loaded here, so there is no use trying them if
+    # this one failed
+    if _run_stage(name='spreadsheets', stage=_read_spreadsheets) and build_derived_frames:
+        _run_stage(name='asset tracker', stage=_build_asset_tracker_df)
+        _run_stage(name='permission index', stage=_build_permission_index)
+        _run_stage(name='explore your data', stage=_build_explore_your_data_frames)
+
+    _logger.info(f'Warm-up took {time.perf_counter() - start_time:.2f} seconds')
+
+    return timings
+
+
+def start_warm_up() -> None:
+    """Warm up this process in a background thread, unless it has already been started."""
+    with _warm_up_thread_lock:
+        if _warm_up_thread['thread'] is None:
+            _warm_up_thread['thread'] = threading.Thread(
+                target=warm_up,
+                name='warm_up',
+                daemon=True,
+            )
+            _warm_up_thread['thread'].start()
+
+
+if __name__ == '__main__':
+    # run before the server starts, so it only comes up once every local snapshot is in sync
+    if 'spreadsheets' not in warm_up(build_derived_frames=False):
+        # the sheets could not be read from Google Sheets or a local snapshot, so stop here rather
+        # than starting a server with no data
+        sys.exit(1)
@@ -0,0 +1,20 @@
+import os
+import pathlib
+import sys
+
+import pytest
+
+
+# the app's modules import each other by name, as they do when run from ``rep_score_portal``
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rep_score_portal'),
+)
+
+from storage import SQLiteStorage  # noqa: E402
+
+
+@pytest.fixture()
+def sqlite_storage(tmp_path: pathlib.Path) -> SQLiteStorage:
+    """Storage backed by a fresh SQLite database file."""
+    return SQLiteStorage(database=str(tmp_path / 'storage.sqlite3'))
@@ -0,0 +1,272 @@
+import concurrent.futures
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pytest
+
+import google_sheets
+
+
+class FakeClock:
+    """Clock that only moves when it is told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Get the current time, in seconds."""
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.now += seconds
+
+
+@pytest.fixture()
+def client_stats(monkeypatch: pytest.MonkeyPatch) -> Dict[str, int]:
+    """Google Sheets client counters, starting from zero."""
+    client_stats = dict.fromkeys(google_sheets._google_sheets_client_stats, 0)
+
+    monkeypatch.setattr(google_sheets, '_google_sheets_client_stats', client_stats)
+
+    return client_stats
+
+
+def _wait_until(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+
+    while not condition():
+        assert time.monotonic() < deadline, 'Timed out waiting for condition.'
+
+        time.sleep(0.001)
+
+
+def test_single_flight_shares_one_fetch_with_every_waiter(client_stats: Dict[str, int]) -> None:
+    release_fetch = threading.Event()
+    fetches = list()
+
+    def _fetch() -> object:
+        fetches.append(threading.current_thread().name)
+        release_fetch.wait(timeout=5)
+
+        return object()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(google_sheets.single_flight, key=('test',), fetch=_fetch)
+            for _ in range(4)
+        ]
+
+        _wait_until(lambda: client_stats['fetches_coalesced'] == 3)
+        release_fetch.set()
+
+        results = [future.result(timeout=5) for future in futures]
+
+    assert len(fetches) == 1
+    assert all(result is results[0] for result in results)
+
+    # once the fetch has finished, the next one is not coalesced with it
+    assert google_sheets.single_flight(key=('test',), fetch=lambda: 'again') == 'again'
+
+
+def test_single_flight_raises_fetch_error_in_every_waiter(client_stats: Dict[str, int]) -> None:
+    release_fetch = threading.Event()
+    error = ValueError('Could not fetch.')
+
+    def _fetch() -> object:
+        release_fetch.wait(timeout=5)
+
+        raise error
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(google_sheets.single_flight, key=('test',), fetch=_fetch)
+            for _ in range(4)
+        ]
+
+        _wait_until(lambda: client_stats['fetches_coalesced'] == 3)
+        release_fetch.set()
+
+        assert all(future.exception(timeout=5) is error for future in futures)
+
+    assert google_sheets.single_flight(key=('test',), fetch=lambda: 'again') == 'again'
+
+
+def test_rate_limiter_refills_tokens_over_time() -> None:
+    clock = FakeClock()
+    rate_limiter = google_sheets._GoogleSheetsRateLimiter(requests_per_minute=60, clock=clock)
+
+    assert all(rate_limiter.try_acquire() for _ in range(60))
+    assert not rate_limiter.try_acquire()
+
+    clock.advance(0.5)
+
+    assert not rate_limiter.try_acquire()
+
+    clock.advance(0.5)
+
+    assert rate_limiter.try_acquire()
+
+    # the bucket never holds more than a minute of requests
+    clock.advance(60 * 60)
+
+    assert rate_limiter.get_stats()['tokens_available'] == 60
+
+
+def test_rate_limiter_hands_tokens_to_writes_first() -> None:
+    clock = FakeClock()
+    rate_limiter = google_sheets._GoogleSheetsRateLimiter(requests_per_minute=60, clock=clock)
+
+    while rate_limiter.try_acquire():
+        pass
+
+    def _refill_one_token() -> None:
+        clock.advance(1)
+
+        with rate_limiter._condition:
+            rate_limiter._condition.notify_all()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        read = executor.submit(rate_limiter.acquire, priority='read')
+        _wait_until(lambda: rate_limiter.get_stats()['waiting_reads'] == 1)
+
+        write = executor.submit(rate_limiter.acquire, priority='write')
+        _wait_until(lambda: rate_limiter.get_stats()['waiting_writes'] == 1)
+
+        _refill_one_token()
+        write.result(timeout=5)
+
+        # the read was waiting first, but the only token went to the write
+        assert not read.done()
+        assert rate_limiter.get_stats()['waiting_reads'] == 1
+
+        _refill_one_token()
+        read.result(timeout=5)
+
+
+def test_circuit_breaker_opens_half_opens_and_closes(client_stats: Dict[str, int]) -> None:
+    clock = FakeClock()
+    circuit_breaker = google_sheets._GoogleSheetsCircuitBreaker(
+        threshold=3,
+        cooldown=30,
+        clock=clock,
+    )
+
+    # a success in between resets the count of consecutive failures
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+    circuit_breaker.record_success()
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+
+    assert not circuit_breaker.allow_request()
+    assert client_stats['circuit_breaker_trips'] == 1
+
+    clock.advance(29)
+
+    assert not circuit_breaker.allow_request()
+
+    # half-open - a single trial request is let through, and failing it reopens the breaker
+    clock.advance(1)
+
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+
+    circuit_breaker.record_failure()
+    clock.advance(29)
+
+    assert not circuit_breaker.allow_request()
+
+    clock.advance(1)
+
+    assert circuit_breaker.allow_request()
+
+    circuit_breaker.record_success()
+
+    assert circuit_breaker.allow_request()
+    assert circuit_breaker.allow_request()
+    assert client_stats['circuit_breaker_trips'] == 1
+
+
+@pytest.fixture()
+def sent_requests(monkeypatch: pytest.MonkeyPatch, client_stats: Dict[str, int]) -> List[float]:
+    """
+    Times requests are sent at. The first request is slow, taking 0.5 seconds to respond with
+    ``'slow'``, and every later one responds with ``'hedged'`` right away.
+
+    """
+    sent_requests = list()
+
+    def _send_google_sheets_request(*args: object) -> str:
+        sent_requests.append(time.monotonic())
+
+        if len(sent_requests) == 1:
+            time.sleep(0.5)
+
+            return 'slow'
+
+        return 'hedged'
+
+    monkeypatch.setattr(google_sheets, '_send_google_sheets_request', _send_google_sheets_request)
+    monkeypatch.setattr(
+        google_sheets,
+        '_google_sheets_rate_limiter',
+        google_sheets._GoogleSheetsRateLimiter(requests_per_minute=60),
+    )
+
+    return sent_requests
+
+
+def _send_hedged_request() -> str:
+    return google_sheets._send_hedged_google_sheets_request(
+        method='get',
+        endpoint='https://sheets.googleapis.com/v4/spreadsheets/test',
+        params=None,
+        json=None,
+        timeout=7,
+    )
+
+
+def test_hedged_request_is_not_hedged_before_delay(
+    sent_requests: List[float],
+    client_stats: Dict[str, int],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(google_sheets, 'GOOGLE_SHEETS_HEDGE_AFTER_SECONDS', 1)
+
+    assert _send_hedged_request() == 'slow'
+    assert len(sent_requests) == 1
+    assert client_stats['hedged_requests'] == 0
+
+
+def test_hedged_request_is_hedged_after_delay(
+    sent_requests: List[float],
+    client_stats: Dict[str, int],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(google_sheets, 'GOOGLE_SHEETS_HEDGE_AFTER_SECONDS', 0.1)
+
+    assert _send_hedged_request() == 'hedged'
+    assert len(sent_requests) == 2
+    assert sent_requests[1] - sent_requests[0] >= 0.1
+    assert client_stats['hedged_requests'] == 1
+
+
+def test_hedged_request_is_not_hedged_without_spare_quota(
+    sent_requests: List[float],
+    client_stats: Dict[str, int],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(google_sheets, 'GOOGLE_SHEETS_HEDGE_AFTER_SECONDS', 0.1)
+
+    while google_sheets._google_sheets_rate_limiter.try_acquire():
+        pass
+
+    assert _send_hedged_request() == 'slow'
+    assert len(sent_requests) == 1
+    assert client_stats['hedged_requests'] == 0
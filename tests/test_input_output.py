@@ -0,0 +1,209 @@
+import concurrent.futures
+import threading
+import types
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import pytest
+
+import google_sheets
+import input_output
+
+
+SPREAD = 'https://docs.google.com/spreadsheets/d/rep_score_portal_test'
+TTL = 60
+MAX_STALE = 300
+
+
+class FakeClock:
+    """Clock that only moves when it is told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Get the current time, in seconds."""
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.now += seconds
+
+
+class FakeStorage:
+    """Storage serving a new version of the sheet on every read, optionally holding reads."""
+
+    def __init__(self) -> None:
+        self.reads = 0
+        self.read_started = threading.Event()
+        self.release_read = threading.Event()
+        self.release_read.set()
+
+    def read_sheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...],
+        cached: Optional[Tuple[pd.DataFrame, Optional[str]]],
+    ) -> Tuple[pd.DataFrame, str]:
+        """Read version ``reads`` of the sheet, once ``release_read`` is set."""
+        self.reads += 1
+        version = str(self.reads)
+
+        self.read_started.set()
+        self.release_read.wait(timeout=5)
+
+        return pd.DataFrame({'Version': [version]}), version
+
+
+class FakeExecutor:
+    """Executor that only runs submitted functions when told to."""
+
+    def __init__(self) -> None:
+        self.submitted: List[Callable[[], None]] = list()
+
+    def submit(self, fn: Callable[[], None]) -> None:
+        """Queue ``fn`` to be run by ``run_all``."""
+        self.submitted.append(fn)
+
+    def run_all(self) -> None:
+        """Run every queued function."""
+        while self.submitted:
+            self.submitted.pop(0)()
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Clock used by the spreadsheet cache, with the cache emptied."""
+    clock = FakeClock()
+
+    monkeypatch.setattr(input_output, 'time', types.SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(input_output, 'SPREADSHEET_CACHE_TTL_SECONDS', TTL)
+    monkeypatch.setattr(input_output, 'SPREADSHEET_CACHE_MAX_STALE_SECONDS', MAX_STALE)
+    monkeypatch.setattr(input_output, '_spreadsheet_cache', dict())
+    monkeypatch.setattr(input_output, '_spreadsheet_cache_generations', dict())
+    monkeypatch.setattr(input_output, '_spreadsheet_cache_revalidations', set())
+    monkeypatch.setattr(input_output, '_asset_tracker_notes_cache', dict())
+    monkeypatch.setattr(
+        google_sheets,
+        '_google_sheets_client_stats',
+        dict.fromkeys(google_sheets._google_sheets_client_stats, 0),
+    )
+
+    return clock
+
+
+@pytest.fixture()
+def storage(clock: FakeClock, monkeypatch: pytest.MonkeyPatch) -> FakeStorage:
+    """Storage the spreadsheet cache reads from."""
+    storage = FakeStorage()
+
+    monkeypatch.setattr(input_output, 'get_storage', lambda: storage)
+
+    return storage
+
+
+@pytest.fixture()
+def executor(monkeypatch: pytest.MonkeyPatch) -> FakeExecutor:
+    """Executor background re-fetches of the spreadsheet cache are submitted to."""
+    executor = FakeExecutor()
+
+    monkeypatch.setattr(input_output, '_google_sheets_executor', executor)
+
+    return executor
+
+
+def _read_version() -> str:
+    df = input_output.read_cached_google_spreadsheet_df(spread=SPREAD, sheet=0, ttl=TTL)
+
+    return df['Version'].iloc[0]
+
+
+def test_fresh_sheet_is_served_from_cache(
+    clock: FakeClock,
+    storage: FakeStorage,
+    executor: FakeExecutor,
+) -> None:
+    assert _read_version() == '1'
+
+    clock.advance(TTL - 1)
+
+    assert _read_version() == '1'
+    assert storage.reads == 1
+    assert executor.submitted == []
+    assert input_output.get_stale_data_age() is None
+
+
+def test_stale_sheet_is_served_while_refreshed_once_in_background(
+    clock: FakeClock,
+    storage: FakeStorage,
+    executor: FakeExecutor,
+) -> None:
+    _read_version()
+    clock.advance(TTL + 1)
+
+    # every read of the expired sheet is served right away, sharing a single background re-fetch
+    assert _read_version() == '1'
+    assert _read_version() == '1'
+    assert len(executor.submitted) == 1
+    assert storage.reads == 1
+    assert input_output.get_stale_data_age() == TTL + 1
+    assert google_sheets.get_google_sheets_client_stats()['stale_reads_served'] == 2
+
+    executor.run_all()
+
+    assert _read_version() == '2'
+    assert storage.reads == 2
+    assert input_output.get_stale_data_age() is None
+
+
+def test_sheet_past_max_stale_is_fetched_again_right_away(
+    clock: FakeClock,
+    storage: FakeStorage,
+    executor: FakeExecutor,
+) -> None:
+    _read_version()
+    clock.advance(TTL + MAX_STALE)
+
+    assert input_output.get_stale_data_age() is None
+    assert _read_version() == '2'
+    assert executor.submitted == []
+    assert storage.reads == 2
+
+
+def test_invalidation_during_fetch_does_not_cache_old_data(
+    clock: FakeClock,
+    storage: FakeStorage,
+) -> None:
+    storage.release_read.clear()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as thread_executor:
+        in_flight_read = thread_executor.submit(_read_version)
+        assert storage.read_started.wait(timeout=5)
+
+        # e.g. a row was appended to the sheet after the in-flight fetch read it
+        input_output.invalidate_spreadsheet_cache(spread=SPREAD, sheet=0)
+        storage.release_read.set()
+
+        assert in_flight_read.result(timeout=5) == '1'
+
+    assert input_output._spreadsheet_cache == dict()
+
+    # the next read fetches the sheet again rather than being served the in-flight fetch's result
+    assert _read_version() == '2'
+    assert storage.reads == 2
+
+
+def test_invalidation_joining_in_flight_fetches_expires_sheet(
+    clock: FakeClock,
+    storage: FakeStorage,
+    executor: FakeExecutor,
+) -> None:
+    _read_version()
+
+    input_output.invalidate_spreadsheet_cache(spread=SPREAD, sheet=0, join_in_flight_fetches=True)
+
+    # the expired sheet is too old to serve, even stale
+    assert _read_version() == '2'
+    assert executor.submitted == []
+    assert storage.reads == 2
@@ -0,0 +1,249 @@
+import pathlib
+import sqlite3
+from typing import Iterator, List, Optional
+
+import boto3
+import botocore.exceptions
+from botocore.stub import ANY, Stubber
+import pytest
+
+from config import S3_BUCKET
+import multipart_uploads
+
+
+UPLOAD_KEY = 'submission/uploads/brief.pdf'
+KEY = 'uploads/brief_1.pdf'
+
+
+@pytest.fixture()
+def s3_client(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> object:
+    """S3 client to stub, uploading 5 byte parts one at a time, journaled in a fresh database."""
+    monkeypatch.setattr(
+        multipart_uploads,
+        'MULTIPART_UPLOAD_DATABASE',
+        str(tmp_path / 'multipart_uploads.sqlite3'),
+    )
+    monkeypatch.setattr(multipart_uploads, 'S3_MULTIPART_CHUNK_SIZE_BYTES', 5)
+    monkeypatch.setattr(multipart_uploads, 'S3_MAX_CONCURRENCY', 1)
+
+    return boto3.session.Session().client(
+        's3',
+        region_name='us-east-1',
+        aws_access_key_id='test',
+        aws_secret_access_key='test',
+    )
+
+
+@pytest.fixture()
+def s3_stubber(s3_client: object) -> Iterator[Stubber]:
+    """Stubber for ``s3_client``, checking every stubbed response was used."""
+    with Stubber(s3_client) as stubber:
+        yield stubber
+
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture()
+def filename(tmp_path: pathlib.Path) -> str:
+    """File of two parts, ``'first'`` and ``'end'``."""
+    path = tmp_path / 'brief.pdf'
+    path.write_bytes(b'firstend')
+
+    return str(path)
+
+
+def _add_create_multipart_upload_response(s3_stubber: Stubber, upload_id: str) -> None:
+    s3_stubber.add_response(
+        'create_multipart_upload',
+        {'UploadId': upload_id},
+        {'Bucket': S3_BUCKET, 'Key': KEY, 'Metadata': {}},
+    )
+
+
+def _add_upload_part_response(s3_stubber: Stubber, upload_id: str, part_number: int) -> None:
+    s3_stubber.add_response(
+        'upload_part',
+        {'ETag': f'"{upload_id}-{part_number}"'},
+        {
+            'Bucket': S3_BUCKET,
+            'Key': KEY,
+            'UploadId': upload_id,
+            'PartNumber': part_number,
+            'Body': ANY,
+            'ContentMD5': ANY,
+        },
+    )
+
+
+def _add_complete_multipart_upload_response(
+    s3_stubber: Stubber,
+    upload_id: str,
+    part_upload_ids: List[str],
+) -> None:
+    s3_stubber.add_response(
+        'complete_multipart_upload',
+        {},
+        {
+            'Bucket': S3_BUCKET,
+            'Key': KEY,
+            'UploadId': upload_id,
+            'MultipartUpload': {
+                'Parts': [
+                    {'ETag': f'"{part_upload_id}-{part_number}"', 'PartNumber': part_number}
+                    for part_number, part_upload_id in enumerate(part_upload_ids, start=1)
+                ],
+            },
+        },
+    )
+
+
+def _add_list_parts_response(s3_stubber: Stubber, upload_id: str, part_numbers: List[int]) -> None:
+    s3_stubber.add_response(
+        'list_parts',
+        {
+            'Parts': [
+                {'PartNumber': part_number, 'ETag': f'"{upload_id}-{part_number}"'}
+                for part_number in part_numbers
+            ],
+            'IsTruncated': False,
+        },
+        {'Bucket': S3_BUCKET, 'Key': KEY, 'UploadId': upload_id},
+    )
+
+
+def _upload(s3_client: object, filename: str, parts_resumed: Optional[List[int]] = None) -> str:
+    return multipart_uploads.upload_file_to_s3_resumably(
+        s3_client=s3_client,
+        filename=filename,
+        size=pathlib.Path(filename).stat().st_size,
+        s3_key='uploads',
+        upload_key=UPLOAD_KEY,
+        modified_filename='brief_1.pdf',
+        part_resumed_callback=parts_resumed.append if parts_resumed is not None else None,
+    )
+
+
+def _fail_upload_of_second_part(s3_client: object, s3_stubber: Stubber, filename: str) -> None:
+    _add_create_multipart_upload_response(s3_stubber=s3_stubber, upload_id='upload-1')
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=1)
+    s3_stubber.add_client_error('upload_part', service_error_code='InternalError')
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        _upload(s3_client=s3_client, filename=filename)
+
+
+def test_upload_completes_and_forgets_upload(
+    s3_client: object,
+    s3_stubber: Stubber,
+    filename: str,
+) -> None:
+    _add_create_multipart_upload_response(s3_stubber=s3_stubber, upload_id='upload-1')
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=1)
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=2)
+    _add_complete_multipart_upload_response(
+        s3_stubber=s3_stubber,
+        upload_id='upload-1',
+        part_upload_ids=['upload-1', 'upload-1'],
+    )
+
+    assert _upload(s3_client=s3_client, filename=filename) == 'brief_1.pdf'
+    assert multipart_uploads.get_multipart_upload(upload_key=UPLOAD_KEY) is None
+
+
+def test_resumed_upload_skips_uploaded_parts(
+    s3_client: object,
+    s3_stubber: Stubber,
+    filename: str,
+) -> None:
+    _fail_upload_of_second_part(s3_client=s3_client, s3_stubber=s3_stubber, filename=filename)
+
+    _add_list_parts_response(s3_stubber=s3_stubber, upload_id='upload-1', part_numbers=[1])
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=2)
+    _add_complete_multipart_upload_response(
+        s3_stubber=s3_stubber,
+        upload_id='upload-1',
+        part_upload_ids=['upload-1', 'upload-1'],
+    )
+
+    parts_resumed = list()
+
+    _upload(s3_client=s3_client, filename=filename, parts_resumed=parts_resumed)
+
+    assert parts_resumed == [5]
+
+
+def test_resumed_upload_sends_changed_parts_again(
+    s3_client: object,
+    s3_stubber: Stubber,
+    filename: str,
+) -> None:
+    _fail_upload_of_second_part(s3_client=s3_client, s3_stubber=s3_stubber, filename=filename)
+
+    # same size, but the first part's content (and so its MD5 digest) changed
+    pathlib.Path(filename).write_bytes(b'FIRSTend')
+
+    _add_list_parts_response(s3_stubber=s3_stubber, upload_id='upload-1', part_numbers=[1])
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=1)
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=2)
+    _add_complete_multipart_upload_response(
+        s3_stubber=s3_stubber,
+        upload_id='upload-1',
+        part_upload_ids=['upload-1', 'upload-1'],
+    )
+
+    parts_resumed = list()
+
+    _upload(s3_client=s3_client, filename=filename, parts_resumed=parts_resumed)
+
+    assert parts_resumed == []
+
+
+def test_upload_starts_over_if_s3_no_longer_has_it(
+    s3_client: object,
+    s3_stubber: Stubber,
+    filename: str,
+) -> None:
+    _fail_upload_of_second_part(s3_client=s3_client, s3_stubber=s3_stubber, filename=filename)
+
+    s3_stubber.add_client_error('list_parts', service_error_code='NoSuchUpload')
+    _add_create_multipart_upload_response(s3_stubber=s3_stubber, upload_id='upload-2')
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-2', part_number=1)
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-2', part_number=2)
+    _add_complete_multipart_upload_response(
+        s3_stubber=s3_stubber,
+        upload_id='upload-2',
+        part_upload_ids=['upload-2', 'upload-2'],
+    )
+
+    assert _upload(s3_client=s3_client, filename=filename) == 'brief_1.pdf'
+    assert multipart_uploads.get_multipart_upload(upload_key=UPLOAD_KEY) is None
+
+
+def test_upload_survives_journal_errors(
+    s3_client: object,
+    s3_stubber: Stubber,
+    filename: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def _raise_database_is_locked(**kwargs: object) -> None:
+        raise sqlite3.OperationalError('database is locked')
+
+    for function_name in (
+        'get_multipart_upload',
+        'record_multipart_upload',
+        'get_completed_parts',
+        'record_completed_part',
+        'delete_multipart_upload',
+    ):
+        monkeypatch.setattr(multipart_uploads, function_name, _raise_database_is_locked)
+
+    _add_create_multipart_upload_response(s3_stubber=s3_stubber, upload_id='upload-1')
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=1)
+    _add_upload_part_response(s3_stubber=s3_stubber, upload_id='upload-1', part_number=2)
+    _add_complete_multipart_upload_response(
+        s3_stubber=s3_stubber,
+        upload_id='upload-1',
+        part_upload_ids=['upload-1', 'upload-1'],
+    )
+
+    assert _upload(s3_client=s3_client, filename=filename) == 'brief_1.pdf'
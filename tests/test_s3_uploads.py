@@ -0,0 +1,215 @@
+import concurrent.futures
+import hashlib
+import pathlib
+import sqlite3
+from typing import Iterator
+
+import boto3
+from botocore.stub import ANY, Stubber
+import pytest
+from streamlit.proto.Common_pb2 import FileURLs
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+from config import S3_BUCKET
+import s3_uploads
+import upload_index
+
+
+CONTENT = b'creative brief'
+
+
+@pytest.fixture()
+def s3_stubber(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Stubber]:
+    """Stubbed S3 client used for every upload, with the upload index in a fresh database."""
+    s3_client = boto3.session.Session().client(
+        's3',
+        region_name='us-east-1',
+        aws_access_key_id='test',
+        aws_secret_access_key='test',
+    )
+
+    monkeypatch.setitem(s3_uploads._s3_client, 'client', s3_client)
+    monkeypatch.setattr(s3_uploads, '_s3_upload_stats', dict(s3_uploads._s3_upload_stats))
+    monkeypatch.setattr(
+        upload_index,
+        'UPLOAD_INDEX_DATABASE',
+        str(tmp_path / 'upload_index.sqlite3'),
+    )
+
+    with Stubber(s3_client) as stubber:
+        yield stubber
+
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture()
+def spool_directory(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    """
+    Directory uploads are spooled to, with uploads of ``CONTENT``'s size or more spooled and room
+    to send only one upload of that size from memory at a time.
+
+    """
+    spool_directory = tmp_path / 'spool'
+
+    monkeypatch.setattr(s3_uploads, '_s3_upload_stats', dict(s3_uploads._s3_upload_stats))
+    monkeypatch.setattr(s3_uploads, 'S3_UPLOAD_SPOOL_DIRECTORY', str(spool_directory))
+    monkeypatch.setattr(s3_uploads, 'S3_UPLOAD_SPOOL_THRESHOLD_BYTES', len(CONTENT) + 1)
+    monkeypatch.setattr(s3_uploads, 'S3_MAX_BYTES_SENDING_FROM_MEMORY', len(CONTENT) + 1)
+
+    return spool_directory
+
+
+def _get_uploaded_file(content: bytes = CONTENT, name: str = 'brief.pdf') -> UploadedFile:
+    return UploadedFile(
+        record=UploadedFileRec(file_id='file', name=name, type='application/pdf', data=content),
+        file_urls=FileURLs(),
+    )
+
+
+def _add_put_object_response(s3_stubber: Stubber) -> None:
+    s3_stubber.add_response(
+        'put_object',
+        {'ETag': '"etag"'},
+        {
+            'Bucket': S3_BUCKET,
+            'Key': ANY,
+            'Body': ANY,
+            'Metadata': {'sha256': hashlib.sha256(CONTENT).hexdigest()},
+        },
+    )
+
+
+def _upload_file_to_s3(username: str) -> str:
+    return s3_uploads.upload_file_to_s3(
+        uploaded_file=_get_uploaded_file(),
+        s3_key='uploads',
+        username=username,
+    )
+
+
+def test_upload_file_to_s3_links_identical_upload(s3_stubber: Stubber) -> None:
+    _add_put_object_response(s3_stubber=s3_stubber)
+
+    filename = _upload_file_to_s3(username='user_a')
+
+    s3_stubber.add_response(
+        'head_object',
+        {'ContentLength': len(CONTENT), 'Metadata': {}},
+        {'Bucket': S3_BUCKET, 'Key': f'uploads/{filename}'},
+    )
+
+    linked_filename = _upload_file_to_s3(username='user_a')
+
+    assert linked_filename == filename
+    assert s3_uploads.get_s3_upload_stats()['uploads_deduplicated'] == 1
+
+
+def test_upload_file_to_s3_does_not_link_other_users_uploads(s3_stubber: Stubber) -> None:
+    _add_put_object_response(s3_stubber=s3_stubber)
+    _upload_file_to_s3(username='user_a')
+
+    # the same content uploaded by another user is uploaded again, rather than linked to
+    _add_put_object_response(s3_stubber=s3_stubber)
+    _upload_file_to_s3(username='user_b')
+
+    stats = s3_uploads.get_s3_upload_stats()
+
+    assert stats['uploads'] == 2
+    assert stats['uploads_deduplicated'] == 0
+
+
+def test_upload_file_to_s3_survives_upload_index_errors(
+    s3_stubber: Stubber,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def _raise_database_is_locked(**kwargs: object) -> None:
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(upload_index, 'get_indexed_upload', _raise_database_is_locked)
+    monkeypatch.setattr(s3_uploads, 'index_upload', _raise_database_is_locked)
+
+    _add_put_object_response(s3_stubber=s3_stubber)
+
+    filename = _upload_file_to_s3(username='user_a')
+
+    assert filename.startswith('brief_')
+    assert s3_uploads.get_s3_upload_stats()['uploads'] == 1
+
+
+@pytest.mark.parametrize(
+    'error',
+    [OSError(28, 'No space left on device'), sqlite3.OperationalError('database is locked')],
+)
+def test_s3_upload_result_raises_s3_upload_error(error: Exception) -> None:
+    upload = s3_uploads.S3Upload(filename='brief.pdf', size=len(CONTENT))
+    upload.future = concurrent.futures.Future()
+    upload.future.set_exception(error)
+
+    assert upload.failed()
+
+    with pytest.raises(s3_uploads.S3UploadError):
+        upload.result()
+
+
+def test_small_upload_is_sent_from_memory(spool_directory: pathlib.Path) -> None:
+    with s3_uploads._spool_s3_upload(uploaded_file=_get_uploaded_file()) as spool_filename:
+        assert spool_filename is None
+        assert s3_uploads.get_s3_upload_stats()['bytes_sending_from_memory'] == len(CONTENT)
+
+    stats = s3_uploads.get_s3_upload_stats()
+
+    assert stats['bytes_sending_from_memory'] == 0
+    assert stats['peak_bytes_sending_from_memory'] == len(CONTENT)
+    assert stats['spooled_uploads'] == 0
+
+
+def test_upload_over_spool_threshold_is_spooled(spool_directory: pathlib.Path) -> None:
+    content = CONTENT + b' and more'
+
+    with s3_uploads._spool_s3_upload(
+        uploaded_file=_get_uploaded_file(content=content),
+    ) as spool_filename:
+        assert pathlib.Path(spool_filename).parent == spool_directory
+        assert pathlib.Path(spool_filename).read_bytes() == content
+
+    stats = s3_uploads.get_s3_upload_stats()
+
+    assert not pathlib.Path(spool_filename).exists()
+    assert stats['bytes_sending_from_memory'] == 0
+    assert stats['spooled_uploads'] == 1
+    assert stats['bytes_spooled'] == len(content)
+
+
+def test_upload_over_memory_limit_is_spooled(spool_directory: pathlib.Path) -> None:
+    with s3_uploads._spool_s3_upload(uploaded_file=_get_uploaded_file()) as first_spool_filename:
+        with s3_uploads._spool_s3_upload(
+            uploaded_file=_get_uploaded_file(),
+        ) as second_spool_filename:
+            assert first_spool_filename is None
+            assert pathlib.Path(second_spool_filename).read_bytes() == CONTENT
+
+    with s3_uploads._spool_s3_upload(uploaded_file=_get_uploaded_file()) as third_spool_filename:
+        # the first upload is done sending, so there is room in memory again
+        assert third_spool_filename is None
+
+    assert s3_uploads.get_s3_upload_stats()['spooled_uploads'] == 1
+
+
+def test_upload_index_forgets_uploads_indexed_without_a_user(s3_stubber: Stubber) -> None:
+    with sqlite3.connect(upload_index.UPLOAD_INDEX_DATABASE) as connection:
+        connection.execute(
+            'CREATE TABLE indexed_uploads (sha256 TEXT NOT NULL, s3_key TEXT NOT NULL, '
+            'filename TEXT NOT NULL, size INTEGER NOT NULL, uploaded_at REAL NOT NULL, '
+            'PRIMARY KEY (sha256, s3_key))'
+        )
+        connection.execute(
+            "INSERT INTO indexed_uploads VALUES ('sha256', 'uploads', 'brief_0.pdf', 14, 0)"
+        )
+
+    connection.close()
+
+    assert upload_index.get_indexed_upload(
+        sha256='sha256',
+        s3_key='uploads',
+        username='user_a',
+    ) is None
@@ -0,0 +1,184 @@
+import pathlib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pytest
+
+from google_sheets import GoogleSheetsUnavailableError
+import snapshots
+
+
+SPREAD = 'https://docs.google.com/spreadsheets/d/rep_score_portal_test'
+
+
+class FakeGoogleSheets:
+    """
+    Google Sheets serving a sheet of ``rows`` rows at Drive version ``version``, recording every
+    download. Setting ``version`` to an exception makes checking the version raise it, and setting
+    ``unavailable`` makes every download fail as if Google Sheets could not be reached.
+
+    """
+
+    def __init__(self) -> None:
+        self.version: Any = 'v1'
+        self.rows = 2
+        self.unavailable = False
+        self.downloads: List[str] = list()
+
+    def _check_available(self) -> None:
+        if self.unavailable:
+            raise GoogleSheetsUnavailableError('Could not GET after 3 attempts.')
+
+    def get_google_spreadsheet_version(self, spread: str) -> str:
+        """Get ``version``, raising it if it is an exception."""
+        if isinstance(self.version, Exception):
+            raise self.version
+
+        return self.version
+
+    def download_google_spreadsheet(
+        self,
+        spread: str,
+        sheet: int,
+        exclude_columns: Tuple[str, ...],
+    ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Download every row of the sheet."""
+        self._check_available()
+        self.downloads.append('full')
+
+        return _get_df(first_row=2, last_row=self.rows + 1), {
+            'num_rows': self.rows + 1,
+            'num_columns': 1,
+            'full_synced_at': time.time(),
+        }
+
+    def download_appended_google_spreadsheet_rows(
+        self,
+        spread: str,
+        snapshot_df: pd.DataFrame,
+        metadata: Dict[str, Any],
+    ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Download the rows of the sheet after the last one in ``snapshot_df``."""
+        self._check_available()
+        self.downloads.append('appended')
+
+        return (
+            pd.concat([
+                snapshot_df,
+                _get_df(first_row=metadata['num_rows'] + 1, last_row=self.rows + 1),
+            ]),
+            {**metadata, 'num_rows': self.rows + 1},
+        )
+
+
+def _get_df(first_row: int, last_row: int) -> pd.DataFrame:
+    row_numbers = list(range(first_row, last_row + 1))
+
+    return pd.DataFrame(
+        {'Asset Name': [f'Asset {row_number}' for row_number in row_numbers]},
+        index=row_numbers,
+    )
+
+
+@pytest.fixture()
+def google_sheets(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> FakeGoogleSheets:
+    """Google Sheets that snapshots are synced from, with snapshots written to a fresh directory."""
+    google_sheets = FakeGoogleSheets()
+
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_DIRECTORY', str(tmp_path / 'snapshots'))
+
+    for function_name in (
+        'get_google_spreadsheet_version',
+        'download_google_spreadsheet',
+        'download_appended_google_spreadsheet_rows',
+    ):
+        monkeypatch.setattr(snapshots, function_name, getattr(google_sheets, function_name))
+
+    return google_sheets
+
+
+def _sync(
+    cached: Optional[Tuple[pd.DataFrame, Optional[str]]] = None,
+) -> Tuple[pd.DataFrame, Optional[str]]:
+    return snapshots.sync_google_spreadsheet_snapshot(spread=SPREAD, sheet=0, cached=cached)
+
+
+def test_unchanged_spreadsheet_is_not_downloaded_again(google_sheets: FakeGoogleSheets) -> None:
+    df, version = _sync()
+
+    assert version == 'v1'
+    assert google_sheets.downloads == ['full']
+
+    # neither with the DataFrame still in memory nor with only the snapshot on disk
+    assert _sync(cached=(df, version))[0] is df
+
+    snapshot_df, snapshot_version = _sync()
+
+    pd.testing.assert_frame_equal(snapshot_df, df)
+    assert snapshot_version == 'v1'
+    assert google_sheets.downloads == ['full']
+
+
+def test_changed_spreadsheet_is_downloaded_again(google_sheets: FakeGoogleSheets) -> None:
+    cached = _sync()
+
+    google_sheets.version = 'v2'
+    google_sheets.rows = 3
+
+    df, version = _sync(cached=cached)
+
+    assert version == 'v2'
+    assert list(df['Asset Name']) == ['Asset 2', 'Asset 3', 'Asset 4']
+    assert google_sheets.downloads == ['full', 'full']
+
+
+def test_only_appended_rows_are_pulled_if_version_is_unknown(
+    google_sheets: FakeGoogleSheets,
+) -> None:
+    _sync()
+
+    # e.g. the Drive API is not enabled
+    google_sheets.version = KeyError('version')
+    google_sheets.rows = 3
+
+    df, version = _sync()
+
+    assert version is None
+    assert list(df['Asset Name']) == ['Asset 2', 'Asset 3', 'Asset 4']
+    assert google_sheets.downloads == ['full', 'appended']
+
+
+def test_entire_sheet_is_downloaded_if_version_is_unknown_past_full_resync(
+    google_sheets: FakeGoogleSheets,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _sync()
+
+    google_sheets.version = KeyError('version')
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_FULL_RESYNC_SECONDS', 0)
+
+    _sync()
+
+    assert google_sheets.downloads == ['full', 'full']
+
+
+def test_snapshot_is_served_during_outage(google_sheets: FakeGoogleSheets) -> None:
+    df, _ = _sync()
+
+    google_sheets.version = GoogleSheetsUnavailableError('Could not GET after 3 attempts.')
+    google_sheets.unavailable = True
+
+    snapshot_df, version = _sync()
+
+    pd.testing.assert_frame_equal(snapshot_df, df)
+    assert version == 'v1'
+    assert google_sheets.downloads == ['full']
+
+
+def test_outage_without_snapshot_raises(google_sheets: FakeGoogleSheets) -> None:
+    google_sheets.version = GoogleSheetsUnavailableError('Could not GET after 3 attempts.')
+    google_sheets.unavailable = True
+
+    with pytest.raises(GoogleSheetsUnavailableError):
+        _sync()
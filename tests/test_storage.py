@@ -0,0 +1,132 @@
+import pandas as pd
+import pytest
+
+from storage import SQLiteStorage
+
+
+SPREAD = 'https://docs.google.com/spreadsheets/d/rep_score_portal_test'
+
+
+def _write_asset_tracker(sqlite_storage: SQLiteStorage, num_rows: int = 2) -> None:
+    sqlite_storage.write_sheet(
+        spread=SPREAD,
+        sheet=0,
+        df=pd.DataFrame(
+            data={
+                'Asset Name': [f'Asset {row_idx}' for row_idx in range(num_rows)],
+                'Username': [f'user_{row_idx}' for row_idx in range(num_rows)],
+                'Notes': [f'Notes {row_idx}' for row_idx in range(num_rows)],
+            },
+            index=range(2, num_rows + 2),
+        ),
+    )
+
+
+def test_read_sheet_is_indexed_by_row_number(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    df, _ = sqlite_storage.read_sheet(spread=SPREAD, sheet=0)
+
+    assert list(df.index) == [2, 3]
+    assert list(df.columns) == ['Asset Name', 'Username', 'Notes']
+    assert df.loc[3, 'Asset Name'] == 'Asset 1'
+
+
+def test_read_sheet_excludes_columns(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    df, _ = sqlite_storage.read_sheet(spread=SPREAD, sheet=0, exclude_columns=('Notes',))
+
+    assert list(df.columns) == ['Asset Name', 'Username']
+
+
+def test_append_rows_after_last_row(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    sqlite_storage.append_rows(
+        spread=SPREAD,
+        rows=[['Asset 2', 'user_2', 'Notes 2'], ['Asset 3', 'user_3', 'Notes 3']],
+    )
+
+    df, _ = sqlite_storage.read_sheet(spread=SPREAD, sheet=0)
+
+    assert list(df.index) == [2, 3, 4, 5]
+    assert list(df['Asset Name']) == ['Asset 0', 'Asset 1', 'Asset 2', 'Asset 3']
+    assert sqlite_storage.read_row(spread=SPREAD, sheet=0, row_number=5) == {
+        'Asset Name': 'Asset 3',
+        'Username': 'user_3',
+        'Notes': 'Notes 3',
+    }
+
+
+def test_append_rows_to_empty_sheet_starts_after_header(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage, num_rows=0)
+
+    sqlite_storage.append_rows(spread=SPREAD, rows=[['Asset 0', 'user_0', 'Notes 0']])
+
+    assert sqlite_storage.read_row(spread=SPREAD, sheet=0, row_number=2) == {
+        'Asset Name': 'Asset 0',
+        'Username': 'user_0',
+        'Notes': 'Notes 0',
+    }
+
+
+def test_append_rows_wider_than_sheet_adds_columns(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    sqlite_storage.append_rows(spread=SPREAD, rows=[['Asset 2', 'user_2', 'Notes 2', 'extra']])
+
+    assert sqlite_storage.read_header(spread=SPREAD, sheet=0) == [
+        'Asset Name',
+        'Username',
+        'Notes',
+        '',
+    ]
+
+    df, _ = sqlite_storage.read_sheet(spread=SPREAD, sheet=0)
+
+    assert list(df.iloc[:, 3]) == ['', '', 'extra']
+
+
+def test_append_rows_bumps_version(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    cached = sqlite_storage.read_sheet(spread=SPREAD, sheet=0)
+
+    # an unchanged spreadsheet is served from the cached DataFrame
+    assert sqlite_storage.read_sheet(spread=SPREAD, sheet=0, cached=cached)[0] is cached[0]
+
+    sqlite_storage.append_rows(spread=SPREAD, rows=[['Asset 2', 'user_2', 'Notes 2']])
+
+    df, version = sqlite_storage.read_sheet(spread=SPREAD, sheet=0, cached=cached)
+
+    assert version != cached[1]
+    assert len(df) == 3
+
+
+def test_read_row_of_missing_row_is_empty(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    assert sqlite_storage.read_row(spread=SPREAD, sheet=0, row_number=100) == dict()
+
+
+def test_read_unstored_sheet(sqlite_storage: SQLiteStorage) -> None:
+    with pytest.raises(KeyError):
+        sqlite_storage.read_sheet(spread=SPREAD, sheet=0)
+
+    with pytest.raises(KeyError):
+        sqlite_storage.read_row(spread=SPREAD, sheet=0, row_number=2)
+
+    assert sqlite_storage.read_header(spread=SPREAD, sheet=0) == list()
+
+
+def test_read_column(sqlite_storage: SQLiteStorage) -> None:
+    _write_asset_tracker(sqlite_storage=sqlite_storage)
+
+    assert sqlite_storage.read_column(spread=SPREAD, sheet=0, column='Username') == [
+        'user_0',
+        'user_1',
+    ]
+
+    with pytest.raises(KeyError):
+        sqlite_storage.read_column(spread=SPREAD, sheet=0, column='Submission ID')
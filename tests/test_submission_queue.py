@@ -0,0 +1,230 @@
+import pathlib
+import sqlite3
+from typing import List
+import uuid
+
+import pandas as pd
+import pytest
+
+from google_sheets import GoogleSheetsUnavailableError
+from storage import SQLiteStorage
+import submission_queue
+
+
+SPREAD = 'https://docs.google.com/spreadsheets/d/rep_score_portal_test'
+
+
+@pytest.fixture()
+def asset_tracker(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    sqlite_storage: SQLiteStorage,
+) -> SQLiteStorage:
+    """Empty asset tracker in SQLite storage, with the submission queue in a fresh database."""
+    sqlite_storage.write_sheet(
+        spread=SPREAD,
+        sheet=0,
+        df=pd.DataFrame(columns=['Asset Name', 'Username', 'Submission ID']),
+    )
+
+    monkeypatch.setattr(
+        submission_queue,
+        'SUBMISSION_QUEUE_DATABASE',
+        str(tmp_path / 'submission_queue.sqlite3'),
+    )
+    monkeypatch.setattr(submission_queue, '_submission_id_columns_checked', set())
+    monkeypatch.setattr(submission_queue, 'get_storage', lambda: sqlite_storage)
+
+    return sqlite_storage
+
+
+def _enqueue_row(asset_name: str) -> str:
+    submission_id = uuid.uuid4().hex
+
+    submission_queue.enqueue_row(
+        idempotency_key=submission_id,
+        spread=SPREAD,
+        row={'Asset Name': asset_name, 'Username': 'user', 'Submission ID': submission_id},
+    )
+
+    return submission_id
+
+
+def _get_submission_ids(asset_tracker: SQLiteStorage) -> List[str]:
+    df, _ = asset_tracker.read_sheet(spread=SPREAD, sheet=0)
+
+    return list(df['Submission ID'])
+
+
+def test_flush_appends_and_marks_rows(asset_tracker: SQLiteStorage) -> None:
+    submission_ids = [_enqueue_row(asset_name='Asset 0'), _enqueue_row(asset_name='Asset 1')]
+    appended_spreads = list()
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=appended_spreads.append)
+
+    assert _get_submission_ids(asset_tracker=asset_tracker) == submission_ids
+    assert appended_spreads == [SPREAD]
+    assert submission_queue.get_pending_rows() == list()
+    assert all(
+        submission_queue.get_submission_status(submission_id=submission_id) == 'appended'
+        for submission_id in submission_ids
+    )
+
+
+def test_flush_batches_rows(
+    asset_tracker: SQLiteStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(submission_queue, 'SUBMISSION_QUEUE_MAX_BATCH_SIZE', 2)
+
+    append_calls = list()
+    append_rows = asset_tracker.append_rows
+
+    def _append_rows(spread: str, rows: List[List[str]]) -> None:
+        append_calls.append(len(rows))
+        append_rows(spread=spread, rows=rows)
+
+    monkeypatch.setattr(asset_tracker, 'append_rows', _append_rows)
+
+    submission_ids = [_enqueue_row(asset_name=f'Asset {row_idx}') for row_idx in range(3)]
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    assert append_calls == [2, 1]
+    assert _get_submission_ids(asset_tracker=asset_tracker) == submission_ids
+
+
+def test_flush_does_not_append_rows_already_in_sheet(asset_tracker: SQLiteStorage) -> None:
+    submission_id = _enqueue_row(asset_name='Asset 0')
+
+    # an earlier attempt was written to the sheet, but its response was lost
+    submission_queue.record_attempts(idempotency_keys=[submission_id])
+    asset_tracker.append_rows(spread=SPREAD, rows=[['Asset 0', 'user', submission_id]])
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    assert _get_submission_ids(asset_tracker=asset_tracker) == [submission_id]
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'appended'
+
+
+def test_flush_after_crash_between_append_and_mark(
+    asset_tracker: SQLiteStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    submission_id = _enqueue_row(asset_name='Asset 0')
+
+    def _crash(idempotency_keys: List[str]) -> None:
+        raise sqlite3.OperationalError('disk I/O error')
+
+    with monkeypatch.context() as crash_monkeypatch:
+        crash_monkeypatch.setattr(submission_queue, 'mark_rows_appended', _crash)
+
+        with pytest.raises(sqlite3.OperationalError):
+            submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    # the row made it into the sheet, but is still pending in the queue
+    assert _get_submission_ids(asset_tracker=asset_tracker) == [submission_id]
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'pending'
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    assert _get_submission_ids(asset_tracker=asset_tracker) == [submission_id]
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'appended'
+
+
+def test_flush_checks_live_sheet_rather_than_stale_reads(
+    asset_tracker: SQLiteStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    stale_sheet = asset_tracker.read_sheet(spread=SPREAD, sheet=0)
+    submission_id = _enqueue_row(asset_name='Asset 0')
+
+    def _crash(idempotency_keys: List[str]) -> None:
+        raise sqlite3.OperationalError('disk I/O error')
+
+    with monkeypatch.context() as crash_monkeypatch:
+        crash_monkeypatch.setattr(submission_queue, 'mark_rows_appended', _crash)
+
+        with pytest.raises(sqlite3.OperationalError):
+            submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    # during a partial outage, reading the sheet falls back to a snapshot from before the append
+    monkeypatch.setattr(asset_tracker, 'read_sheet', lambda **kwargs: stale_sheet)
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    assert asset_tracker.read_column(spread=SPREAD, sheet=0, column='Submission ID') == [
+        submission_id,
+    ]
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'appended'
+
+
+def test_flush_holds_retried_rows_if_sheet_cannot_be_checked(
+    asset_tracker: SQLiteStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    submission_id = _enqueue_row(asset_name='Asset 0')
+    submission_queue.record_attempts(idempotency_keys=[submission_id])
+
+    def _read_column(spread: str, sheet: int, column: str) -> List[str]:
+        raise GoogleSheetsUnavailableError('Could not GET after 3 attempts.')
+
+    monkeypatch.setattr(asset_tracker, 'read_column', _read_column)
+
+    assert not submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    assert _get_submission_ids(asset_tracker=asset_tracker) == list()
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'pending'
+
+
+def test_failed_flush_keeps_rows_pending(
+    asset_tracker: SQLiteStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    submission_id = _enqueue_row(asset_name='Asset 0')
+    appended_spreads = list()
+
+    def _append_rows(spread: str, rows: List[List[str]]) -> None:
+        raise GoogleSheetsUnavailableError('Could not POST after 3 attempts.')
+
+    with monkeypatch.context() as outage_monkeypatch:
+        outage_monkeypatch.setattr(asset_tracker, 'append_rows', _append_rows)
+
+        assert not submission_queue.flush_submission_queue(
+            on_rows_appended=appended_spreads.append,
+        )
+
+    (queued_row,) = submission_queue.get_pending_rows()
+
+    assert queued_row.idempotency_key == submission_id
+    assert queued_row.attempts == 1
+    assert appended_spreads == list()
+
+    assert submission_queue.flush_submission_queue(on_rows_appended=appended_spreads.append)
+
+    assert _get_submission_ids(asset_tracker=asset_tracker) == [submission_id]
+    assert appended_spreads == [SPREAD]
+
+
+def test_missing_submission_id_column_blocks_append(asset_tracker: SQLiteStorage) -> None:
+    asset_tracker.write_sheet(
+        spread=SPREAD,
+        sheet=0,
+        df=pd.DataFrame(columns=['Asset Name', 'Username']),
+    )
+
+    submission_id = _enqueue_row(asset_name='Asset 0')
+
+    assert not submission_queue.flush_submission_queue(on_rows_appended=lambda spread: None)
+
+    df, _ = asset_tracker.read_sheet(spread=SPREAD, sheet=0)
+
+    assert len(df) == 0
+    assert submission_queue.get_submission_status(submission_id=submission_id) == 'pending'
+
+    with pytest.raises(submission_queue.MissingSubmissionIDColumnError):
+        submission_queue.check_submission_id_column(spread=SPREAD, column_index=2)
+
+
+def test_get_submission_status_of_unknown_submission(asset_tracker: SQLiteStorage) -> None:
+    assert submission_queue.get_submission_status(submission_id='unknown') is None